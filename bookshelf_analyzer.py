@@ -11,6 +11,7 @@ Usage:
     python bookshelf_analyzer.py <directory_path>
 """
 
+import copy
 import os
 import sys
 import re
@@ -18,23 +19,103 @@ from collections import defaultdict, Counter
 from pathlib import Path
 from datetime import datetime
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from bookshelf_cache import ParseCache, file_digest
+from bookshelf_congestion import (congestion_stats, create_congestion_visualization, create_heat_map_visualization,
+                                  format_congestion_report, rudy_map)
+from bookshelf_export import EXPORT_FORMATS, export_design, resolve_format
+from bookshelf_placement import (RegionResources, check_legality, diff_placements, displacement_map, evaluate_hpwl,
+                                 format_density_report, format_hpwl_report, format_legality_report,
+                                 format_placement_diff_report, read_placement_file)
+from bookshelf_profile import add_profile_arguments, finish_profiling, phase, start_profiling
+from bookshelf_timing import analyze_timing, format_timing_report
+from bookshelf_utilization import compute_utilization, format_utilization_report, site_supply
+from bookshelf_tokenizer import TokenizedFile, read_sitemap_dimensions, sitemap_section
+from bookshelf_model import (DesignModel, InstancesView, NetsView, PlacementView, SiteGrid,
+                             SiteMapView, StringTable, int_builder, to_int32)
+
+
+def stream_lines(file_path, start=0, end=None):
+    """Yield the stripped lines of a file one at a time.
+
+    The parsers below consume this generator instead of f.readlines(), so only
+    the current line is held in memory and peak usage follows the size of the
+    parsed result rather than the size of the file. start/end restrict it to a
+    byte range (see find_chunks) so a worker can parse one chunk of a file.
+    """
+    if start == 0 and end is None:
+        with open(file_path, 'r') as f:
+            for line in f:
+                yield line.strip()
+        return
+    
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = (end if end is not None else os.path.getsize(file_path)) - start
+        for raw_line in f:
+            if remaining <= 0:
+                break
+            remaining -= len(raw_line)
+            yield raw_line.decode().strip()
+
+
+def find_chunks(file_path, num_chunks, record_start=None):
+    """Split a file into about num_chunks (start, end) byte ranges in file order.
+
+    Every range starts at the beginning of a line, or with record_start (e.g.
+    b'net' for .nets files) at the beginning of a line with that prefix, so
+    each chunk can be parsed on its own with the normal parser.
+    """
+    size = os.path.getsize(file_path)
+    offsets = [0]
+    
+    with open(file_path, 'rb') as f:
+        for i in range(1, num_chunks):
+            f.seek(max(size * i // num_chunks, offsets[-1]))
+            f.readline()
+            position = f.tell()
+            while record_start is not None:
+                line = f.readline()
+                if not line or line.startswith(record_start):
+                    break
+                position = f.tell()
+            if offsets[-1] < position < size:
+                offsets.append(position)
+    
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
 
 
 class BookshelfAnalyzer:
-    def __init__(self, directory_path):
+    def __init__(self, directory_path, cache_dir=None, use_cache=True, jobs=1, chunk_bytes=None):
         self.directory_path = Path(directory_path)
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.jobs = jobs
+        self.chunk_bytes = chunk_bytes or DEFAULT_CHUNK_BYTES
         self.analysis_results = {}
+        self.design = DesignModel()
+        self.files = {}
+        self.digests = {}
+        self.reused_kinds = set()
+        self.loaded_kinds = set()
+        self.parse_errors = []
+        
+    def parse_error(self, message):
+        """Print a parse error and keep it in self.parse_errors, for callers that hide the console."""
+        print(message)
+        self.parse_errors.append(message)
         
     def parse_aux_file(self, aux_file_path):
         """Parse .aux file to get version, date, and included files."""
         aux_data = {}
         
         try:
-            with open(aux_file_path, 'r') as f:
-                lines = f.readlines()
-                
-            for line in lines:
-                line = line.strip()
+            for line in stream_lines(aux_file_path):
                 if line.startswith('#'):
                     if 'version' in line:
                         version_match = re.search(r'version\s+([^\s]+)', line)
@@ -52,7 +133,7 @@ class BookshelfAnalyzer:
                         aux_data['included_files'] = files
                         
         except Exception as e:
-            print(f"Error parsing aux file {aux_file_path}: {e}")
+            self.parse_error(f"Error parsing aux file {aux_file_path}: {e}")
             
         return aux_data
     
@@ -62,11 +143,7 @@ class BookshelfAnalyzer:
         current_cell = None
         
         try:
-            with open(lib_file_path, 'r') as f:
-                lines = f.readlines()
-                
-            for line in lines:
-                line = line.strip()
+            for line in stream_lines(lib_file_path):
                 if line.startswith('CELL'):
                     current_cell = line.split()[1]
                     cells[current_cell] = {'pins': [], 'pin_count': 0}
@@ -92,147 +169,163 @@ class BookshelfAnalyzer:
                     current_cell = None
                     
         except Exception as e:
-            print(f"Error parsing lib file {lib_file_path}: {e}")
+            self.parse_error(f"Error parsing lib file {lib_file_path}: {e}")
             
         return cells
     
-    def parse_nodes_file(self, nodes_file_path):
-        """Parse .nodes file to get instance definitions."""
-        instances = {}
-        instance_types = Counter()
+    def parse_nodes_file(self, nodes_file_path, start=0, end=None):
+        """Parse .nodes file to get instance definitions.
+
+        Instances are stored in self.design as interned names plus an int32
+        instance -> cell array; the returned instances mapping is a lazy view.
+        """
+        design = self.design
+        inst_cell = int_builder()
+        intern_instance = design.instance_names.intern
+        intern_cell = design.cell_names.intern
         
         try:
-            with open(nodes_file_path, 'r') as f:
-                lines = f.readlines()
-                
-            for line in lines:
-                line = line.strip()
+            for line in stream_lines(nodes_file_path, start, end):
                 if line and not line.startswith('#'):
                     parts = line.split()
                     if len(parts) >= 2:
-                        instance_name = parts[0]
-                        cell_type = parts[1]
-                        instances[instance_name] = cell_type
-                        instance_types[cell_type] += 1
+                        instance_id = intern_instance(parts[0])
+                        cell_id = intern_cell(parts[1])
+                        if instance_id == len(inst_cell):
+                            inst_cell.append(cell_id)
+                        else:
+                            inst_cell[instance_id] = cell_id
                         
         except Exception as e:
-            print(f"Error parsing nodes file {nodes_file_path}: {e}")
-            
-        return instances, instance_types
+            self.parse_error(f"Error parsing nodes file {nodes_file_path}: {e}")
+        
+        design.inst_cell = to_int32(inst_cell)
+        design.resolve_instances()
+        return InstancesView(design), design.instance_type_counts()
     
-    def parse_nets_file(self, nets_file_path):
-        """Parse .nets file to get net definitions and connections."""
-        nets = {}
+    def parse_nets_file(self, nets_file_path, start=0, end=None):
+        """Parse .nets file to get net definitions and connections.
+
+        Nets are stored in self.design in CSR form (net_offsets into the
+        pin_inst / pin_libpin arrays); the returned nets mapping is a lazy view.
+        """
+        design = self.design
+        net_degree = int_builder()
+        net_offsets = int_builder()
+        pin_inst = int_builder()
+        pin_libpin = int_builder()
+        pin_instances = StringTable()
         net_count = 0
         
         try:
-            with open(nets_file_path, 'r') as f:
-                lines = f.readlines()
-                
             current_net = None
-            for line in lines:
-                line = line.strip()
-                if line.startswith('net'):
-                    parts = line.split()
+            for line in stream_lines(nets_file_path, start, end):
+                # Lines come in stripped, so pin lines are told apart by the
+                # first field rather than by their leading tab
+                parts = line.split()
+                if not parts or parts[0].startswith('#'):
+                    continue
+                if parts[0] == 'net':
                     if len(parts) >= 3:
                         net_name = parts[1]
                         pin_count = int(parts[2])
-                        current_net = {
-                            'name': net_name,
-                            'pin_count': pin_count,
-                            'connections': []
-                        }
-                        nets[net_name] = current_net
+                        current_net = design.net_names.append(net_name)
+                        net_offsets.append(len(pin_inst))
+                        net_degree.append(pin_count)
                         net_count += 1
-                elif line.startswith('\t') and current_net:
-                    connection = line.strip().split()
-                    if len(connection) >= 2:
-                        current_net['connections'].append({
-                            'instance': connection[0],
-                            'pin': connection[1]
-                        })
-                elif line.startswith('endnet'):
+                elif parts[0] == 'endnet':
                     current_net = None
+                elif current_net is not None and len(parts) >= 2:
+                    pin_inst.append(pin_instances.intern(parts[0]))
+                    pin_libpin.append(design.pin_names.intern(parts[1]))
                     
         except Exception as e:
-            print(f"Error parsing nets file {nets_file_path}: {e}")
-            
-        return nets, net_count
+            self.parse_error(f"Error parsing nets file {nets_file_path}: {e}")
+        
+        net_offsets.append(len(pin_inst))
+        design.net_degree = to_int32(net_degree)
+        design.net_offsets = to_int32(net_offsets)
+        design.pin_inst = to_int32(pin_inst)
+        design.pin_libpin = to_int32(pin_libpin)
+        design.pin_instance_names = pin_instances
+        design.resolve_instances()
+        return NetsView(design), net_count
     
     def parse_pl_file(self, pl_file_path):
-        """Parse .pl file to get placement information for fixed instances."""
-        fixed_instances = {}
-        fixed_types = Counter()
+        """Parse .pl file to get placement information for fixed instances.
+
+        The file is tokenized in bulk and the x/y/bel columns go straight into
+        self.design.placement arrays; they are matched to .nodes instances
+        afterwards to count the fixed cell types.
+        """
+        placement = self.design.placement
         
         try:
-            with open(pl_file_path, 'r') as f:
-                lines = f.readlines()
-                
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split()
-                    if len(parts) >= 5 and parts[-1] == 'FIXED':
-                        instance_name = parts[0]
-                        x = int(parts[1])
-                        y = int(parts[2])
-                        bel = int(parts[3])
-                        
-                        fixed_instances[instance_name] = {
-                            'x': x, 'y': y, 'bel': bel
-                        }
-                        
-                        if hasattr(self, 'instances') and instance_name in self.instances:
-                            instance_type = self.instances[instance_name]
-                            fixed_types[instance_type] += 1
-                        else:
-                            fixed_types['UNKNOWN'] += 1
+            tokens = TokenizedFile(pl_file_path)
+            rows = tokens.rows(min_fields=5)
+            rows = rows[tokens.equals(tokens.field(rows, -1), b'FIXED')]
+            x, x_ok = tokens.as_int(tokens.field(rows, 1))
+            y, y_ok = tokens.as_int(tokens.field(rows, 2))
+            bel, bel_ok = tokens.as_int(tokens.field(rows, 3))
+            valid = x_ok & y_ok & bel_ok
+            if not valid.all():
+                self.parse_error(f"Error parsing pl file {pl_file_path}: invalid location on line {rows[~valid][0] + 1}")
+                rows, x, y, bel = rows[valid], x[valid], y[valid], bel[valid]
+            placement.set_rows(tokens.as_strings(tokens.field(rows, 0)), x, y, bel, np.ones(len(rows), dtype=bool))
                             
         except Exception as e:
-            print(f"Error parsing pl file {pl_file_path}: {e}")
-            
-        return fixed_instances, fixed_types
+            self.parse_error(f"Error parsing pl file {pl_file_path}: {e}")
+        
+        placement.resolve(self.design.instance_names)
+        return PlacementView(placement), self.count_fixed_types()
+    
+    def count_fixed_types(self):
+        """Count placed instances by cell type, UNKNOWN for names missing from .nodes."""
+        design = self.design
+        inst = design.placement.inst
+        known = inst >= 0
+        cell_ids = np.full(len(inst), -1, dtype=np.int32)
+        cell_ids[known] = design.inst_cell[inst[known]]
+        fixed_types = Counter()
+        if len(cell_ids):
+            unique_ids, first_seen, counts = np.unique(cell_ids, return_index=True, return_counts=True)
+            for idx in np.argsort(first_seen):
+                cell_id = unique_ids[idx]
+                name = design.cell_names[cell_id] if cell_id >= 0 else 'UNKNOWN'
+                fixed_types[name] = int(counts[idx])
+        return fixed_types
     
     def parse_scl_file(self, scl_file_path):
-        """Parse .scl file to get site definitions and site map."""
+        """Parse .scl file to get site definitions and site map.
+        
+        The SITE/RESOURCES header is read line by line, the SITEMAP block is
+        tokenized in bulk with its x/y columns converted as arrays.
+        """
         sites = {}
         resources = {}
         site_map = []
         sitemap_dimensions = None
+        self.site_grid = SiteGrid()
         
         try:
-            with open(scl_file_path, 'r') as f:
-                lines = f.readlines()
-                
+            tokens = TokenizedFile(scl_file_path)
+            header_line, end_line = sitemap_section(tokens)
+            
             current_site = None
             in_resources = False
-            in_sitemap = False
-            site_map_count = 0
-            max_site_map_entries = 10000
             
-            for line in lines:
-                line = line.strip()
-                
-                if line.startswith('SITEMAP'):
-                    in_sitemap = True
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        try:
-                            width = int(parts[1])
-                            height = int(parts[2])
-                            sitemap_dimensions = (width, height)
-                        except ValueError as e:
-                            print(f"Error parsing SITEMAP dimensions: {e}")
-                    else:
-                        print(f"Warning: SITEMAP line has insufficient parts: {line}")
-                elif line.startswith('END SITEMAP'):
-                    in_sitemap = False
-                elif line.startswith('SITE') and not in_sitemap:
+            if header_line >= 0:
+                other_lines = tokens.text_lines(0, header_line) + tokens.text_lines(end_line + 1)
+            else:
+                other_lines = tokens.text_lines()
+            
+            for line in other_lines:
+                if line.startswith('SITE'):
                     current_site = line.split()[1]
                     sites[current_site] = {'resources': {}}
                 elif line.startswith('END SITE'):
                     current_site = None
-                elif current_site and line and not in_sitemap:
+                elif current_site and line:
                     parts = line.split()
                     if len(parts) >= 2:
                         resource_type = parts[0]
@@ -249,80 +342,84 @@ class BookshelfAnalyzer:
                         resource_type = parts[0]
                         cell_names = parts[1:]
                         resources[resource_type] = cell_names
-                        
-                elif in_sitemap and line and not line.startswith('SITEMAP'):
-                    parts = line.split()
-                    if len(parts) >= 3 and site_map_count < max_site_map_entries:
-                        try:
-                            x = int(parts[0])
-                            y = int(parts[1])
-                            site_type = parts[2]
-                            site_map.append({
-                                'x': x, 'y': y, 'type': site_type
-                            })
-                            site_map_count += 1
-                        except ValueError:
-                            continue
+            
+            if header_line >= 0:
+                sitemap_dimensions = read_sitemap_dimensions(tokens, header_line)
+                if sitemap_dimensions is None:
+                    print(f"Warning: SITEMAP line is malformed: {tokens.text_lines(header_line, header_line + 1)[0]}")
+                self.site_grid = self.load_site_grid(tokens, header_line, end_line, sitemap_dimensions)
+                site_map = SiteMapView(self.site_grid)
                         
         except Exception as e:
-            print(f"Error parsing scl file {scl_file_path}: {e}")
+            self.parse_error(f"Error parsing scl file {scl_file_path}: {e}")
             
         return sites, resources, site_map, sitemap_dimensions
     
+    def load_site_grid(self, tokens, header_line, end_line, sitemap_dimensions):
+        """Load every SITEMAP entry into a dense SiteGrid of site type ids."""
+        rows = tokens.rows(min_fields=3, first_line=header_line + 1, last_line=end_line, skip_comments=False)
+        x, x_ok = tokens.as_int(tokens.field(rows, 0))
+        y, y_ok = tokens.as_int(tokens.field(rows, 1))
+        valid = x_ok & y_ok
+        x, y = x[valid], y[valid]
+        type_names, type_ids = tokens.as_ids(tokens.field(rows[valid], 2))
+        
+        if sitemap_dimensions:
+            width, height = sitemap_dimensions
+        else:
+            width = int(x.max()) + 1 if len(x) else 0
+            height = int(y.max()) + 1 if len(y) else 0
+        
+        site_grid, out_of_bounds = SiteGrid.from_columns(width, height, x, y, type_names, type_ids)
+        if out_of_bounds:
+            print(f"Warning: {out_of_bounds} SITEMAP entries lie outside the {width} x {height} fabric")
+        return site_grid
+    
     def parse_wts_file(self, wts_file_path):
         """Parse .wts file to get timing weights."""
         weights = {}
         weight_count = 0
         
         try:
-            with open(wts_file_path, 'r') as f:
-                lines = f.readlines()
-                
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        net_name = parts[0]
-                        weight = float(parts[1])
-                        weights[net_name] = weight
-                        weight_count += 1
+            tokens = TokenizedFile(wts_file_path)
+            rows = tokens.rows(min_fields=2)
+            values = tokens.as_float(tokens.field(rows, 1))
+            weights = dict(zip(tokens.as_strings(tokens.field(rows, 0)), values.tolist()))
+            weight_count = len(rows)
                         
         except Exception as e:
-            print(f"Error parsing wts file {wts_file_path}: {e}")
+            self.parse_error(f"Error parsing wts file {wts_file_path}: {e}")
             
         return weights, weight_count
     
     def count_site_types_from_scl(self, scl_file_path):
-        """Efficiently count site types from SCL file without storing all entries."""
+        """Count site types from an SCL file (analyze_directory() takes them from the site grid instead)."""
         site_type_counts = Counter()
         
         try:
-            with open(scl_file_path, 'r') as f:
-                in_sitemap = False
-                for line in f:
-                    line = line.strip()
+            tokens = TokenizedFile(scl_file_path)
+            header_line, end_line = sitemap_section(tokens)
+            if header_line >= 0:
+                sitemap_dimensions = read_sitemap_dimensions(tokens, header_line)
+                site_type_counts = self.load_site_grid(tokens, header_line, end_line, sitemap_dimensions).counts()
                     
-                    if line.startswith('SITEMAP'):
-                        in_sitemap = True
-                    elif line.startswith('END SITEMAP'):
-                        in_sitemap = False
-                    elif in_sitemap and line and not line.startswith('SITEMAP'):
-                        parts = line.split()
-                        if len(parts) >= 3:
-                            try:
-                                site_type = parts[2]
-                                site_type_counts[site_type] += 1
-                            except (ValueError, IndexError):
-                                continue
-                        
         except Exception as e:
-            print(f"Error counting site types from scl file {scl_file_path}: {e}")
+            self.parse_error(f"Error counting site types from scl file {scl_file_path}: {e}")
             
         return site_type_counts
     
-    def analyze_directory(self):
-        """Analyze all Bookshelf files in the directory. Find all the files and parse them."""
+    def analyze_directory(self, reuse=None, sections=None):
+        """Analyze all Bookshelf files in the directory. Find all the files and parse them.
+        
+        reuse is another, already analyzed BookshelfAnalyzer: files with the
+        same content as its files are taken from its results instead of being
+        parsed again (see reuse_parse_results()).
+        
+        sections limits the parse to the files those report sections read
+        (see REPORT_SECTIONS); anything else is loaded on first use by
+        load_files(). Only a full analysis uses the parse cache, since its
+        check covers every file.
+        """
         print(f"Analyzing Bookshelf files in: {self.directory_path}")
         
         aux_files = list(self.directory_path.glob("*.aux"))
@@ -332,28 +429,71 @@ class BookshelfAnalyzer:
             return None
             
         aux_file = aux_files[0]
-        design_name = aux_file.stem
+        self.design_name = aux_file.stem
         
-        self.aux_data = self.parse_aux_file(aux_file)
+        files = {'aux': aux_file}
+        for kind in FILE_KINDS[1:]:
+            files[kind] = self.directory_path / f"{self.design_name}.{kind}"
+        self.files, self.digests, self.reused_kinds, self.loaded_kinds = files, {}, set(), set()
         
-        lib_file = self.directory_path / f"{design_name}.lib"
-        nodes_file = self.directory_path / f"{design_name}.nodes"
-        nets_file = self.directory_path / f"{design_name}.nets"
-        pl_file = self.directory_path / f"{design_name}.pl"
-        scl_file = self.directory_path / f"{design_name}.scl"
-        wts_file = self.directory_path / f"{design_name}.wts"
+        # A warm cache entry replaces all of the text parsing below
+        sources = list(dict.fromkeys(files.values()))
+        cache = ParseCache(self.directory_path, self.design_name, self.cache_dir) if self.use_cache and sections is None else None
+        with phase('cache_load'):
+            cached = cache.load('analysis', sources) if cache else None
+        
+        self.reset_parse_results()
+        self.parse_timings = {}
+        if cached:
+            print(f"Using cached parse: {cache.path}")
+            self.restore_parse_results(*cached)
+            self.loaded_kinds = set(FILE_KINDS)
+            self.collect_analysis_results()
+        else:
+            self.reused_kinds = self.reuse_parse_results(reuse) if reuse else set()
+            self.load_files(FILE_KINDS if sections is None else section_files(sections))
+            
+            # A design with parse errors isn't cached, so the errors show up again on the next run
+            if cache and not self.parse_errors:
+                with phase('cache_store'):
+                    cache.store('analysis', sources, *self.dump_parse_results())
         
-        self.cells = self.parse_lib_file(lib_file) if lib_file.exists() else {}
-        self.instances, self.instance_types = self.parse_nodes_file(nodes_file) if nodes_file.exists() else ({}, Counter())
-        self.nets, self.net_count = self.parse_nets_file(nets_file) if nets_file.exists() else ({}, 0)
-        self.fixed_instances, self.fixed_types = self.parse_pl_file(pl_file) if pl_file.exists() else ({}, Counter())
-        self.sites, self.resources, self.site_map, self.sitemap_dimensions = self.parse_scl_file(scl_file) if scl_file.exists() else ({}, {}, [], None)
-        self.weights, self.weight_count = self.parse_wts_file(wts_file) if wts_file.exists() else ({}, 0)
+        return self.analysis_results
+    
+    def load_files(self, kinds):
+        """Parse the design files of the given kinds that aren't loaded yet.
         
-        self.site_type_counts = self.count_site_types_from_scl(scl_file) if scl_file.exists() else Counter()
+        This is how sections get their data lazily: a report section or a
+        placement check asks for the files it reads, and only those still
+        missing are parsed (in the order of FILE_KINDS, with --jobs workers),
+        then joined up with what is already loaded. Returns the kinds loaded.
+        """
+        missing = [kind for kind in FILE_KINDS if kind in kinds and kind in self.files and kind not in self.loaded_kinds]
+        if not missing:
+            return []
         
+        parse_start = time.perf_counter()
+        self.loaded_kinds.update(missing)
+        jobs = [(kind, self.files[kind]) for kind in missing
+                if self.files[kind].exists() and kind not in self.reused_kinds]
+        if self.jobs > 1 and jobs:
+            with phase('parse_files_parallel', [path for _, path in jobs]) as record:
+                record['jobs'] = self.jobs
+                self.parse_files_parallel(jobs)
+        else:
+            for kind, path in jobs:
+                start = time.perf_counter()
+                self.parse_file(kind, path)
+                self.parse_timings[kind] = time.perf_counter() - start
+        self.finish_parse()
+        self.print_parse_timings(self.files, time.perf_counter() - parse_start, missing)
+        self.collect_analysis_results()
+        return missing
+    
+    def collect_analysis_results(self):
+        """Gather the parse results into self.analysis_results (redone after every load)."""
         self.analysis_results = { # these are all the stats and results from the bookshelf file
-            'design_name': design_name,
+            'design_name': self.design_name,
             'aux_data': self.aux_data,
             'cells': self.cells,
             'instances': self.instances,
@@ -367,17 +507,381 @@ class BookshelfAnalyzer:
             'site_map': self.site_map,
             'sitemap_dimensions': self.sitemap_dimensions,
             'site_type_counts': self.site_type_counts,
+            'site_grid': self.site_grid,
             'weights': self.weights,
             'weight_count': self.weight_count
         }
-        
         return self.analysis_results
     
-    def generate_text_report(self, output_file=None): # make a report/save for later
-        """Generate a comprehensive text report."""
+    def reset_parse_results(self):
+        """Empty parse results, used for any file that is missing from the design."""
+        self.design = DesignModel()
+        self.aux_data = {}
+        self.cells = {}
+        self.net_count = 0
+        self.sites, self.resources, self.site_map, self.sitemap_dimensions = {}, {}, [], None
+        self.site_grid = SiteGrid()
+        self.site_type_counts = Counter()
+        self.weights, self.weight_count = {}, 0
+        self.parse_errors = []
+    
+    def file_digests(self):
+        """{kind: content hash} of the design files found by analyze_directory(), computed once."""
+        for kind, path in self.files.items():
+            if kind not in self.digests and path.exists():
+                self.digests[kind] = file_digest(path)
+        return self.digests
+    
+    def reuse_parse_results(self, other):
+        """Take the parse results of every file whose content matches a file of other.
+        
+        Returns the set of reused kinds. Arrays are shared, not copied; .nets
+        results are only reused together with the .nodes they were resolved
+        against, and the placement gets its own copy so it can be resolved
+        against this design's instances.
+        """
+        mine, theirs = self.file_digests(), other.file_digests()
+        reused = {kind for kind, digest in mine.items() if theirs.get(kind) == digest and kind != 'aux'}
+        if 'nodes' not in reused:
+            reused.discard('nets')
+        for kind in reused:
+            for name in PARSE_JOB_OUTPUTS[kind]:
+                setattr(self, name, getattr(other, name))
+            for name in PARSE_JOB_DESIGN_OUTPUTS.get(kind, ()):
+                setattr(self.design, name, getattr(other.design, name))
+            if kind == 'pl':
+                self.design.placement = copy.copy(other.design.placement)
+            self.parse_timings[kind] = 0.0
+        return reused
+    
+    def parse_file(self, kind, file_path, start=0, end=None):
+        """Run the parser for one kind of file ('aux', 'lib', 'nodes', ...) and keep its results.
+        
+        start/end select a chunk of the file, only used for 'nodes' and 'nets'.
+        """
+        if kind not in FILE_KINDS:
+            raise ValueError(f"Unknown Bookshelf file kind: {kind}")
+        with phase(f"parse_{kind}_file", file_path, start, end):
+            if kind == 'aux':
+                self.aux_data = self.parse_aux_file(file_path)
+            elif kind == 'lib':
+                self.cells = self.parse_lib_file(file_path)
+            elif kind == 'nodes':
+                self.parse_nodes_file(file_path, start, end)
+            elif kind == 'nets':
+                _, self.net_count = self.parse_nets_file(file_path, start, end)
+            elif kind == 'pl':
+                self.parse_pl_file(file_path)
+            elif kind == 'scl':
+                self.sites, self.resources, self.site_map, self.sitemap_dimensions = self.parse_scl_file(file_path)
+            elif kind == 'wts':
+                self.weights, self.weight_count = self.parse_wts_file(file_path)
+        if kind == 'scl':
+            with phase('count_site_types'):
+                self.site_type_counts = self.site_grid.counts()
+    
+    def parse_files_parallel(self, jobs):
+        """Parse the files in a process pool and merge each worker's results.
+        
+        .nodes/.nets files bigger than chunk_bytes are split into chunks (at
+        line / net boundaries) that are parsed by separate workers and merged
+        back in file order, giving the same result as the serial parser.
+        Biggest jobs are submitted first so the wall time ends up close to the
+        cost of the largest one. Instance lookups for .nets/.pl are left to
+        finish_parse() since the .nodes names live in another worker.
+        """
+        tasks = []
+        for kind, path in jobs:
+            size = path.stat().st_size
+            if kind in CHUNKED_KINDS and size > self.chunk_bytes:
+                chunks = find_chunks(path, -(-size // self.chunk_bytes), CHUNKED_KINDS[kind])
+            else:
+                chunks = [(0, None)]
+            tasks.extend((kind, path, start, end, (end if end is not None else size) - start)
+                         for start, end in chunks)
+        tasks.sort(key=lambda task: task[4], reverse=True)
+        
+        chunk_results = defaultdict(dict)
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(tasks))) as pool:
+            futures = [pool.submit(_parse_file_job, kind, path, start, end) for kind, path, start, end, _ in tasks]
+            for future in as_completed(futures):
+                kind, start, outputs, design_outputs, elapsed, errors = future.result()
+                chunk_results[kind][start] = (outputs, design_outputs)
+                self.parse_errors.extend(errors)
+                self.parse_timings[kind] = self.parse_timings.get(kind, 0.0) + elapsed
+        
+        for kind, results in chunk_results.items():
+            ordered = [results[start] for start in sorted(results)]
+            if len(ordered) == 1:
+                outputs, design_outputs = ordered[0]
+                for name, value in outputs.items():
+                    setattr(self, name, value)
+                for name, value in design_outputs.items():
+                    setattr(self.design, name, value)
+            elif kind == 'nodes':
+                self.design.merge_node_chunks([design_outputs for _, design_outputs in ordered])
+            elif kind == 'nets':
+                self.design.merge_net_chunks([design_outputs for _, design_outputs in ordered])
+                self.net_count = sum(outputs['net_count'] for outputs, _ in ordered)
+    
+    def finish_parse(self):
+        """Post-pass after all files are parsed: join names across files and build the views."""
+        design = self.design
+        with phase('finish_parse'):
+            design.resolve_instances()
+            design.resolve_pin_directions(self.cells)
+            self.instances, self.instance_types = InstancesView(design), design.instance_type_counts()
+            self.nets = NetsView(design)
+            self.fixed_instances, self.fixed_types = PlacementView(design.placement), self.count_fixed_types()
+    
+    def print_parse_timings(self, files, wall_time, kinds=None):
+        """Print how long each file (of kinds, default all) took to parse and the overall wall time."""
+        timings = {kind: elapsed for kind, elapsed in self.parse_timings.items() if kinds is None or kind in kinds}
+        print(f"Parse timings ({self.jobs} job{'s' if self.jobs > 1 else ''}):")
+        for kind, elapsed in sorted(timings.items(), key=lambda item: -item[1]):
+            size = files[kind].stat().st_size
+            reused = " (reused, same content)" if kind in self.reused_kinds else ""
+            print(f"  {kind:<11} {files[kind].name:<16} {size / 1e6:8.2f} MB {elapsed:8.3f} s{reused}")
+        print(f"  {'wall time':<28} {'':11} {wall_time:8.3f} s")
+    
+    def dump_parse_results(self):
+        """Split the parsed design into (arrays, strings, meta) for the parse cache."""
+        design = self.design
+        placement = design.placement
+        arrays = {
+            'inst_cell': design.inst_cell,
+            'net_degree': design.net_degree,
+            'net_offsets': design.net_offsets,
+            'pin_inst': design.pin_inst,
+            'pin_libpin': design.pin_libpin,
+            'pl_inst': placement.inst,
+            'pl_x': placement.x,
+            'pl_y': placement.y,
+            'pl_bel': placement.bel,
+            'pl_fixed': placement.fixed,
+            'site_grid': self.site_grid.grid,
+            'weight_values': np.array(list(self.weights.values()), dtype=np.float64)
+        }
+        strings = {
+            'instance_names': design.instance_names.names,
+            'cell_names': design.cell_names.names,
+            'pin_names': design.pin_names.names,
+            'net_names': design.net_names.names,
+            'pl_names': placement.names.names,
+            'site_types': self.site_grid.type_names,
+            'weight_names': list(self.weights)
+        }
+        meta = {
+            'aux_data': self.aux_data,
+            'cells': self.cells,
+            'sites': self.sites,
+            'resources': self.resources,
+            'sitemap_dimensions': self.sitemap_dimensions,
+            'net_count': self.net_count,
+            'weight_count': self.weight_count
+        }
+        return arrays, strings, meta
+    
+    def restore_parse_results(self, arrays, strings, meta):
+        """Rebuild the parse results from a parse cache entry (inverse of dump_parse_results)."""
+        design = self.design
+        design.instance_names = StringTable.from_names(strings['instance_names'])
+        design.cell_names = StringTable.from_names(strings['cell_names'])
+        design.pin_names = StringTable.from_names(strings['pin_names'])
+        design.net_names = StringTable.from_names(strings['net_names'])
+        design.inst_cell = arrays['inst_cell']
+        design.net_degree = arrays['net_degree']
+        design.net_offsets = arrays['net_offsets']
+        design.pin_inst = arrays['pin_inst']
+        design.pin_libpin = arrays['pin_libpin']
+        
+        placement = design.placement
+        placement.names = StringTable.from_names(strings['pl_names'])
+        placement.inst = arrays['pl_inst']
+        placement.x = arrays['pl_x']
+        placement.y = arrays['pl_y']
+        placement.bel = arrays['pl_bel']
+        placement.fixed = arrays['pl_fixed']
+        
+        self.aux_data = meta['aux_data']
+        self.cells = meta['cells']
+        self.net_count = meta['net_count']
+        self.sites = meta['sites']
+        self.resources = meta['resources']
+        site_grid = arrays['site_grid']
+        self.site_grid = SiteGrid(site_grid.shape[1], site_grid.shape[0], strings['site_types'], site_grid)
+        self.site_map = SiteMapView(self.site_grid)
+        self.sitemap_dimensions = tuple(meta['sitemap_dimensions']) if meta['sitemap_dimensions'] else None
+        self.site_type_counts = self.site_grid.counts()
+        self.weights = dict(zip(strings['weight_names'], arrays['weight_values'].tolist()))
+        self.weight_count = meta['weight_count']
+        self.finish_parse()
+    
+    def evaluate_placement(self, pl_file_path, hpwl=True, legality=False, timing=False, congestion=False,
+                           use_weights=True, delay_dir=None, clock_period=None, route_capacity=None,
+                           congestion_image=None, density_bins=None, output_file=None):
+        """Score a full placement .pl against the parsed design and print/save the result.
+        
+        hpwl reports the wirelength over the parsed nets, legality checks the
+        placement against the site map, SITE capacities and the design's own
+        FIXED locations, timing runs the static timing estimate with the delay
+        tables in delay_dir and congestion builds the RUDY wire density map
+        (saved as an image to congestion_image when given). Returns
+        {'hpwl': ..., 'legality': ..., 'timing': ..., 'congestion': ...} for the
+        checks run. density_bins=(width, height) adds the bin density report
+        of the placement.
+        """
+        start = time.perf_counter()
+        placement = read_placement_file(pl_file_path)
+        timings = [f"Placement read in {time.perf_counter() - start:.3f}s"]
+        results = {}
+        
+        report = [f"Placement: {pl_file_path} ({len(placement)} instances)"]
+        
+        if hpwl:
+            start = time.perf_counter()
+            results['hpwl'] = evaluate_hpwl(self.design, placement, self.weights if use_weights else None)
+            timings.append(f"HPWL computed in {time.perf_counter() - start:.3f}s")
+            report.extend(format_hpwl_report(self.design, results['hpwl']))
+            report.append("")
+        
+        if legality:
+            start = time.perf_counter()
+            reference = self.design.placement
+            results['legality'] = check_legality(self.design, placement, self.site_grid, self.sites,
+                                                 self.resources, reference)
+            timings.append(f"legality checked in {time.perf_counter() - start:.3f}s")
+            report.extend(format_legality_report(self.design, placement, results['legality'], reference))
+            report.append("")
+        
+        if timing:
+            start = time.perf_counter()
+            results['timing'] = analyze_timing(self.design, self.cells, placement, delay_dir, clock_period)
+            timings.append(f"timing analyzed in {time.perf_counter() - start:.3f}s")
+            report.extend(format_timing_report(self.design, results['timing']))
+            report.append("")
+        
+        if congestion:
+            start = time.perf_counter()
+            width, height = self.site_grid.width, self.site_grid.height
+            if width == 0 or height == 0:
+                report.append("Unable to estimate congestion - missing site map")
+            else:
+                demand = rudy_map(self.design, placement, width, height, self.weights if use_weights else None)
+                mask = self.site_grid.grid != SiteGrid.EMPTY if self.site_grid.num_sites() else None
+                results['congestion'] = dict(congestion_stats(demand, route_capacity, mask), demand=demand)
+                timings.append(f"congestion estimated in {time.perf_counter() - start:.3f}s")
+                report.extend(format_congestion_report(results['congestion']))
+                if congestion_image:
+                    create_congestion_visualization(demand, congestion_image, route_capacity,
+                                                    f"{self.analysis_results['design_name']} RUDY Congestion")
+                    report.append(f"Congestion map saved to: {congestion_image}")
+            report.append("")
+        
+        if density_bins:
+            start = time.perf_counter()
+            results['density'] = RegionResources(self.site_grid, self.sites, self.resources, self.design, placement)
+            timings.append(f"region density computed in {time.perf_counter() - start:.3f}s")
+            report.extend(format_density_report(results['density'], *density_bins))
+            report.append("")
+        
+        report.append(", ".join(timings))
+        print('\n'.join(report))
+        
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write('\n'.join(report))
+            print(f"\nReport saved to: {output_file}")
+        
+        return results
+    
+    def utilization(self):
+        """compute_utilization() result for the design on its device."""
+        self.load_files(REPORT_SECTIONS['utilization'])
+        with phase('utilization'):
+            return compute_utilization(self.design, self.site_grid, self.sites, self.resources)
+    
+    def resource_utilization(self):
+        """{resource: (used, available)} over the whole device.
+        
+        Available is the SITE capacity summed over the site map, used counts
+        the instances whose cell the RESOURCES section maps to the resource.
+        """
+        result = self.utilization()
+        return {name: (used, available) for name, used, available
+                in zip(result['resource_names'], result['used'].tolist(), result['supply'].tolist())}
+    
+    def export_results(self, output_dir, table_format='auto'):
+        """Write the design as summary.jsonl plus columnar instance / net / pin / site tables.
+        
+        See bookshelf_export.py for the layout; every design file is loaded
+        first. Returns {file name: rows}.
+        """
+        self.load_files(FILE_KINDS)
+        start = time.perf_counter()
+        written = export_design(self, output_dir, table_format)
+        print(f"Exported {', '.join(f'{name} ({rows:,} rows)' for name, rows in written.items())} "
+              f"to {output_dir} in {time.perf_counter() - start:.3f}s")
+        return written
+    
+    def compare_placements(self, before_file, after_file, heat_map=None, output_file=None):
+        """Diff two placement .pl files of this design and print/save the report.
+        
+        Each file is read once; instances are aligned on design instance ids.
+        FIXED violations are checked against the FIXED rows of the before file
+        and of the design's own .pl. heat_map is an image file for the mean
+        displacement per site. Returns the diff_placements() result.
+        """
+        start = time.perf_counter()
+        before = read_placement_file(before_file)
+        after = read_placement_file(after_file)
+        timings = [f"Placements read in {time.perf_counter() - start:.3f}s"]
+        
+        start = time.perf_counter()
+        result = diff_placements(self.design, before, after, self.design.placement)
+        timings.append(f"diffed in {time.perf_counter() - start:.3f}s")
+        
+        report = [f"Before: {before_file} ({len(before)} instances)", f"After: {after_file} ({len(after)} instances)"]
+        report.extend(format_placement_diff_report(self.design, result))
+        report.append("")
+        
+        if heat_map:
+            width, height = self.site_grid.width, self.site_grid.height
+            if width == 0 or height == 0:
+                report.append("Unable to draw displacement map - missing site map")
+            else:
+                displacement = displacement_map(result, width, height)
+                create_heat_map_visualization(displacement, heat_map, max(float(displacement.max()), 1.0),
+                                              f"{self.analysis_results['design_name']} Displacement",
+                                              'mean displacement (sites)')
+                report.append(f"Displacement map saved to: {heat_map}")
+            report.append("")
+        
+        report.append(", ".join(timings))
+        print('\n'.join(report))
+        
+        if output_file:
+            with open(output_file, 'w') as f:
+                f.write('\n'.join(report))
+            print(f"\nReport saved to: {output_file}")
+        
+        return result
+    
+    def generate_text_report(self, output_file=None, density_bins=None, sections=None): # make a report/save for later
+        """Generate a comprehensive text report.
+        
+        density_bins=(width, height) appends the per-bin resource density of
+        the design's .pl placement, flagging over-utilized bins; that .pl only
+        places the FIXED instances, so the report says so. sections
+        limits the report to some of REPORT_SECTIONS (default: all of them);
+        files those sections read that aren't parsed yet are loaded first.
+        """
         if not self.analysis_results:
             print("No analysis results available. Run analyze_directory() first.")
             return
+        
+        sections = list(REPORT_SECTIONS) if sections is None else sections
+        self.load_files(section_files(sections) | (set(DENSITY_FILES) if density_bins else set()))
             
         report = []
         report.append("=" * 80)
@@ -387,156 +891,123 @@ class BookshelfAnalyzer:
         report.append(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         report.append("")
         
-        aux_data = self.analysis_results['aux_data']
-        report.append("AUX FILE INFORMATION:")
-        report.append("-" * 30)
-        report.append(f"Version: {aux_data.get('version', 'Unknown')}")
-        report.append(f"Date: {aux_data.get('date', 'Unknown')}")
-        report.append(f"Included Files: {', '.join(aux_data.get('included_files', []))}")
-        report.append("")
+        if 'aux' in sections:
+            aux_data = self.analysis_results['aux_data']
+            report.append("AUX FILE INFORMATION:")
+            report.append("-" * 30)
+            report.append(f"Version: {aux_data.get('version', 'Unknown')}")
+            report.append(f"Date: {aux_data.get('date', 'Unknown')}")
+            report.append(f"Included Files: {', '.join(aux_data.get('included_files', []))}")
+            report.append("")
         
-        cells = self.analysis_results['cells']
-        report.append("LIBRARY CELLS:")
-        report.append("-" * 30)
-        report.append(f"Total Cell Types: {len(cells)}")
-        report.append("Cell Types:")
-        for cell_name, cell_info in cells.items():
-            report.append(f"  {cell_name}: {cell_info['pin_count']} pins")
-        report.append("")
+        if 'library' in sections:
+            cells = self.analysis_results['cells']
+            report.append("LIBRARY CELLS:")
+            report.append("-" * 30)
+            report.append(f"Total Cell Types: {len(cells)}")
+            report.append("Cell Types:")
+            for cell_name, cell_info in cells.items():
+                report.append(f"  {cell_name}: {cell_info['pin_count']} pins")
+            report.append("")
         
-        instance_types = self.analysis_results['instance_types']
-        report.append("Nodes:")
-        report.append("-" * 30)
-        report.append(f"Total Nodes: {len(self.analysis_results['instances'])}")
-        report.append("Node Types:")
-        for inst_type, count in instance_types.most_common():
-            report.append(f"  {inst_type}: {count}")
-        report.append("")
+        if 'nodes' in sections:
+            instance_types = self.analysis_results['instance_types']
+            report.append("Nodes:")
+            report.append("-" * 30)
+            report.append(f"Total Nodes: {len(self.analysis_results['instances'])}")
+            report.append("Node Types:")
+            for inst_type, count in instance_types.most_common():
+                report.append(f"  {inst_type}: {count}")
+            report.append("")
         
-        report.append("NETS:")
-        report.append("-" * 30)
-        report.append(f"Total Nets: {self.analysis_results['net_count']}")
-        if self.analysis_results['nets']:
-            pin_counts = [net['pin_count'] for net in self.analysis_results['nets'].values()]
-            report.append(f"Average Pins per Net: {sum(pin_counts) / len(pin_counts):.2f}")
-            report.append(f"Min Pins per Net: {min(pin_counts)}")
-            report.append(f"Max Pins per Net: {max(pin_counts)}")
-        report.append("")
+        if 'nets' in sections:
+            report.append("NETS:")
+            report.append("-" * 30)
+            report.append(f"Total Nets: {self.analysis_results['net_count']}")
+            pin_counts = self.design.net_degree
+            if len(pin_counts):
+                # Straight from the degree column; NetsView.values() would build every net's connections
+                report.append(f"Average Pins per Net: {int(pin_counts.sum(dtype=np.int64)) / len(pin_counts):.2f}")
+                report.append(f"Min Pins per Net: {int(pin_counts.min())}")
+                report.append(f"Max Pins per Net: {int(pin_counts.max())}")
+            report.append("")
         
-        fixed_types = self.analysis_results['fixed_types']
-        report.append("FIXED INSTANCES:")
-        report.append("-" * 30)
-        report.append(f"Total Fixed Instances: {len(self.analysis_results['fixed_instances'])}")
-        report.append("Fixed Instance Types:")
-        for inst_type, count in fixed_types.most_common():
-            report.append(f"  {inst_type}: {count}")
-        report.append("")
+        if 'fixed' in sections:
+            fixed_types = self.analysis_results['fixed_types']
+            report.append("FIXED INSTANCES:")
+            report.append("-" * 30)
+            report.append(f"Total Fixed Instances: {len(self.analysis_results['fixed_instances'])}")
+            report.append("Fixed Instance Types:")
+            for inst_type, count in fixed_types.most_common():
+                report.append(f"  {inst_type}: {count}")
+            report.append("")
         
         sites = self.analysis_results['sites']
         resources = self.analysis_results['resources']
-        report.append("SITES AND RESOURCES:")
-        report.append("-" * 30)
-        report.append(f"Total Site Types: {len(sites)}")
-        report.append("Site Types:")
-        for site_name, site_info in sites.items():
-            report.append(f"  {site_name}: {site_info['resources']}")
-        report.append("")
-        report.append(f"Total Resource Types: {len(resources)}")
-        report.append("Resource Types:")
-        for res_type, cell_names in resources.items():
-            report.append(f"  {res_type}: {', '.join(cell_names)}")
-        report.append("")
-        
-        site_map = self.analysis_results['site_map']
-        sitemap_dimensions = self.analysis_results['sitemap_dimensions']
-        site_type_counts = self.analysis_results['site_type_counts']
-        report.append("SITE MAP:")
-        report.append("-" * 30)
-        if sitemap_dimensions:
-            report.append(f"FPGA Fabric Dimensions: {sitemap_dimensions[0]} x {sitemap_dimensions[1]} sites")
-        else:
-            report.append("FPGA Fabric Dimensions: Not found")
-        report.append("")
-        report.append("Site Map Information:")
-        report.append(f"  Total Sites in Map: {sum(site_type_counts.values())}")
-        report.append("")
+        if 'sites' in sections:
+            report.append("SITES AND RESOURCES:")
+            report.append("-" * 30)
+            report.append(f"Total Site Types: {len(sites)}")
+            report.append("Site Types:")
+            for site_name, site_info in sites.items():
+                report.append(f"  {site_name}: {site_info['resources']}")
+            report.append("")
+            report.append(f"Total Resource Types: {len(resources)}")
+            report.append("Resource Types:")
+            for res_type, cell_names in resources.items():
+                report.append(f"  {res_type}: {', '.join(cell_names)}")
+            report.append("")
         
-        report.append("Site Type Distribution:")
-        for site_type, count in site_type_counts.most_common():
-            report.append(f"  {site_type}: {count}")
+        if 'sitemap' in sections:
+            sitemap_dimensions = self.analysis_results['sitemap_dimensions']
+            site_type_counts = self.analysis_results['site_type_counts']
+            supply = site_supply(self.site_grid, sites)
+            report.append("SITE MAP:")
+            report.append("-" * 30)
+            if sitemap_dimensions:
+                report.append(f"FPGA Fabric Dimensions: {sitemap_dimensions[0]} x {sitemap_dimensions[1]} sites")
+            else:
+                report.append("FPGA Fabric Dimensions: Not found")
+            report.append("")
+            report.append("Site Map Information:")
+            report.append(f"  Total Sites in Map: {sum(site_type_counts.values())}")
+            report.append("")
             
-            if site_type in sites:
-                site_resources = sites[site_type]['resources']
+            report.append("Site Type Distribution:")
+            for site_type, count in site_type_counts.most_common():
+                report.append(f"  {site_type}: {count}")
+                
+                _, site_resources = supply.get(site_type, (0, {}))
                 if site_resources:
                     report.append("    Total Resources:")
-                    for resource_type, resource_count in site_resources.items():
-                        total_resources = resource_count * count
+                    for resource_type, total_resources in site_resources.items():
                         report.append(f"      {resource_type}: {total_resources:,}")
-        report.append("")
-        
-        report.append("TIMING WEIGHTS:")
-        report.append("-" * 30)
-        report.append(f"Total Weights: {self.analysis_results['weight_count']}")
-        if self.analysis_results['weights']:
-            weight_values = list(self.analysis_results['weights'].values())
-            report.append(f"Average Weight: {sum(weight_values) / len(weight_values):.4f}")
-            report.append(f"Min Weight: {min(weight_values):.4f}")
-            report.append(f"Max Weight: {max(weight_values):.4f}")
-        report.append("")
+            report.append("")
         
-        # Calculate and report utilization
-        report.append("RESOURCE UTILIZATION:")
-        report.append("-" * 30)
+        if 'weights' in sections:
+            report.append("TIMING WEIGHTS:")
+            report.append("-" * 30)
+            report.append(f"Total Weights: {self.analysis_results['weight_count']}")
+            if self.analysis_results['weights']:
+                weight_values = list(self.analysis_results['weights'].values())
+                report.append(f"Average Weight: {sum(weight_values) / len(weight_values):.4f}")
+                report.append(f"Min Weight: {min(weight_values):.4f}")
+                report.append(f"Max Weight: {max(weight_values):.4f}")
+            report.append("")
         
-        # Calculate total available resources
-        total_resources = {}
-        sites = self.analysis_results['sites']
-        site_type_counts = self.analysis_results['site_type_counts']
-        
-        for site_type, count in site_type_counts.items():
-            if site_type in sites:
-                site_resources = sites[site_type]['resources']
-                for resource_type, resource_count in site_resources.items():
-                    if resource_type not in total_resources:
-                        total_resources[resource_type] = 0
-                    total_resources[resource_type] += resource_count * count
-        
-        # Get instance counts by type
-        instance_types = self.analysis_results['instance_types']
-        
-        # Calculate utilization for each resource type
-        if total_resources and instance_types:
-            report.append("Resource Utilization by Type:")
-            resources = self.analysis_results['resources']
+        if 'utilization' in sections:
+            # Calculate and report utilization
+            report.append("RESOURCE UTILIZATION:")
+            report.append("-" * 30)
             
-            for resource_type, total_available in total_resources.items():
-                # Find instances that use this resource type using the RESOURCES mapping
-                used_count = 0
-                if resource_type in resources:
-                    # Get the cell types that can use this resource
-                    compatible_cells = resources[resource_type]
-                    for instance_type, count in instance_types.items():
-                        if instance_type in compatible_cells:
-                            used_count += count
-                else:
-                    # Fallback to simple string matching if no explicit mapping
-                    for instance_type, count in instance_types.items():
-                        if resource_type.lower() in instance_type.lower() or instance_type.lower() in resource_type.lower():
-                            used_count += count
-                
-                utilization_percent = (used_count / total_available * 100) if total_available > 0 else 0
-                report.append(f"  {resource_type}: {used_count:,} / {total_available:,} ({utilization_percent:.2f}%)")
-            
-            # Calculate overall utilization
-            total_used = sum(instance_types.values())
-            total_available = sum(total_resources.values())
-            overall_utilization = (total_used / total_available * 100) if total_available > 0 else 0
+            report.extend(format_utilization_report(self.utilization()))
+            report.append("")
+        
+        if density_bins:
+            regions = RegionResources(self.site_grid, self.sites, self.resources, self.design, self.design.placement)
+            report.extend(format_density_report(regions, *density_bins, demand_note=FIXED_ONLY_DENSITY_NOTE))
             report.append("")
-            report.append(f"Overall Resource Utilization: {total_used:,} / {total_available:,} ({overall_utilization:.2f}%)")
-        else:
-            report.append("Unable to calculate utilization - missing resource or instance data")
         
-        report.append("")
         report.append("=" * 80)
         
         print('\n'.join(report))
@@ -548,27 +1019,184 @@ class BookshelfAnalyzer:
             
         return '\n'.join(report)
 
+# Design file kinds, in parse order (the .aux comes first, the rest are named after it)
+FILE_KINDS = ('aux', 'lib', 'nodes', 'nets', 'pl', 'scl', 'wts')
+
+# Report sections, in report order, and the design files each one reads
+REPORT_SECTIONS = {
+    'aux': ('aux',),
+    'library': ('lib',),
+    'nodes': ('nodes',),
+    'nets': ('nets',),
+    'fixed': ('nodes', 'pl'),
+    'sites': ('scl',),
+    'sitemap': ('scl',),
+    'weights': ('wts',),
+    'utilization': ('nodes', 'scl'),
+}
+
+# Demand of --density-map without a placement file: the design's .pl only has its FIXED rows
+FIXED_ONLY_DENSITY_NOTE = ("Demand: FIXED instances of the design's .pl only (IO, BUFGCE, ...); "
+                           "pass a placement with --hpwl/--legality to count every instance")
+
+# --density-map also needs the design's own placement
+DENSITY_FILES = ('nodes', 'pl', 'scl')
+
+
+def section_files(sections):
+    """Set of file kinds read by the given report sections."""
+    return {kind for section in sections for kind in REPORT_SECTIONS[section]}
+
+
+# What each parse job leaves on the analyzer / design model, sent back from the pool workers
+PARSE_JOB_OUTPUTS = {
+    'aux': ('aux_data',),
+    'lib': ('cells',),
+    'nodes': (),
+    'nets': ('net_count',),
+    'pl': (),
+    'scl': ('sites', 'resources', 'site_map', 'sitemap_dimensions', 'site_grid', 'site_type_counts'),
+    'wts': ('weights', 'weight_count')
+}
+PARSE_JOB_DESIGN_OUTPUTS = {
+    'nodes': ('instance_names', 'cell_names', 'inst_cell'),
+    'nets': ('net_names', 'pin_names', 'pin_instance_names', 'net_degree', 'net_offsets', 'pin_inst', 'pin_libpin'),
+    'pl': ('placement',)
+}
+
+
+# Files that may be split into chunks, and the line prefix a chunk has to start on
+CHUNKED_KINDS = {'nodes': None, 'nets': b'net'}
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def _parse_file_job(kind, file_path, start=0, end=None):
+    """Process pool entry point: parse one file (or chunk) in a fresh analyzer and return its results."""
+    analyzer = BookshelfAnalyzer(Path(file_path).parent, use_cache=False)
+    analyzer.reset_parse_results()
+    began = time.perf_counter()
+    analyzer.parse_file(kind, file_path, start, end)
+    elapsed = time.perf_counter() - began
+    outputs = {name: getattr(analyzer, name) for name in PARSE_JOB_OUTPUTS[kind]}
+    design_outputs = {name: getattr(analyzer.design, name) for name in PARSE_JOB_DESIGN_OUTPUTS.get(kind, ())}
+    return kind, start, outputs, design_outputs, elapsed, analyzer.parse_errors
+
+
+def section_list(text):
+    """argparse type for a comma separated list of REPORT_SECTIONS names."""
+    sections = [section.strip() for section in text.split(',') if section.strip()]
+    unknown = [section for section in sections if section not in REPORT_SECTIONS]
+    if unknown or not sections:
+        raise argparse.ArgumentTypeError(f"unknown report section '{','.join(unknown)}', "
+                                         f"expected some of: {', '.join(REPORT_SECTIONS)}")
+    return sections
+
+
+def bin_size(text):
+    """argparse type for 'WxH' (or a single 'N' for square) bin sizes in sites."""
+    try:
+        parts = [int(part) for part in text.lower().split('x')]
+    except ValueError:
+        parts = []
+    if len(parts) == 1:
+        parts *= 2
+    if len(parts) != 2 or min(parts) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid bin size '{text}', expected e.g. 16x16")
+    return tuple(parts)
+
+
 ''' Start of main function'''
 def main():
     parser = argparse.ArgumentParser(description='Analyze Bookshelf format files for FPGA research')
     parser.add_argument('directory', help='Directory containing Bookshelf files')
     parser.add_argument('--output', '-o', help='Output directory for reports')
     parser.add_argument('--report', '-r', help='Output file for text report')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <design>.bkc beside the design files)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the text files, never read or write the parse cache')
+    parser.add_argument('--hpwl', metavar='PLACEMENT_PL', help='Report the half-perimeter wirelength of a full placement .pl instead of the design report')
+    parser.add_argument('--legality', metavar='PLACEMENT_PL', help='Check a full placement .pl for site, BEL capacity, overlap and FIXED location violations')
+    parser.add_argument('--timing', metavar='PLACEMENT_PL', help='Estimate timing (critical path, net slack) of a placement .pl with the UltraScale delay tables')
+    parser.add_argument('--delay-dir', help='Directory with logic_delays.txt / net_delays_x.txt / net_delays_y.txt (default: benchmarks/timing/ultrascale)')
+    parser.add_argument('--clock-period', type=float, help='With --timing, clock period for slacks (default: the critical path delay)')
+    parser.add_argument('--congestion', metavar='PLACEMENT_PL', help='Estimate routing congestion (RUDY) of a placement .pl and save the map to the --output directory')
+    parser.add_argument('--route-capacity', type=float, metavar='TRACKS', help='With --congestion, routing tracks per site (RUDY demand is in tracks per site); adds overflow figures against it')
+    parser.add_argument('--density-map', metavar='BINxBIN', type=bin_size, help='Add a resource supply/demand report over bins of BINxBIN sites (e.g. 8x60), flagging over-utilized bins')
+    parser.add_argument('--diff-pl', nargs=2, metavar=('BEFORE_PL', 'AFTER_PL'), help='Report what moved between two placement .pl files of the design and save a displacement map to the --output directory')
+    parser.add_argument('--sections', type=section_list,
+                        help=f"Only report these comma separated sections, parsing just the files they read ({', '.join(REPORT_SECTIONS)})")
+    parser.add_argument('--export', metavar='EXPORT_DIR', help='Also write summary.jsonl and per-instance/net/pin/site tables (.npz or .parquet) to EXPORT_DIR')
+    parser.add_argument('--export-format', choices=EXPORT_FORMATS, default='auto', help='Table format for --export (default: parquet if pyarrow is installed, else npz)')
+    parser.add_argument('--no-weights', action='store_true', help='With --hpwl, ignore the .wts net weights')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Parse the design files in N worker processes (default: 1)')
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_BYTES / (1024 * 1024),
+                        help='With --jobs, split .nodes/.nets files bigger than this into chunks (default: 16)')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    start_profiling(args, 'bookshelf_analyzer.py')
     
     if not os.path.exists(args.directory):
         print(f"Error: Directory '{args.directory}' does not exist")
         sys.exit(1)
     
-    analyzer = BookshelfAnalyzer(args.directory)
-    results = analyzer.analyze_directory()
+    export_format = None
+    if args.export:
+        try:
+            export_format = resolve_format(args.export_format)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    
+    placement_files = list(dict.fromkeys(pl for pl in (args.hpwl, args.legality, args.timing, args.congestion) if pl))
+    # --sections only narrows the design report; placement checks need the whole design
+    sections = args.sections if not (placement_files or args.diff_pl) else None
+    
+    analyzer = BookshelfAnalyzer(args.directory, cache_dir=args.cache_dir, use_cache=not args.no_cache,
+                                 jobs=args.jobs, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+    with phase('analyze_directory'):
+        results = analyzer.analyze_directory(sections=sections)
     
     if results is None:
         print("Analysis failed")
         sys.exit(1)
     
-    analyzer.generate_text_report(args.report)
+    for pl_file in placement_files:
+        if not os.path.exists(pl_file):
+            print(f"Error: Placement file '{pl_file}' does not exist")
+            sys.exit(1)
+    
+    congestion_image = None
+    if args.congestion:
+        os.makedirs(args.output or '.', exist_ok=True)
+        congestion_image = os.path.join(args.output or '.', f"{analyzer.analysis_results['design_name']}_congestion.png")
+    
+    if args.diff_pl:
+        for pl_file in args.diff_pl:
+            if not os.path.exists(pl_file):
+                print(f"Error: Placement file '{pl_file}' does not exist")
+                sys.exit(1)
+        os.makedirs(args.output or '.', exist_ok=True)
+        heat_map = os.path.join(args.output or '.', f"{analyzer.analysis_results['design_name']}_displacement.png")
+        with phase('compare_placements'):
+            analyzer.compare_placements(*args.diff_pl, heat_map=heat_map, output_file=args.report)
+    elif placement_files:
+        for pl_file in placement_files:
+            with phase('evaluate_placement', pl_file):
+                analyzer.evaluate_placement(pl_file, hpwl=pl_file == args.hpwl, legality=pl_file == args.legality,
+                                            timing=pl_file == args.timing, congestion=pl_file == args.congestion,
+                                            use_weights=not args.no_weights, delay_dir=args.delay_dir,
+                                            clock_period=args.clock_period, route_capacity=args.route_capacity,
+                                            congestion_image=congestion_image, density_bins=args.density_map,
+                                            output_file=args.report)
+    else:
+        with phase('generate_report'):
+            analyzer.generate_text_report(args.report, args.density_map, sections)
+    
+    if args.export:
+        with phase('export'):
+            analyzer.export_results(args.export, export_format)
+    
+    finish_profiling(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Batch Analyzer
+RDJordan 2025 / CFOGE
+
+Runs the BookshelfAnalyzer over every design directory (any directory with a
+.aux file) under a root, in a pool of worker processes, and collects one row
+of metrics per design into a CSV and a JSON summary:
+
+    design size      nodes, nets, pins, pins per net, cell types, fixed instances
+    device           site map size, number of sites
+    utilization      used / available / percent per resource
+    cost             parse time, wall time, peak RSS of the worker
+
+Every design runs in a fresh worker process, so the peak RSS belongs to that
+design alone, and any error (a parse error the analyzer reported, an
+exception or a crashed worker) is recorded in the design's row instead of
+stopping the sweep. Fresh workers need Python 3.11 (max_tasks_per_child);
+older versions reuse workers, and a row's peak RSS is then the highest of
+the designs its worker ran so far.
+
+Usage:
+    python bookshelf_batch.py <root> [-j N] [-o batch_summary] [--no-cache]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from bookshelf_analyzer import BookshelfAnalyzer
+from bookshelf_cache import CACHE_SUFFIX
+from bookshelf_profile import peak_rss_mb
+
+# Leading CSV columns; the per-resource columns follow in first-seen order
+SUMMARY_COLUMNS = [
+    'design', 'directory', 'status', 'nodes', 'nets', 'pins', 'avg_pins_per_net', 'max_pins_per_net',
+    'cell_types', 'fixed_instances', 'width', 'height', 'sites', 'missing_files', 'cached', 'parse_seconds',
+    'wall_seconds', 'peak_rss_mb', 'error'
+]
+
+# .aux stem shared by every Guelph / ISPD 2016 design; their rows are named after the directory
+GENERIC_DESIGN_NAME = 'design'
+
+
+def find_design_directories(root):
+    """Sorted directories under root that hold a .aux file (cache stores are skipped)."""
+    directories = set()
+    for directory, subdirs, files in os.walk(root, followlinks=True):
+        subdirs[:] = [name for name in subdirs if not name.endswith(CACHE_SUFFIX)]
+        if any(name.endswith('.aux') for name in files):
+            directories.add(Path(directory))
+    return sorted(directories)
+
+
+def fresh_worker_pool(max_workers):
+    """ProcessPoolExecutor that starts a new worker for every task (a reused one before Python 3.11)."""
+    try:
+        return ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1)
+    except TypeError:
+        return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def design_metrics(analyzer):
+    """One summary row (a flat dict) for an analyzed design."""
+    design = analyzer.design
+    design_name = analyzer.analysis_results['design_name']
+    if design_name == GENERIC_DESIGN_NAME:
+        design_name = Path(analyzer.directory_path).name
+    degrees = np.diff(design.net_offsets) if design.num_nets else np.zeros(0, dtype=np.int64)
+    row = {
+        'design': design_name,
+        'nodes': design.num_instances,
+        'nets': analyzer.net_count,
+        'pins': design.num_pins,
+        'avg_pins_per_net': round(float(degrees.mean()), 3) if len(degrees) else 0.0,
+        'max_pins_per_net': int(degrees.max()) if len(degrees) else 0,
+        'cell_types': len(analyzer.cells),
+        'fixed_instances': len(analyzer.fixed_instances),
+        'width': analyzer.site_grid.width,
+        'height': analyzer.site_grid.height,
+        'sites': analyzer.site_grid.num_sites(),
+        'missing_files': ' '.join(kind for kind, path in analyzer.files.items() if not path.exists()),
+    }
+    for resource_type, (used, available) in analyzer.resource_utilization().items():
+        row[f"used_{resource_type}"] = used
+        row[f"available_{resource_type}"] = available
+        row[f"util_{resource_type}"] = round(used / available * 100, 2) if available else 0.0
+    return row
+
+
+def parse_error_summary(errors):
+    """One line for a design's parse errors: the first one, and how many more there are."""
+    more = f" (and {len(errors) - 1} more)" if len(errors) > 1 else ""
+    return f"{errors[0]}{more}"
+
+
+def analyze_design(directory, cache_dir=None, use_cache=True):
+    """Worker: analyze one design directory and return its summary row.
+
+    The analyzer's console output is swallowed; errors, including the parse
+    errors the analyzer only prints, are returned in the row (status
+    'error') rather than raised. A design with some of its files missing
+    (e.g. no .nets) gets status 'partial', with the missing kinds listed in
+    missing_files.
+    """
+    row = {'directory': str(directory), 'design': Path(directory).name, 'status': 'ok'}
+    start = time.perf_counter()
+    try:
+        analyzer = BookshelfAnalyzer(directory, cache_dir=cache_dir, use_cache=use_cache)
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = analyzer.analyze_directory()
+        if results is None:
+            raise ValueError("no .aux file found")
+        if analyzer.parse_errors:
+            raise ValueError(parse_error_summary(analyzer.parse_errors))
+        row.update(design_metrics(analyzer))
+        row['cached'] = not analyzer.parse_timings
+        row['parse_seconds'] = round(sum(analyzer.parse_timings.values()), 4)
+        if row['missing_files']:
+            row['status'] = 'partial'
+    except Exception as e:
+        row['status'] = 'error'
+        row['error'] = f"{type(e).__name__}: {e}"
+        row['traceback'] = traceback.format_exc()
+    row['wall_seconds'] = round(time.perf_counter() - start, 4)
+    row['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return row
+
+
+def run_batch(directories, jobs=1, cache_dir=None, use_cache=True, progress=None):
+    """Analyze design directories in a bounded process pool; returns rows in directory order.
+
+    Workers are replaced after every design (see fresh_worker_pool) so each
+    row's peak RSS is its own. progress(row) is called as designs finish.
+    """
+    rows = {}
+    with fresh_worker_pool(max(1, jobs)) as pool:
+        futures = {pool.submit(analyze_design, str(directory), cache_dir, use_cache): directory
+                   for directory in directories}
+        for future in as_completed(futures):
+            directory = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                # The worker itself died (killed, out of memory, ...)
+                row = {'directory': str(directory), 'design': Path(directory).name, 'status': 'error',
+                       'error': f"worker failed: {type(e).__name__}: {e}"}
+            rows[directory] = row
+            if progress:
+                progress(row)
+    return [rows[directory] for directory in directories]
+
+
+def summary_columns(rows):
+    """SUMMARY_COLUMNS followed by every per-resource column seen in the rows."""
+    columns = list(SUMMARY_COLUMNS)
+    for row in rows:
+        for key in row:
+            if key not in columns and key != 'traceback':
+                columns.append(key)
+    return columns
+
+
+def write_summary(rows, output_prefix):
+    """Write <prefix>.csv and <prefix>.json; returns the two paths."""
+    csv_path, json_path = Path(f"{output_prefix}.csv"), Path(f"{output_prefix}.json")
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    columns = summary_columns(rows)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(json_path, 'w') as f:
+        json.dump({'columns': columns, 'designs': rows}, f, indent=2)
+    return csv_path, json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze every Bookshelf design under a directory tree')
+    parser.add_argument('root', help='Root directory searched for design directories (containing a .aux)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    parser.add_argument('--output', '-o', default='batch_summary', help='Output path prefix for the .csv and .json summary (default: batch_summary)')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <design>.bkc beside the design files)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the text files, never read or write the parse cache')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+
+    directories = find_design_directories(args.root)
+    if not directories:
+        print(f"Error: No .aux files found under '{args.root}'")
+        sys.exit(1)
+
+    print(f"Analyzing {len(directories)} designs with {args.jobs} worker{'s' if args.jobs > 1 else ''}")
+
+    def progress(row):
+        if row['status'] != 'error':
+            missing = f", missing {row['missing_files']}" if row['missing_files'] else ""
+            print(f"  {row['directory']}: {row['nodes']} nodes, {row['nets']} nets, "
+                  f"{row['wall_seconds']:.2f}s, {row['peak_rss_mb']:.0f} MB{missing}")
+        else:
+            print(f"  {row['directory']}: FAILED ({row['error']})")
+
+    start = time.perf_counter()
+    rows = run_batch(directories, args.jobs, args.cache_dir, not args.no_cache, progress)
+    failed = sum(row['status'] == 'error' for row in rows)
+    partial = sum(row['status'] == 'partial' for row in rows)
+
+    csv_path, json_path = write_summary(rows, args.output)
+    print(f"Done in {time.perf_counter() - start:.2f}s: {len(rows) - failed - partial} ok, "
+          f"{partial} partial, {failed} failed")
+    print(f"Summary saved to: {csv_path}, {json_path}")
+    if failed:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Performance Benchmark
+RDJordan 2025 / CFOGE
+
+Times the tools themselves on the shipped designs (every directory with a
+.aux file under benchmarks/, or another root) and checks the result against
+a stored baseline, so parser and analysis work can be verified on any box.
+
+Per design, each stage runs --repeat times and the best time is kept:
+
+    parse          analyze_directory() without the parse cache
+    report         generate_text_report()
+    utilization    the resource utilization engine
+    hpwl           HPWL of a full placement (a seeded random placement of
+                   every instance, since the shipped .pl files only place
+                   the FIXED ones)
+    raster         the --all --sites placement image of fixed_elements_visualizer
+    render_png     saving the scl_visualizer site map PNG (skip with --no-render)
+
+with throughput (lines/s and MB/s of the design files, pins/s) and the peak
+RSS of the design's worker process (one fresh process per design, run one
+after the other so timings don't disturb each other).
+
+The scaling sweep parses the largest .nodes and the largest .nets file
+replicated 1, 2, 4, ... times (renamed copies, see parse_scaling.py), to
+show how parse time grows with the input.
+
+--save-baseline stores the results as the baseline (only if every design
+ran without parse errors); later runs compare the stage times, scaling
+sweeps and peak RSS with it and exit with status 2 when any is more than
+--threshold percent worse (and more than --min-seconds slower, so tiny
+stages don't fail on timer noise). Stage times are compared as
+totals over the designs, which are far steadier than single small stages.
+Baselines are only comparable on the same machine.
+
+Usage:
+    python bookshelf_benchmark.py [root] [--baseline perf_baseline.json] [--save-baseline]
+                                  [--threshold 20] [--repeat 5] [--scale 1,2,4] [--no-render]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from bookshelf_analyzer import BookshelfAnalyzer
+from bookshelf_batch import find_design_directories, parse_error_summary
+from bookshelf_model import Placement
+from bookshelf_placement import evaluate_hpwl
+from bookshelf_profile import count_lines, peak_rss_mb
+from fixed_elements_visualizer import INSTANCE_COLORS_PALETTE, placed_elements_image
+from parse_scaling import parse_with_jobs, replicate_file
+from scl_visualizer import create_site_visualization, site_type_colors
+
+STAGES = ('parse', 'report', 'utilization', 'hpwl', 'raster', 'render_png')
+PLACEMENT_SEED = 2025
+BELS_PER_SITE = 16
+
+
+def best_time(function, repeat):
+    """(best wall time over repeat runs, result of the last run); console output is swallowed."""
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def random_placement(design, width, height):
+    """Placement of every design instance on a seeded random site / BEL of the grid."""
+    rng = np.random.default_rng(PLACEMENT_SEED)
+    num_instances = design.num_instances
+    placement = Placement()
+    placement.set_rows(design.instance_names.names, rng.integers(0, max(width, 1), num_instances),
+                       rng.integers(0, max(height, 1), num_instances),
+                       rng.integers(0, BELS_PER_SITE, num_instances), np.zeros(num_instances, dtype=bool))
+    placement.resolve(design.instance_names)
+    return placement
+
+
+def benchmark_design(directory, repeat=5, render=True):
+    """Worker: time every stage on one design directory and return its result row."""
+    row = {'directory': str(directory), 'status': 'ok', 'stages': {}}
+    try:
+        analyzer = None
+
+        def parse():
+            nonlocal analyzer
+            analyzer = BookshelfAnalyzer(directory, use_cache=False)
+            if analyzer.analyze_directory() is None:
+                raise ValueError("no .aux file found")
+            # The console is swallowed, so a design that only printed parse errors would time as ok
+            if analyzer.parse_errors:
+                raise ValueError(parse_error_summary(analyzer.parse_errors))
+
+        stages = row['stages']
+        stages['parse'], _ = best_time(parse, repeat)
+        design, site_grid = analyzer.design, analyzer.site_grid
+        files = [path for path in analyzer.files.values() if path.exists()]
+        row['design'] = analyzer.analysis_results['design_name']
+        row['lines'] = sum(count_lines(path) for path in files)
+        row['bytes'] = sum(path.stat().st_size for path in files)
+        row['instances'], row['nets'], row['pins'] = design.num_instances, design.num_nets, design.num_pins
+
+        stages['report'], _ = best_time(analyzer.generate_text_report, repeat)
+        stages['utilization'], _ = best_time(analyzer.utilization, repeat)
+
+        placement = random_placement(design, site_grid.width, site_grid.height)
+        stages['hpwl'], _ = best_time(lambda: evaluate_hpwl(design, placement, analyzer.weights), repeat)
+
+        # placement rows are in instance order, so the cell ids are the type ids
+        type_colors = [INSTANCE_COLORS_PALETTE[i % len(INSTANCE_COLORS_PALETTE)] for i in range(len(design.cell_names))]
+        site_colors = site_type_colors(site_grid.type_names)
+        stages['raster'], _ = best_time(
+            lambda: placed_elements_image(site_grid.width, site_grid.height, placement.x, placement.y, placement.bel,
+                                          design.inst_cell, type_colors, site_grid=site_grid, site_colors=site_colors),
+            repeat)
+
+        if render:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                output_file = Path(tmp_dir) / 'sitemap.png'
+                stages['render_png'], _ = best_time(lambda: create_site_visualization(site_grid, output_file), repeat)
+
+        row['lines_per_s'] = row['lines'] / stages['parse'] if stages['parse'] else 0.0
+        row['mb_per_s'] = row['bytes'] / 1e6 / stages['parse'] if stages['parse'] else 0.0
+        row['parse_pins_per_s'] = row['pins'] / stages['parse'] if stages['parse'] else 0.0
+        row['hpwl_pins_per_s'] = row['pins'] / stages['hpwl'] if stages['hpwl'] else 0.0
+    except Exception as e:
+        row['status'] = 'error'
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return row
+
+
+def design_file(directory, kind):
+    """The .<kind> file named after a design directory's .aux, or None."""
+    aux_files = sorted(Path(directory).glob('*.aux'))
+    if not aux_files:
+        return None
+    file_path = Path(directory) / f"{aux_files[0].stem}.{kind}"
+    return file_path if file_path.exists() and file_path.stat().st_size else None
+
+
+def scaling_sweep(directories, scales, repeat=5):
+    """Parse time of the largest .nodes and .nets replicated by every factor in scales.
+
+    Returns rows of {'file', 'source', 'scale', 'lines', 'bytes', 'seconds', 'lines_per_s'}.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for kind in ('nodes', 'nets'):
+            sources = [path for path in (design_file(directory, kind) for directory in directories) if path]
+            if not sources:
+                continue
+            source = max(sources, key=lambda path: path.stat().st_size)
+            for scale in scales:
+                file_path = source
+                if scale > 1:
+                    file_path = Path(tmp_dir) / f"x{scale}" / source.name
+                    file_path.parent.mkdir(exist_ok=True)
+                    replicate_file(source, kind, scale, file_path)
+                seconds = min(parse_with_jobs(kind, file_path, 1, None)[1] for _ in range(max(1, repeat)))
+                lines = count_lines(file_path)
+                rows.append({'file': kind, 'source': str(source), 'scale': scale, 'lines': lines,
+                             'bytes': file_path.stat().st_size, 'seconds': seconds,
+                             'lines_per_s': lines / seconds if seconds else 0.0})
+                if file_path != source:
+                    file_path.unlink()
+    return rows
+
+
+def run_benchmarks(directories, repeat=5, render=True, progress=None):
+    """benchmark_design() on every directory, each in its own fresh worker process.
+
+    A new one-worker pool per design gives the fresh process on any Python
+    version (max_tasks_per_child needs 3.11).
+    """
+    rows = []
+    for directory in directories:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            try:
+                row = pool.submit(benchmark_design, str(directory), repeat, render).result()
+            except Exception as e:
+                row = {'directory': str(directory), 'status': 'error', 'stages': {},
+                       'error': f"worker failed: {type(e).__name__}: {e}"}
+        rows.append(row)
+        if progress:
+            progress(row)
+    return rows
+
+
+def design_keys(results):
+    """{design directory relative to the run's root: result row} of the designs that ran ok."""
+    root = results.get('root', '.')
+    return {os.path.relpath(row['directory'], root): row for row in results['designs'] if row['status'] == 'ok'}
+
+
+def measurements(results, designs):
+    """{key: (value, unit)} a baseline comparison looks at (lower is better).
+
+    Stage times are summed over the given designs and scaling times over the
+    sweep of each file, as single small stages are too noisy to gate on;
+    memory is the largest peak RSS of the designs.
+    """
+    values = {}
+    rows = [row for key, row in design_keys(results).items() if key in designs]
+    for stage in STAGES:
+        if all(stage in row['stages'] for row in rows) and rows:
+            values[f"{stage} (all designs)"] = (sum(row['stages'][stage] for row in rows), 's')
+    if rows:
+        values['peak RSS (largest)'] = (max(row['peak_rss_mb'] for row in rows), 'MB')
+    for kind in ('nodes', 'nets'):
+        sweep = [row for row in results.get('scaling', []) if row['file'] == kind]
+        if sweep:
+            key = f"{kind} scaling x{','.join(str(row['scale']) for row in sweep)}"
+            values[key] = (sum(row['seconds'] for row in sweep), 's')
+    return values
+
+
+def compare_results(results, baseline, threshold, min_seconds):
+    """Regressions of results against a baseline: rows of (key, base, now, percent, unit).
+
+    Only designs that ran in both (same path under the root) are compared. A time counts when it is
+    more than threshold percent and min_seconds worse; memory when it is
+    more than threshold percent worse.
+    """
+    designs = design_keys(results).keys() & design_keys(baseline).keys()
+    regressions = []
+    current, base = measurements(results, designs), measurements(baseline, designs)
+    for key, (value, unit) in current.items():
+        if key not in base:
+            continue
+        reference = base[key][0]
+        percent = (value - reference) / reference * 100 if reference > 0 else 0.0
+        slower = value - reference > min_seconds if unit == 's' else True
+        if percent > threshold and slower:
+            regressions.append((key, reference, value, percent, unit))
+    return regressions
+
+
+def format_results(results):
+    """Text lines of the per-design stage table and the scaling sweep."""
+    lines = []
+    stages = [stage for stage in STAGES if any(stage in row['stages'] for row in results['designs'])]
+    root = results.get('root', '.')
+    header = f"{'design':<44}" + ''.join(f" {stage:>11}" for stage in stages)
+    lines.append(header + f" {'lines/s':>11} {'pins/s':>11} {'rss MB':>7}")
+    for row in results['designs']:
+        if row['status'] != 'ok':
+            lines.append(f"{os.path.relpath(row['directory'], root):<44} FAILED ({row['error']})")
+            continue
+        times = ''.join(f" {row['stages'][stage]:>11.4f}" if stage in row['stages'] else f" {'':>11}"
+                        for stage in stages)
+        lines.append(f"{os.path.relpath(row['directory'], root)[-44:]:<44}{times} {row['lines_per_s']:>11,.0f} "
+                     f"{row['parse_pins_per_s']:>11,.0f} {row['peak_rss_mb']:>7.0f}")
+    if results.get('scaling'):
+        lines.append("")
+        lines.append("Parse scaling:")
+        lines.append(f"  {'file':<6} {'scale':>5} {'lines':>11} {'MB':>8} {'seconds':>9} {'lines/s':>11}")
+        for row in results['scaling']:
+            lines.append(f"  {row['file']:<6} {row['scale']:>5} {row['lines']:>11,} {row['bytes'] / 1e6:>8.2f} "
+                         f"{row['seconds']:>9.3f} {row['lines_per_s']:>11,.0f}  {os.path.relpath(row['source'], root)}")
+    return lines
+
+
+def scale_list(text):
+    """argparse type for a comma separated list of replication factors."""
+    try:
+        scales = [int(part) for part in text.split(',') if part.strip()]
+    except ValueError:
+        scales = []
+    if not scales or min(scales) < 1:
+        raise argparse.ArgumentTypeError(f"invalid scale list '{text}', expected e.g. 1,2,4")
+    return scales
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Bookshelf tools on a tree of designs and check for regressions')
+    parser.add_argument('root', nargs='?', default='benchmarks', help='Root directory searched for design directories (default: benchmarks)')
+    parser.add_argument('--baseline', default='perf_baseline.json', help='Baseline results to compare with / save to (default: perf_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline instead of comparing with it')
+    parser.add_argument('--output', '-o', help='Also write this run\'s results as JSON')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Percent slowdown (or memory growth) that counts as a regression (default: 20)')
+    parser.add_argument('--min-seconds', type=float, default=0.02, help='Ignore slowdowns smaller than this many seconds (default: 0.02)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per stage, the best time is kept (default: 5)')
+    parser.add_argument('--scale', type=scale_list, default=[1, 2, 4], help='Replication factors for the parse scaling sweep (default: 1,2,4)')
+    parser.add_argument('--no-scaling', action='store_true', help='Skip the parse scaling sweep')
+    parser.add_argument('--no-render', action='store_true', help='Skip the PNG render stage (matplotlib)')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"Error: Directory '{args.root}' does not exist")
+        sys.exit(1)
+
+    directories = find_design_directories(args.root)
+    if not directories:
+        print(f"Error: No .aux files found under '{args.root}'")
+        sys.exit(1)
+
+    print(f"Benchmarking {len(directories)} designs, best of {args.repeat} runs per stage")
+    start = time.perf_counter()
+    rows = run_benchmarks(directories, args.repeat, not args.no_render,
+                          lambda row: print(f"  {row['directory']}: {row['status']}"))
+    results = {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'root': args.root,
+        'repeat': args.repeat,
+        'designs': rows,
+    }
+
+    if not args.no_scaling:
+        print(f"Parse scaling sweep x{','.join(map(str, args.scale))}")
+        results['scaling'] = scaling_sweep(directories, args.scale, args.repeat)
+
+    print("")
+    print('\n'.join(format_results(results)))
+    print(f"\nDone in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    failed = sum(row['status'] != 'ok' for row in rows)
+    if args.save_baseline and failed:
+        print(f"Baseline not saved: {failed} design{'s' if failed > 1 else ''} failed")
+    elif args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold, args.min_seconds)
+        print(f"Compared with baseline {args.baseline} ({baseline.get('created', 'unknown date')}), "
+              f"threshold {args.threshold:g}%")
+        common = len(design_keys(results).keys() & design_keys(baseline).keys())
+        print(f"{common} of {len(rows)} designs are in the baseline")
+        if baseline.get('machine') != results['machine']:
+            print("Warning: the baseline was recorded on a different machine")
+        for key, reference, value, percent, unit in regressions:
+            print(f"  REGRESSION {key}: {reference:.4f} -> {value:.4f} {unit} (+{percent:.1f}%)")
+        if regressions:
+            print(f"{len(regressions)} regression{'s' if len(regressions) > 1 else ''} over {args.threshold:g}%")
+            sys.exit(2)
+        print("No regressions")
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if failed:
+        print(f"{failed} design{'s' if failed > 1 else ''} failed")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
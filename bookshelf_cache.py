@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Parse Cache
+RDJordan 2025 / CFOGE
+
+On-disk cache of parsed Bookshelf data so repeated runs over the same design
+don't have to parse the text files again.
+
+A cache store is a directory named <design>.bkc, kept beside the design files
+or under a user supplied cache directory. Every cached product (for example
+the analyzer's full parse or the SCL site list) is a sub directory holding:
+
+    manifest.json   cache version, source file signatures and small metadata
+    <name>.npy      NumPy arrays, loaded back with memory-mapping
+    <name>.txt      string tables, one name per line
+
+An entry is only used when every source file still has the size recorded in
+the manifest, and either the same mtime or (if it was touched/copied) the same
+content hash.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+CACHE_VERSION = 3
+CACHE_SUFFIX = '.bkc'
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(file_path):
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(file_path):
+    """Size, mtime and content hash of a source file (None if it doesn't exist)."""
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return None
+    stat = file_path.stat()
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'digest': file_digest(file_path)
+    }
+
+
+def signature_matches(signature, file_path):
+    """Check a stored signature against the file on disk.
+
+    Returns (matches, refreshed) where refreshed is True when only the mtime
+    moved and the content hash confirmed the file is unchanged.
+    """
+    file_path = Path(file_path)
+    if signature is None or not file_path.exists():
+        return signature is None and not file_path.exists(), False
+    stat = file_path.stat()
+    if stat.st_size != signature['size']:
+        return False, False
+    if stat.st_mtime_ns == signature['mtime_ns']:
+        return True, False
+    if file_digest(file_path) != signature['digest']:
+        return False, False
+    signature['mtime_ns'] = stat.st_mtime_ns
+    return True, True
+
+
+class ParseCache:
+    """A <design>.bkc store holding cached parse products for one design."""
+
+    def __init__(self, directory, design_name, cache_dir=None):
+        directory = Path(directory).resolve()
+        if cache_dir:
+            # Keep designs from different directories apart inside a shared cache dir
+            tag = hashlib.blake2b(str(directory).encode(), digest_size=6).hexdigest()
+            self.path = Path(cache_dir) / f"{directory.name}-{tag}" / f"{design_name}{CACHE_SUFFIX}"
+        else:
+            self.path = directory / f"{design_name}{CACHE_SUFFIX}"
+
+    def _sources(self, sources):
+        return {str(Path(source).name): Path(source) for source in sources}
+
+    def load(self, key, sources):
+        """Return (arrays, strings, meta) for key, or None if missing or stale.
+
+        Arrays are memory-mapped read-only, string tables are lists of names.
+        """
+        entry = self.path / key
+        manifest_file = entry / 'manifest.json'
+        if not manifest_file.exists():
+            return None
+
+        try:
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        sources = self._sources(sources)
+        if manifest.get('version') != CACHE_VERSION or set(manifest.get('sources', {})) != set(sources):
+            return None
+
+        refreshed = False
+        for name, source in sources.items():
+            matches, touched = signature_matches(manifest['sources'][name], source)
+            if not matches:
+                return None
+            refreshed = refreshed or touched
+
+        try:
+            arrays = {name: np.load(entry / f"{name}.npy", mmap_mode='r') for name in manifest['arrays']}
+            strings = {}
+            for name in manifest['strings']:
+                with open(entry / f"{name}.txt", 'r') as f:
+                    text = f.read()
+                strings[name] = text.split('\n') if text else []
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable cache entry {entry}: {e}")
+            return None
+
+        if refreshed:
+            # Content is unchanged, remember the new mtimes so the hash isn't needed next time
+            self._write_manifest(entry, manifest)
+
+        return arrays, strings, manifest['meta']
+
+    def store(self, key, sources, arrays=None, strings=None, meta=None):
+        """Write a cache entry for key. Failures are reported but never fatal."""
+        arrays = arrays or {}
+        strings = strings or {}
+        entry = self.path / key
+        staging = self.path / f"{key}.tmp-{os.getpid()}"
+
+        try:
+            if staging.exists():
+                shutil.rmtree(staging)
+            staging.mkdir(parents=True)
+
+            for name, values in arrays.items():
+                np.save(staging / f"{name}.npy", np.ascontiguousarray(values))
+            for name, names in strings.items():
+                with open(staging / f"{name}.txt", 'w') as f:
+                    f.write('\n'.join(names))
+
+            manifest = {
+                'version': CACHE_VERSION,
+                'sources': {name: file_signature(source) for name, source in self._sources(sources).items()},
+                'arrays': sorted(arrays),
+                'strings': sorted(strings),
+                'meta': meta or {}
+            }
+            with open(staging / 'manifest.json', 'w') as f:
+                json.dump(manifest, f)
+
+            if entry.exists():
+                shutil.rmtree(entry)
+            os.replace(staging, entry)
+            return True
+
+        except OSError as e:
+            print(f"Warning: could not write cache entry {entry}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+    def _write_manifest(self, entry, manifest):
+        try:
+            with open(entry / 'manifest.json', 'w') as f:
+                json.dump(manifest, f)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove the whole cache store."""
+        shutil.rmtree(self.path, ignore_errors=True)
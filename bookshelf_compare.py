@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Design Comparison
+RDJordan 2025 / CFOGE
+
+Diffs two Bookshelf designs section by section: cell library, instances and
+their cell type histogram, resource utilization, net fanout distribution,
+fixed instance locations and the SCL architecture (sites, resources, site
+map).
+
+Design files are compared by content hash first. B reuses A's parse result
+for every file that is byte-identical (e.g. the design.scl / design.lib
+shared by the Guelph FPGA1-8 set), and the sections that only depend on
+identical files are reported as unchanged without being diffed. Everything
+else is compared on the columnar arrays of the two DesignModels (bincounts
+and name -> id lookups), not by walking per-instance dicts.
+
+Usage:
+    python bookshelf_compare.py <design_dir_A> <design_dir_B> [-r report.txt]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+
+from bookshelf_analyzer import BookshelfAnalyzer
+
+# Design files each report section depends on; a section whose files are all identical is skipped
+SECTION_FILES = {
+    'library': ('lib',),
+    'instances': ('nodes',),
+    'utilization': ('nodes', 'scl'),
+    'fanout': ('nets',),
+    'fixed': ('pl',),
+    'architecture': ('scl',),
+}
+
+FANOUT_BUCKETS = [(1, 1), (2, 2), (3, 3), (4, 5), (6, 10), (11, 20), (21, 50), (51, 100), (101, None)]
+
+
+def file_status(a, b):
+    """{kind: 'identical' | 'different' | 'only in A' | 'only in B' | 'missing'} over the design file kinds."""
+    digests_a, digests_b = a.file_digests(), b.file_digests()
+    status = {}
+    for kind in a.files:
+        if kind in digests_a and kind in digests_b:
+            status[kind] = 'identical' if digests_a[kind] == digests_b[kind] else 'different'
+        elif kind in digests_a or kind in digests_b:
+            status[kind] = 'only in A' if kind in digests_a else 'only in B'
+        else:
+            status[kind] = 'missing'
+    return status
+
+
+def delta_table(counts_a, counts_b, indent="  "):
+    """Rows 'name: A -> B (+delta)' for every key whose count changed."""
+    lines = []
+    for key in list(dict.fromkeys(list(counts_a) + list(counts_b))):
+        value_a, value_b = counts_a.get(key, 0), counts_b.get(key, 0)
+        if value_a != value_b:
+            lines.append(f"{indent}{key}: {value_a:,} -> {value_b:,} ({value_b - value_a:+,})")
+    return lines
+
+
+def compare_library(cells_a, cells_b):
+    """Cell types added, removed, or with a different pin list."""
+    lines = []
+    added = [name for name in cells_b if name not in cells_a]
+    removed = [name for name in cells_a if name not in cells_b]
+    changed = [name for name in cells_a if name in cells_b and cells_a[name]['pins'] != cells_b[name]['pins']]
+    lines.append(f"Cell Types: {len(cells_a)} -> {len(cells_b)}")
+    if added:
+        lines.append(f"  Only in B: {', '.join(added)}")
+    if removed:
+        lines.append(f"  Only in A: {', '.join(removed)}")
+    for name in changed:
+        pins_a = {pin['name'] for pin in cells_a[name]['pins']}
+        pins_b = {pin['name'] for pin in cells_b[name]['pins']}
+        detail = []
+        if pins_b - pins_a:
+            detail.append(f"+{','.join(sorted(pins_b - pins_a))}")
+        if pins_a - pins_b:
+            detail.append(f"-{','.join(sorted(pins_a - pins_b))}")
+        lines.append(f"  Changed pins: {name} {' '.join(detail) or '(directions/attributes)'}")
+    if not (added or removed or changed):
+        lines.append("  Same cells and pins")
+    return lines
+
+
+def compare_instances(design_a, design_b, examples=5):
+    """Instance counts, cell type histogram and per-instance added / removed / retyped."""
+    lines = []
+    lines.append(f"Instances: {design_a.num_instances:,} -> {design_b.num_instances:,} "
+                 f"({design_b.num_instances - design_a.num_instances:+,})")
+    histogram = delta_table(design_a.instance_type_counts(), design_b.instance_type_counts())
+    lines.append("Cell Type Histogram Changes:" if histogram else "Cell Type Histogram: unchanged")
+    lines.extend(histogram)
+
+    # Match instances by name: B's names looked up in A's table
+    in_a = design_a.instance_names.lookup(design_b.instance_names.names)
+    matched = in_a >= 0
+    only_b = int((~matched).sum())
+    only_a = design_a.num_instances - int(matched.sum())
+    cell_a = np.array(design_a.cell_names.names + [None], dtype=object)[design_a.inst_cell[in_a[matched]]]
+    cell_b = np.array(design_b.cell_names.names + [None], dtype=object)[design_b.inst_cell[matched]]
+    retyped = np.flatnonzero(cell_a != cell_b)
+    lines.append(f"Instances only in A: {only_a:,}, only in B: {only_b:,}, cell type changed: {len(retyped):,}")
+    matched_ids = np.flatnonzero(matched)
+    for row in retyped[:examples].tolist():
+        lines.append(f"  {design_b.instance_names[matched_ids[row]]}: {cell_a[row]} -> {cell_b[row]}")
+    return lines
+
+
+def fanout_histogram(design):
+    """Net count per FANOUT_BUCKETS degree range."""
+    counts = np.bincount(np.diff(design.net_offsets), minlength=1) if design.num_nets else np.zeros(1, dtype=np.int64)
+    histogram = {}
+    for lo, hi in FANOUT_BUCKETS:
+        label = f"{lo}" if lo == hi else (f"{lo}-{hi}" if hi else f"{lo}+")
+        histogram[label] = int(counts[lo:None if hi is None else hi + 1].sum())
+    return histogram
+
+
+def compare_fanout(design_a, design_b):
+    """Net / pin counts and the pins-per-net histogram of both designs side by side."""
+    lines = []
+    lines.append(f"Nets: {design_a.num_nets:,} -> {design_b.num_nets:,}, pins: {design_a.num_pins:,} -> {design_b.num_pins:,}")
+    for design, label in ((design_a, 'A'), (design_b, 'B')):
+        degrees = np.diff(design.net_offsets)
+        if len(degrees):
+            lines.append(f"  {label}: {degrees.mean():.2f} pins per net, max {int(degrees.max())}")
+    lines.append(f"  {'pins':>8} {'A':>10} {'B':>10} {'delta':>10}")
+    hist_a, hist_b = fanout_histogram(design_a), fanout_histogram(design_b)
+    for label in hist_a:
+        lines.append(f"  {label:>8} {hist_a[label]:>10,} {hist_b[label]:>10,} {hist_b[label] - hist_a[label]:>+10,}")
+    return lines
+
+
+def compare_fixed(placement_a, placement_b, examples=5):
+    """FIXED instances only in A / only in B / moved between the two .pl files, matched by name."""
+    rows_a, rows_b = np.flatnonzero(placement_a.fixed), np.flatnonzero(placement_b.fixed)
+    # Row of every B fixed instance in A's placement, kept only if it is fixed in A as well
+    row_in_a = placement_a.names.lookup([placement_b.names[row] for row in rows_b.tolist()])
+    both = row_in_a >= 0
+    both[both] = placement_a.fixed[row_in_a[both]]
+    a_rows, b_rows = row_in_a[both], rows_b[both]
+    moved = ((placement_a.x[a_rows] != placement_b.x[b_rows]) | (placement_a.y[a_rows] != placement_b.y[b_rows]) |
+             (placement_a.bel[a_rows] != placement_b.bel[b_rows]))
+
+    lines = []
+    lines.append(f"Fixed Instances: {len(rows_a):,} -> {len(rows_b):,}")
+    lines.append(f"  In both: {int(both.sum()):,} ({int(moved.sum()):,} moved), only in A: {len(rows_a) - int(both.sum()):,}, "
+                 f"only in B: {int((~both).sum()):,}")
+    for a_row, b_row in zip(a_rows[moved][:examples].tolist(), b_rows[moved][:examples].tolist()):
+        lines.append(f"  {placement_b.names[b_row]}: ({placement_a.x[a_row]}, {placement_a.y[a_row]}, {placement_a.bel[a_row]}) -> "
+                     f"({placement_b.x[b_row]}, {placement_b.y[b_row]}, {placement_b.bel[b_row]})")
+    return lines
+
+
+def compare_architecture(a, b):
+    """Site definitions, RESOURCES mapping and the site map grid."""
+    lines = []
+    grid_a, grid_b = a.site_grid, b.site_grid
+    lines.append(f"Site Map: {grid_a.width}x{grid_a.height} -> {grid_b.width}x{grid_b.height}")
+    for site in dict.fromkeys(list(a.sites) + list(b.sites)):
+        resources_a = a.sites.get(site, {}).get('resources')
+        resources_b = b.sites.get(site, {}).get('resources')
+        if resources_a != resources_b:
+            lines.append(f"  SITE {site}: {resources_a} -> {resources_b}")
+    for resource in dict.fromkeys(list(a.resources) + list(b.resources)):
+        if a.resources.get(resource) != b.resources.get(resource):
+            lines.append(f"  RESOURCE {resource}: {a.resources.get(resource)} -> {b.resources.get(resource)}")
+    lines.extend(delta_table(grid_a.counts(), grid_b.counts(), indent="  sites "))
+
+    if grid_a.grid.shape == grid_b.grid.shape and grid_a.type_names == grid_b.type_names:
+        differing = np.count_nonzero(grid_a.grid != grid_b.grid)
+        lines.append(f"  Sites with a different type: {differing:,}")
+    return lines
+
+
+def compare_designs(a, b):
+    """Report lines comparing two analyzed designs (a and b are BookshelfAnalyzers)."""
+    status = file_status(a, b)
+    lines = []
+    lines.append("=" * 80)
+    lines.append("BOOKSHELF DESIGN COMPARISON")
+    lines.append("=" * 80)
+    lines.append(f"A: {a.directory_path} ({a.analysis_results['design_name']})")
+    lines.append(f"B: {b.directory_path} ({b.analysis_results['design_name']})")
+    lines.append("")
+    lines.append("FILES:")
+    lines.append("-" * 30)
+    for kind, state in status.items():
+        reused = " (parse reused)" if kind in b.reused_kinds else ""
+        lines.append(f"  {kind:<6} {state}{reused}")
+    lines.append("")
+
+    sections = {
+        'library': ("LIBRARY", lambda: compare_library(a.cells, b.cells)),
+        'instances': ("INSTANCES", lambda: compare_instances(a.design, b.design)),
+        'utilization': ("RESOURCE UTILIZATION", lambda: delta_table(
+            {resource: used for resource, (used, _) in a.resource_utilization().items()},
+            {resource: used for resource, (used, _) in b.resource_utilization().items()}) or ["  Unchanged"]),
+        'fanout': ("NET FANOUT", lambda: compare_fanout(a.design, b.design)),
+        'fixed': ("FIXED LOCATIONS", lambda: compare_fixed(a.design.placement, b.design.placement)),
+        'architecture': ("ARCHITECTURE (SCL)", lambda: compare_architecture(a, b)),
+    }
+    for section, (title, compare) in sections.items():
+        lines.append(f"{title}:")
+        lines.append("-" * 30)
+        kinds = SECTION_FILES[section]
+        states = {status.get(kind, 'missing') for kind in kinds}
+        if states == {'missing'}:
+            lines.append(f"  No {', '.join(kinds)} file in either design")
+        elif states <= {'identical', 'missing'}:
+            lines.append(f"  Identical {', '.join(kinds)} file{'s' if len(kinds) > 1 else ''}, skipped")
+        else:
+            lines.extend(compare())
+        lines.append("")
+    lines.append("=" * 80)
+    return lines
+
+
+def analyze_pair(directory_a, directory_b, cache_dir=None, use_cache=True, jobs=1):
+    """Analyze both designs quietly, B reusing A's parse of identical files. Returns (a, b)."""
+    a = BookshelfAnalyzer(directory_a, cache_dir=cache_dir, use_cache=use_cache, jobs=jobs)
+    b = BookshelfAnalyzer(directory_b, cache_dir=cache_dir, use_cache=use_cache, jobs=jobs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if a.analyze_directory() is None:
+            raise ValueError(f"No .aux files found in directory '{directory_a}'")
+        if b.analyze_directory(reuse=a) is None:
+            raise ValueError(f"No .aux files found in directory '{directory_b}'")
+    return a, b
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two Bookshelf designs')
+    parser.add_argument('design_a', help='Directory of the first design')
+    parser.add_argument('design_b', help='Directory of the second design')
+    parser.add_argument('--report', '-r', help='Output file for the comparison report')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <design>.bkc beside the design files)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the text files, never read or write the parse cache')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Parse the design files in N worker processes (default: 1)')
+
+    args = parser.parse_args()
+
+    for directory in (args.design_a, args.design_b):
+        if not os.path.exists(directory):
+            print(f"Error: Directory '{directory}' does not exist")
+            sys.exit(1)
+
+    try:
+        a, b = analyze_pair(args.design_a, args.design_b, args.cache_dir, not args.no_cache, args.jobs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    report = compare_designs(a, b)
+    print('\n'.join(report))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write('\n'.join(report))
+        print(f"\nReport saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
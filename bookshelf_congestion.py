@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Bookshelf RUDY Congestion Estimator
+RDJordan 2025 / CFOGE
+
+RUDY (rectangular uniform wire density) spreads the wire of every net evenly
+over its bounding box: a net whose pins span w x h sites puts (w + h) / (w * h)
+of wire on each site of the box. Summed over all nets this gives a (height,
+width) demand map on the site grid that predicts routing hot spots before the
+design ever reaches Vivado.
+
+The map is built with a 2D difference array: each net adds its density at
+the four corners of its box (+ - - +) with one bincount over all nets, and
+two cumulative sums turn that into the per-site totals. There is no loop
+over nets or rectangles, so full designs take well under a second.
+
+Demand is wire length in site pitches per site, i.e. the number of one-site
+wire segments (routing tracks) the site has to carry; even a net inside one
+site puts 2.0 on it. The routing capacity is in the same unit, tracks per
+site, and has no default: it depends on the device's interconnect, which the
+Bookshelf files don't describe. Without one only demand is reported. With
+one, overflow is demand beyond the capacity, as a fraction of it:
+max(0, demand / capacity - 1).
+
+matplotlib is only imported when an image is drawn, so the analyzer doesn't
+pay for it on every run.
+"""
+
+import numpy as np
+
+from bookshelf_placement import instance_locations, net_bounding_boxes, net_weight_array
+
+
+def rudy_map(design, placement, width, height, weights=None):
+    """(height, width) RUDY wire density map of a placement.
+
+    Boxes are in whole sites, inclusive of both end sites, and clipped to the
+    grid; nets without any placed pin are skipped. With weights (.wts by net
+    name) every net's density is scaled by its weight.
+    """
+    if width <= 0 or height <= 0:
+        return np.zeros((max(height, 0), max(width, 0)))
+    inst_x, inst_y = instance_locations(design, placement)
+    xmin, xmax, ymin, ymax = net_bounding_boxes(design, inst_x, inst_y)
+    placed = ~np.isnan(xmin)
+
+    x0 = np.clip(xmin[placed], 0, width - 1).astype(np.int64)
+    x1 = np.clip(xmax[placed], 0, width - 1).astype(np.int64) + 1
+    y0 = np.clip(ymin[placed], 0, height - 1).astype(np.int64)
+    y1 = np.clip(ymax[placed], 0, height - 1).astype(np.int64) + 1
+    box_w, box_h = x1 - x0, y1 - y0
+    density = (box_w + box_h) / (box_w * box_h) * net_weight_array(design, weights)[placed]
+
+    # Difference array with one spare row and column for the far corners
+    stride = width + 1
+    corners = np.concatenate((y0 * stride + x0, y0 * stride + x1, y1 * stride + x0, y1 * stride + x1))
+    deltas = np.concatenate((density, -density, -density, density))
+    diff = np.bincount(corners, weights=deltas, minlength=(height + 1) * stride).reshape(height + 1, stride)
+    return np.cumsum(np.cumsum(diff, axis=0), axis=1)[:height, :width]
+
+
+def congestion_stats(demand, capacity=None, mask=None):
+    """Peak / 95th percentile demand and overflow of a RUDY map.
+
+    capacity is in routing tracks per site; without it the overflow figures
+    are None. mask limits the statistics to some sites (e.g. the non-empty
+    ones of the site grid); by default every site counts.
+    """
+    values = demand[mask] if mask is not None else demand.ravel()
+    if not len(values):
+        values = np.zeros(1)
+    overflow = np.maximum(values / capacity - 1.0, 0.0) if capacity else None
+    return {
+        'capacity': capacity,
+        'sites': int(len(values)),
+        'total_demand': float(values.sum()),
+        'peak_demand': float(values.max()),
+        'p95_demand': float(np.percentile(values, 95)),
+        'mean_demand': float(values.mean()),
+        'peak_overflow': float(overflow.max()) if capacity else None,
+        'p95_overflow': float(np.percentile(overflow, 95)) if capacity else None,
+        'overflowed_sites': int((overflow > 0).sum()) if capacity else None,
+        'peak_site': peak_site(demand, mask),
+    }
+
+
+def peak_site(demand, mask=None):
+    """(x, y) of the highest demand among the sites in mask (all sites by default), as in congestion_stats."""
+    if mask is None:
+        flat = int(np.argmax(demand))
+    elif mask.any():
+        flat = int(np.flatnonzero(mask.ravel())[np.argmax(demand[mask])])
+    else:
+        return (0, 0)
+    return tuple(int(v) for v in np.unravel_index(flat, demand.shape)[::-1])
+
+
+def heat_map_image(values, vmax, colormap='inferno'):
+    """(height, width, 4) uint8 RGBA raster of a per-site value map.
+
+    Values are scaled to [0, vmax] and looked up in a 256 entry colormap
+    table, the same way site_type_image colors the site grid.
+    """
+    import matplotlib
+
+    lut = np.rint(matplotlib.colormaps[colormap](np.linspace(0.0, 1.0, 256)) * 255).astype(np.uint8)
+    index = np.clip(values / vmax * 255 if vmax > 0 else values * 0, 0, 255).astype(np.uint8)
+    return lut[index]
+
+
+def congestion_image(demand, capacity=None, colormap='inferno', vmax=None):
+    """RGBA raster of a RUDY map scaled to [0, vmax] (default: twice the capacity,
+    so sites at capacity sit mid scale, or the peak demand without a capacity)."""
+    return heat_map_image(demand, vmax or demand_scale(demand, capacity), colormap)
+
+
+def demand_scale(demand, capacity=None):
+    """Top of the color scale of a RUDY map: twice the capacity, or the peak demand."""
+    if capacity:
+        return 2.0 * capacity
+    return float(demand.max()) if demand.size and demand.max() > 0 else 1.0
+
+
+def create_heat_map_visualization(values, output_file, vmax, title, label, scale=1.0, colormap='inferno', dpi=150):
+    """Save a per-site value map as one raster image with a colorbar.
+
+    The colorbar runs from 0 to vmax / scale, so maps can be labelled in
+    other units than their values (e.g. demand / capacity).
+    """
+    import matplotlib.pyplot as plt
+
+    height, width = values.shape
+    fig, ax = plt.subplots(1, 1, figsize=(min(20, max(8, width / 20)), min(16, max(6, height / 20))))
+    ax.imshow(heat_map_image(values, vmax, colormap), extent=(0, width, height, 0),
+              interpolation='nearest', origin='upper')
+    colors = plt.cm.ScalarMappable(norm=plt.Normalize(0, vmax / scale), cmap=colormap)
+    fig.colorbar(colors, ax=ax, label=label)
+    ax.set_xlim(0, width)
+    ax.set_ylim(0, height)
+    ax.set_aspect('equal')
+    ax.invert_yaxis()
+    ax.set_xlabel('X Coordinate')
+    ax.set_ylabel('Y Coordinate')
+    ax.set_title(f'{title} ({width}×{height})')
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def create_congestion_visualization(demand, output_file, capacity=None, title='RUDY Congestion', dpi=150):
+    """Save the RUDY map as one raster image with a colorbar in capacity units
+    (in tracks per site without a capacity)."""
+    if capacity:
+        create_heat_map_visualization(demand, output_file, demand_scale(demand, capacity), title,
+                                      'demand / capacity', scale=capacity, dpi=dpi)
+    else:
+        create_heat_map_visualization(demand, output_file, demand_scale(demand), title,
+                                      'wire demand (tracks per site)', dpi=dpi)
+
+
+def format_congestion_report(stats):
+    """Text lines summarising a congestion_stats() result."""
+    lines = []
+    lines.append("CONGESTION (RUDY):")
+    lines.append("-" * 30)
+    lines.append(f"Sites: {stats['sites']}")
+    lines.append(f"Total Wire Demand: {stats['total_demand']:.1f} site pitches")
+    lines.append(f"Demand per Site (tracks): mean {stats['mean_demand']:.3f}, p95 {stats['p95_demand']:.3f}, "
+                 f"peak {stats['peak_demand']:.3f} at {stats['peak_site']}")
+    if stats['capacity']:
+        lines.append(f"Routing Capacity per Site: {stats['capacity']:g} tracks")
+        lines.append(f"Peak Overflow: {stats['peak_overflow'] * 100:.1f}%")
+        lines.append(f"95th Percentile Overflow: {stats['p95_overflow'] * 100:.1f}%")
+        lines.append(f"Overflowed Sites: {stats['overflowed_sites']}")
+    else:
+        lines.append("Overflow: not estimated (give --route-capacity in tracks per site)")
+    return lines
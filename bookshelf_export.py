@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Structured Export
+RDJordan 2025 / CFOGE
+
+Writes an analyzed design in a machine readable form, for dashboards that
+shouldn't have to parse Bookshelf text or hold a design's dicts in memory:
+
+    summary.jsonl     one JSON record per line, written as it is produced:
+                      a 'design' record with the headline counts, then
+                      'cell_type', 'fixed_type', 'site_type', 'utilization'
+                      and 'weights' records, and a 'table' record for every
+                      table file below
+    instances.*       one row per .nodes instance: name, cell, x, y, bel,
+                      fixed, pins (placed columns are -1 for instances the
+                      design's .pl doesn't place)
+    nets.*            one row per net: name, degree, weight (NaN without a
+                      .wts entry), driver (pin row, -1 if none)
+    pins.*            one row per net pin: net, instance (-1 if not in
+                      .nodes), pin, direction (-1 unknown, 0 in, 1 out), clock
+    sites.*           one row per SITEMAP site: x, y, type
+
+Tables are .npz archives of NumPy columns, or Parquet files when pyarrow is
+installed (--export-format parquet, or auto). Tables are built and written
+one at a time straight from the columnar design model.
+
+In the .npz files a string column <col> is stored as '<col>.utf8' (all
+values as UTF-8 bytes, back to back) plus '<col>.offsets' (value i is
+utf8[offsets[i]:offsets[i + 1]]). Low-cardinality strings (cell, pin, site
+type) are dictionary encoded: '<col>' holds int32 codes into the string
+column '<col>.values', -1 for none. load_table() reads either format back.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from bookshelf_utilization import compute_utilization
+
+EXPORT_FORMATS = ('auto', 'npz', 'parquet')
+
+
+class Dictionary:
+    """A dictionary encoded column: int32 codes into a list of values (-1 = none)."""
+
+    def __init__(self, codes, values):
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.values = list(values)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+def have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_format(table_format):
+    """'npz' or 'parquet' for an EXPORT_FORMATS choice ('auto' picks parquet when pyarrow is there)."""
+    if table_format == 'auto':
+        return 'parquet' if have_pyarrow() else 'npz'
+    if table_format == 'parquet' and not have_pyarrow():
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow), or use --export-format npz")
+    return table_format
+
+
+def encode_strings(names):
+    """(utf8 bytes, offsets) of a list of strings.
+
+    Bookshelf names never hold a newline, so they are joined with one, the
+    separators are found in a single pass and dropped from the bytes.
+    """
+    if not names:
+        return np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64)
+    joined = np.frombuffer('\n'.join(names).encode('utf-8'), dtype=np.uint8)
+    separators = np.flatnonzero(joined == ord('\n'))
+    offsets = np.empty(len(names) + 1, dtype=np.int64)
+    offsets[0] = 0
+    offsets[1:-1] = separators - np.arange(len(separators))
+    offsets[-1] = len(joined) - len(separators)
+    return np.delete(joined, separators), offsets
+
+
+def decode_strings(data, offsets):
+    """Inverse of encode_strings()."""
+    text = bytes(np.asarray(data))
+    return [text[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def write_npz(path, columns):
+    """Write {column: ndarray | list of str | Dictionary} as an uncompressed .npz."""
+    arrays = {}
+    for name, column in columns.items():
+        if isinstance(column, Dictionary):
+            arrays[name] = column.codes
+            arrays[f"{name}.values.utf8"], arrays[f"{name}.values.offsets"] = encode_strings(column.values)
+        elif isinstance(column, list):
+            arrays[f"{name}.utf8"], arrays[f"{name}.offsets"] = encode_strings(column)
+        else:
+            arrays[name] = np.asarray(column)
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def write_parquet(path, columns):
+    """Write {column: ndarray | list of str | Dictionary} as a Parquet file (needs pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrays = {}
+    for name, column in columns.items():
+        if isinstance(column, Dictionary):
+            codes = pa.array(column.codes, mask=column.codes < 0)
+            arrays[name] = pa.DictionaryArray.from_arrays(codes, pa.array(column.values, type=pa.string()))
+        elif isinstance(column, list):
+            arrays[name] = pa.array(column, type=pa.string())
+        else:
+            arrays[name] = pa.array(np.asarray(column))
+    pq.write_table(pa.table(arrays), path)
+
+
+def load_table(path, columns=None):
+    """Read an exported table back as {column: ndarray or list of str}.
+
+    Dictionary columns come back decoded to one string per row (None where
+    the code is -1). columns limits which columns are read.
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.read_table(path, columns=columns)
+        return {name: column.to_pylist() if pa.types.is_string(column.type) or pa.types.is_dictionary(column.type)
+                else column.to_numpy() for name, column in zip(parquet.column_names, parquet.columns)}
+
+    table = {}
+    with np.load(path) as archive:
+        keys = set(archive.files)
+        names = [key for key in archive.files if '.' not in key]
+        names += [key[:-len('.utf8')] for key in archive.files if key.endswith('.utf8') and '.values.' not in key]
+        for name in names:
+            if columns is not None and name not in columns:
+                continue
+            if f"{name}.values.utf8" in keys:
+                values = decode_strings(archive[f"{name}.values.utf8"], archive[f"{name}.values.offsets"])
+                table[name] = [values[code] if code >= 0 else None for code in archive[name].tolist()]
+            elif name in keys:
+                table[name] = archive[name]
+            else:
+                table[name] = decode_strings(archive[f"{name}.utf8"], archive[f"{name}.offsets"])
+    return table
+
+
+def instance_table(design):
+    """Columns of the per-instance table."""
+    num_instances = design.num_instances
+    x = np.full(num_instances, -1, dtype=np.int32)
+    y = np.full(num_instances, -1, dtype=np.int32)
+    bel = np.full(num_instances, -1, dtype=np.int32)
+    fixed = np.zeros(num_instances, dtype=bool)
+    placement = design.placement
+    known = placement.inst >= 0
+    rows = placement.inst[known]
+    x[rows], y[rows], bel[rows], fixed[rows] = (placement.x[known], placement.y[known],
+                                                 placement.bel[known], placement.fixed[known])
+    pins = design.pin_inst[design.pin_inst >= 0] if design.pin_instance_names is None else np.zeros(0, dtype=np.int32)
+    return {
+        'name': design.instance_names.names,
+        'cell': Dictionary(design.inst_cell, design.cell_names.names),
+        'x': x,
+        'y': y,
+        'bel': bel,
+        'fixed': fixed,
+        'pins': np.bincount(pins, minlength=num_instances).astype(np.int32),
+    }
+
+
+def net_table(design, weights):
+    """Columns of the per-net table."""
+    weight = np.array([weights.get(name, np.nan) for name in design.net_names.names], dtype=np.float64) \
+        if weights else np.full(design.num_nets, np.nan)
+    return {
+        'name': design.net_names.names,
+        'degree': np.diff(design.net_offsets).astype(np.int32) if design.num_nets else np.zeros(0, dtype=np.int32),
+        'weight': weight,
+        'driver': design.net_drivers(),
+    }
+
+
+def pin_table(design):
+    """Columns of the per-pin table (rows in net order, as in the .nets file)."""
+    resolved = design.pin_instance_names is None
+    return {
+        'net': design.pin_nets().astype(np.int32),
+        'instance': design.pin_inst if resolved else np.full(design.num_pins, -1, dtype=np.int32),
+        'pin': Dictionary(design.pin_libpin, design.pin_names.names),
+        'direction': design.pin_dir,
+        'clock': design.pin_clock,
+    }
+
+
+def site_table(site_grid):
+    """Columns of the per-site table (non-empty SITEMAP cells in row-major order)."""
+    y, x = np.nonzero(site_grid.grid)
+    return {
+        'x': x.astype(np.int32),
+        'y': y.astype(np.int32),
+        'type': Dictionary(site_grid.grid[y, x].astype(np.int32) - 1, site_grid.type_names),
+    }
+
+
+def summary_records(analyzer):
+    """Yield the summary.jsonl records (except the table records) of an analyzed design."""
+    design = analyzer.design
+    degrees = np.diff(design.net_offsets) if design.num_nets else np.zeros(0, dtype=np.int64)
+    yield {
+        'record': 'design',
+        'design': analyzer.analysis_results['design_name'],
+        'directory': str(analyzer.directory_path),
+        'nodes': design.num_instances,
+        'nets': design.num_nets,
+        'pins': design.num_pins,
+        'avg_pins_per_net': round(float(degrees.mean()), 3) if len(degrees) else 0.0,
+        'max_pins_per_net': int(degrees.max()) if len(degrees) else 0,
+        'cell_types': len(analyzer.cells),
+        'fixed_instances': len(analyzer.fixed_instances),
+        'width': analyzer.site_grid.width,
+        'height': analyzer.site_grid.height,
+        'sites': analyzer.site_grid.num_sites(),
+    }
+    for cell, count in analyzer.instance_types.most_common():
+        yield {'record': 'cell_type', 'cell': cell, 'instances': count}
+    for cell, count in analyzer.fixed_types.most_common():
+        yield {'record': 'fixed_type', 'cell': cell, 'instances': count}
+    for site_type, count in analyzer.site_type_counts.most_common():
+        yield {'record': 'site_type', 'site_type': site_type, 'sites': count}
+
+    utilization = compute_utilization(design, analyzer.site_grid, analyzer.sites, analyzer.resources)
+    for name, used, slots, available in zip(utilization['resource_names'], utilization['used'].tolist(),
+                                            utilization['slots'].tolist(), utilization['supply'].tolist()):
+        yield {'record': 'utilization', 'resource': name, 'used': used, 'slots': slots, 'available': available,
+               'percent': round(used / available * 100, 4) if available else 0.0}
+
+    if analyzer.weights:
+        values = np.fromiter(analyzer.weights.values(), dtype=np.float64, count=len(analyzer.weights))
+        yield {'record': 'weights', 'count': len(values), 'mean': float(values.mean()),
+               'min': float(values.min()), 'max': float(values.max())}
+
+
+def export_design(analyzer, output_dir, table_format='auto'):
+    """Write summary.jsonl and the instance / net / pin / site tables to output_dir.
+
+    Returns {file name: rows (records for summary.jsonl)} of what was written.
+    """
+    table_format = resolve_format(table_format)
+    write_table = write_parquet if table_format == 'parquet' else write_npz
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    design = analyzer.design
+
+    tables = [
+        ('instances', lambda: instance_table(design)),
+        ('nets', lambda: net_table(design, analyzer.weights)),
+        ('pins', lambda: pin_table(design)),
+        ('sites', lambda: site_table(analyzer.site_grid)),
+    ]
+    written = {}
+    records = 0
+    with open(output_dir / 'summary.jsonl', 'w') as summary:
+        for record in summary_records(analyzer):
+            summary.write(json.dumps(record) + '\n')
+            records += 1
+
+        for name, build in tables:
+            columns = build()
+            file_name = f"{name}.{table_format}"
+            write_table(output_dir / file_name, columns)
+            rows = len(next(iter(columns.values())))
+            summary.write(json.dumps({'record': 'table', 'table': name, 'path': file_name, 'format': table_format,
+                                      'rows': rows, 'columns': list(columns)}) + '\n')
+            written[file_name] = rows
+            records += 1
+    written['summary.jsonl'] = records
+    return written
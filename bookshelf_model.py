@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Design Model
+RDJordan 2025 / CFOGE
+
+Compact, columnar storage for a parsed Bookshelf design. Names are interned
+into string tables once and everything else is kept as int32 NumPy arrays:
+
+    inst_cell    instance id -> cell id
+    net_offsets  CSR offsets, pins of net n are pin_*[net_offsets[n]:net_offsets[n + 1]]
+    pin_inst     pin -> instance id
+    pin_libpin   pin -> lib pin name id
+    placement    x / y / bel arrays for the instances listed in a .pl file
+
+instance_nets() builds the inverse instance -> net CSR index on demand.
+
+The dict-shaped views at the bottom of this file wrap the arrays so older code
+that expects {name: cell_type} style dictionaries keeps working. They build
+their values on access, nothing is copied up front.
+"""
+
+from array import array
+from collections import Counter
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+
+def int_builder():
+    """Growable int buffer used while streaming a file, ~4 bytes per entry."""
+    return array('i')
+
+
+def to_int32(values):
+    """Convert an int_builder() (or any sequence) to an int32 NumPy array."""
+    return np.array(values, dtype=np.int32)
+
+
+class StringTable:
+    """Interned names with dense integer ids, in first-seen order."""
+
+    def __init__(self, names=None):
+        self.names = []
+        self._ids = {}
+        for name in names or ():
+            self.intern(name)
+
+    @classmethod
+    def from_names(cls, names):
+        """Wrap an existing name list; the name -> id index is built on first use."""
+        table = cls()
+        table.names = list(names)
+        table._ids = None
+        return table
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = {name: idx for idx, name in enumerate(self.names)}
+        return self._ids
+
+    def __getstate__(self):
+        # Only ship the names to/from worker processes, the index is rebuilt on demand
+        return {'names': self.names, '_ids': None}
+
+    def intern(self, name):
+        """Return the id of name, adding it to the table if it is new."""
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.ids[name] = idx
+            self.names.append(name)
+        return idx
+
+    def append(self, name):
+        """Add a new slot for name even if it already exists (file-order records)."""
+        idx = len(self.names)
+        self.ids[name] = idx
+        self.names.append(name)
+        return idx
+
+    def get(self, name, default=-1):
+        return self.ids.get(name, default)
+
+    def lookup(self, names):
+        """Vector lookup of many names, unknown names map to -1."""
+        ids = self.ids
+        return np.fromiter((ids.get(name, -1) for name in names), dtype=np.int32, count=len(names))
+
+    def __getitem__(self, idx):
+        return self.names[idx]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def intern_column(names):
+    """Intern a whole column of names at once.
+
+    Returns (table, keep) where keep selects, per table id, the row holding
+    its last value (a repeated name keeps its first id and its last row, like
+    repeated intern() calls overwriting a value would). keep is None when the
+    names are already unique.
+    """
+    table = StringTable.from_names(names)
+    if len(table.ids) == len(names):
+        return table, None
+    table = StringTable()
+    ids = to_int32([table.intern(name) for name in names])
+    _, last_reversed = np.unique(ids[::-1], return_index=True)
+    return table, len(ids) - 1 - last_reversed
+
+
+class Placement:
+    """Locations read from a .pl file, one row per line in file order."""
+
+    def __init__(self):
+        self.names = StringTable()
+        self.inst = np.zeros(0, dtype=np.int32)
+        self.x = np.zeros(0, dtype=np.int32)
+        self.y = np.zeros(0, dtype=np.int32)
+        self.bel = np.zeros(0, dtype=np.int32)
+        self.fixed = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.x)
+
+    def set_rows(self, names, x, y, bel, fixed):
+        """Fill the placement from whole columns (a repeated name keeps its last location)."""
+        self.names, keep = intern_column(names)
+        if keep is not None:
+            x, y, bel, fixed = x[keep], y[keep], bel[keep], fixed[keep]
+        self.x = np.asarray(x, dtype=np.int32)
+        self.y = np.asarray(y, dtype=np.int32)
+        self.bel = np.asarray(bel, dtype=np.int32)
+        self.fixed = np.asarray(fixed, dtype=bool)
+
+    def resolve(self, instance_names):
+        """Map placement rows to design instance ids (-1 if not in .nodes)."""
+        self.inst = instance_names.lookup(self.names.names)
+        return self.inst
+
+
+def is_clock_pin(pin):
+    """True for a .lib pin that takes a clock: a CLOCK attribute, or an input named *CLK*.
+
+    Not every .lib marks its clocks (the ISPD 2016 RAMB36E2 CLKARDCLK /
+    CLKBWRCLK pins carry no attribute), so the name is checked as well.
+    """
+    return 'CLOCK' in pin['attributes'] or (pin['type'] == 'INPUT' and 'CLK' in pin['name'].upper())
+
+
+class DesignModel:
+    """Columnar view of a Bookshelf design (instances, nets and placement)."""
+
+    # pin_dir values
+    PIN_UNKNOWN = -1
+    PIN_INPUT = 0
+    PIN_OUTPUT = 1
+
+    def __init__(self):
+        self.instance_names = StringTable()
+        self.cell_names = StringTable()
+        self.pin_names = StringTable()
+        self.net_names = StringTable()
+
+        self.inst_cell = np.zeros(0, dtype=np.int32)
+        self.net_degree = np.zeros(0, dtype=np.int32)
+        self.net_offsets = np.zeros(1, dtype=np.int32)
+        self.pin_inst = np.zeros(0, dtype=np.int32)
+        self.pin_libpin = np.zeros(0, dtype=np.int32)
+
+        # Per pin direction and CLOCK attribute from the .lib, see resolve_pin_directions()
+        self.pin_dir = np.zeros(0, dtype=np.int8)
+        self.pin_clock = np.zeros(0, dtype=bool)
+        self._instance_nets = None
+
+        # Names behind pin_inst while it still holds .nets-local ids, i.e. the
+        # .nets file was parsed before (or without) the .nodes file
+        self.pin_instance_names = None
+
+        self.placement = Placement()
+
+    @property
+    def num_instances(self):
+        return len(self.inst_cell)
+
+    @property
+    def num_nets(self):
+        return len(self.net_degree)
+
+    @property
+    def num_pins(self):
+        return len(self.pin_inst)
+
+    def resolve_instances(self):
+        """Map pins and placement rows to instance ids once the .nodes names are known.
+
+        Lets the .nodes, .nets and .pl files be parsed in any order (or in
+        separate processes) and joined up afterwards.
+        """
+        if self.pin_instance_names is not None and len(self.instance_names):
+            remap = self.instance_names.lookup(self.pin_instance_names.names)
+            self.pin_inst = remap[self.pin_inst] if len(self.pin_inst) else self.pin_inst
+            self.pin_instance_names = None
+        self._instance_nets = None
+        self.placement.resolve(self.instance_names)
+
+    def pin_instance_name(self, inst):
+        """Name of the instance behind a pin_inst entry (None if not in .nodes)."""
+        if self.pin_instance_names is not None:
+            return self.pin_instance_names[inst]
+        return self.instance_names[inst] if inst >= 0 else None
+
+    def merge_node_chunks(self, chunks):
+        """Join per-chunk .nodes results (in file order) into this model.
+
+        Each chunk is a dict with 'instance_names', 'cell_names' and 'inst_cell'
+        as produced by parsing that chunk on its own; the result is the same as
+        parsing the whole file in one go.
+        """
+        cell_names = StringTable()
+        names = []
+        inst_cell = []
+        for chunk in chunks:
+            cell_remap = to_int32([cell_names.intern(name) for name in chunk['cell_names'].names])
+            names.extend(chunk['instance_names'].names)
+            inst_cell.append(cell_remap[chunk['inst_cell']])
+        inst_cell = np.concatenate(inst_cell) if inst_cell else np.zeros(0, dtype=np.int32)
+
+        # An instance repeated across chunks keeps its first id and its last cell type
+        instance_names, keep = intern_column(names)
+        self.instance_names = instance_names
+        self.cell_names = cell_names
+        self.inst_cell = inst_cell if keep is None else inst_cell[keep]
+
+    def merge_net_chunks(self, chunks):
+        """Join per-chunk .nets results (in file order) into this model.
+
+        Chunks must still hold .nets-local pin instance ids (parsed without the
+        .nodes names). Pin and instance name tables are re-interned in chunk
+        order, so ids come out exactly as the serial parser would assign them.
+        """
+        net_names = []
+        pin_names = StringTable()
+        pin_instance_names = StringTable()
+        net_degree, net_offsets, pin_inst, pin_libpin = [], [], [], []
+        pin_base = 0
+        for chunk in chunks:
+            net_names.extend(chunk['net_names'].names)
+            net_degree.append(chunk['net_degree'])
+            net_offsets.append(chunk['net_offsets'][:-1] + pin_base)
+            libpin_remap = to_int32([pin_names.intern(name) for name in chunk['pin_names'].names])
+            pin_libpin.append(libpin_remap[chunk['pin_libpin']])
+            inst_remap = to_int32([pin_instance_names.intern(name) for name in chunk['pin_instance_names'].names])
+            pin_inst.append(inst_remap[chunk['pin_inst']])
+            pin_base += len(chunk['pin_inst'])
+        net_offsets.append(np.array([pin_base], dtype=np.int32))
+
+        self.net_names = StringTable.from_names(net_names)
+        self.pin_names = pin_names
+        self.pin_instance_names = pin_instance_names
+        self.net_degree = np.concatenate(net_degree).astype(np.int32) if net_degree else np.zeros(0, dtype=np.int32)
+        self.net_offsets = np.concatenate(net_offsets).astype(np.int32)
+        self.pin_inst = np.concatenate(pin_inst).astype(np.int32) if pin_inst else np.zeros(0, dtype=np.int32)
+        self.pin_libpin = np.concatenate(pin_libpin).astype(np.int32) if pin_libpin else np.zeros(0, dtype=np.int32)
+
+    def pin_nets(self):
+        """Net id of every pin (the CSR net_offsets expanded to one entry per pin)."""
+        return np.repeat(np.arange(self.num_nets, dtype=np.int32), np.diff(self.net_offsets))
+
+    def resolve_pin_directions(self, cells):
+        """Fill pin_dir / pin_clock from the .lib cells ({cell: {'pins': [...]}}).
+
+        A pin's direction is that of the lib pin with the same name on its
+        instance's cell, pin_clock follows is_clock_pin(). Pins whose
+        instance, cell or lib pin is unknown get PIN_UNKNOWN and no clock
+        flag. The lookup is one (cell, lib pin) table indexed by all pins at
+        once.
+        """
+        num_cells, num_libpins = len(self.cell_names), len(self.pin_names)
+        # One padding row/column so the -1 ids of unknown instances / lib pins land on PIN_UNKNOWN
+        direction = np.full((num_cells + 1, num_libpins + 1), self.PIN_UNKNOWN, dtype=np.int8)
+        clock = np.zeros(direction.shape, dtype=bool)
+        for cell_id, cell_name in enumerate(self.cell_names):
+            for pin in cells.get(cell_name, {}).get('pins', []):
+                libpin = self.pin_names.get(pin['name'])
+                if libpin < 0:
+                    continue
+                direction[cell_id, libpin] = self.PIN_OUTPUT if pin['type'] == 'OUTPUT' else self.PIN_INPUT
+                clock[cell_id, libpin] = is_clock_pin(pin)
+
+        pin_cell = np.full(self.num_pins, -1, dtype=np.int32)
+        # Until the .nodes names are in, pin_inst still holds .nets-local ids
+        known = (self.pin_inst >= 0) & (self.pin_instance_names is None)
+        pin_cell[known] = self.inst_cell[self.pin_inst[known]]
+        self.pin_dir = direction[pin_cell, self.pin_libpin]
+        self.pin_clock = clock[pin_cell, self.pin_libpin]
+        return self.pin_dir
+
+    def net_drivers(self):
+        """Driving pin of every net: its first OUTPUT pin, -1 for nets without one."""
+        driver = np.full(self.num_nets, -1, dtype=np.int64)
+        out_pins = np.flatnonzero(self.pin_dir == self.PIN_OUTPUT)[::-1]
+        driver[self.pin_nets()[out_pins]] = out_pins
+        return driver
+
+    def instance_nets(self):
+        """Instance -> net inverted index in CSR form: (inst_offsets, inst_nets).
+
+        The nets of instance i are inst_nets[inst_offsets[i]:inst_offsets[i + 1]],
+        one entry per pin (an instance with two pins on a net lists it twice).
+        Pins of instances missing from .nodes are left out. Built on first use
+        and kept, since the connectivity doesn't change after parsing.
+        """
+        if self._instance_nets is not None and len(self._instance_nets[0]) == self.num_instances + 1:
+            return self._instance_nets
+        pin_inst = self.pin_inst
+        known = pin_inst >= 0
+        order = np.argsort(pin_inst[known], kind='stable')
+        inst_nets = self.pin_nets()[known][order]
+        counts = np.bincount(pin_inst[known], minlength=self.num_instances)
+        inst_offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=inst_offsets[1:])
+        self._instance_nets = (inst_offsets, inst_nets.astype(np.int32))
+        return self._instance_nets
+
+    def instance_type_counts(self):
+        """Counter of cell type -> instance count, in first-seen cell order."""
+        counts = np.bincount(self.inst_cell, minlength=len(self.cell_names))
+        return Counter({self.cell_names[i]: int(c) for i, c in enumerate(counts) if c})
+
+    def nbytes(self):
+        """Bytes held by the NumPy arrays (string tables not included)."""
+        arrays = [self.inst_cell, self.net_degree, self.net_offsets, self.pin_inst, self.pin_libpin,
+                  self.placement.inst, self.placement.x, self.placement.y, self.placement.bel,
+                  self.placement.fixed, self.pin_dir, self.pin_clock]
+        if self._instance_nets is not None:
+            arrays.extend(self._instance_nets)
+        return sum(a.nbytes for a in arrays)
+
+
+class SiteGrid:
+    """Dense (height, width) uint8 grid of site type ids for a SITEMAP.
+
+    Cell value 0 means no site, value k is type_names[k - 1]. Type ids follow
+    the order in which the types first appear in the .scl file.
+    """
+
+    EMPTY = 0
+
+    def __init__(self, width=0, height=0, type_names=None, grid=None):
+        self.width = width
+        self.height = height
+        self.type_names = list(type_names or [])
+        self.grid = grid if grid is not None else np.zeros((height, width), dtype=np.uint8)
+
+    @classmethod
+    def from_columns(cls, width, height, x, y, type_names, type_ids):
+        """Scatter x / y / type id columns into a grid. Returns (grid, out_of_bounds count)."""
+        if len(type_names) > 255:
+            raise ValueError(f"Too many site types for a uint8 site grid: {len(type_names)}")
+        site_grid = cls(width, height, type_names)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        site_grid.grid[y[inside], x[inside]] = np.asarray(type_ids)[inside] + 1
+        return site_grid, int((~inside).sum())
+
+    def type_id(self, site_type):
+        """Grid value used for a site type name (0 if unknown)."""
+        try:
+            return self.type_names.index(site_type) + 1
+        except ValueError:
+            return self.EMPTY
+
+    def type_at(self, x, y):
+        value = int(self.grid[y, x])
+        return self.type_names[value - 1] if value else None
+
+    def type_counts(self, grid=None):
+        """Site count per type id (index 0 = empty cells)."""
+        grid = self.grid if grid is None else grid
+        return np.bincount(grid.ravel(), minlength=len(self.type_names) + 1)
+
+    def counts(self):
+        """Counter of site type -> number of sites, in first-seen type order."""
+        counts = self.type_counts()
+        return Counter({name: int(counts[i + 1]) for i, name in enumerate(self.type_names) if counts[i + 1]})
+
+    def num_sites(self):
+        return int(np.count_nonzero(self.grid))
+
+    def region_counts(self, x0, y0, x1, y1):
+        """Counter of site types inside the half-open box [x0, x1) x [y0, y1)."""
+        counts = self.type_counts(self.grid[max(y0, 0):y1, max(x0, 0):x1])
+        return Counter({name: int(counts[i + 1]) for i, name in enumerate(self.type_names) if counts[i + 1]})
+
+    def sites_of_type(self, site_type):
+        """(x, y) arrays of every site of the given type."""
+        y, x = np.nonzero(self.grid == self.type_id(site_type))
+        return x, y
+
+    def resource_matrix(self, sites):
+        """(resource names, capacity matrix) with one row per grid value.
+
+        Row k holds the per-site resource capacity of type k (row 0, the empty
+        cell, is all zeros); resources are ordered by first use over the types.
+        """
+        resource_names = []
+        for site_type in self.type_names:
+            for resource in sites.get(site_type, {}).get('resources', {}):
+                if resource not in resource_names:
+                    resource_names.append(resource)
+        matrix = np.zeros((len(self.type_names) + 1, len(resource_names)), dtype=np.int64)
+        for i, site_type in enumerate(self.type_names):
+            for resource, capacity in sites.get(site_type, {}).get('resources', {}).items():
+                matrix[i + 1, resource_names.index(resource)] = capacity
+        return resource_names, matrix
+
+    def resource_totals(self, sites):
+        """{resource: total capacity} over the whole grid, from the SITE definitions."""
+        resource_names, matrix = self.resource_matrix(sites)
+        totals = self.type_counts() @ matrix
+        return dict(zip(resource_names, totals.tolist()))
+
+    def resource_map(self, sites, resource):
+        """(height, width) array of the capacity of one resource at every site."""
+        resource_names, matrix = self.resource_matrix(sites)
+        if resource not in resource_names:
+            return np.zeros(self.grid.shape, dtype=np.int64)
+        return matrix[:, resource_names.index(resource)][self.grid]
+
+
+class SiteMapView(Sequence):
+    """[{'x', 'y', 'type'}, ...] view over a SiteGrid, ordered by x then y."""
+
+    def __init__(self, site_grid):
+        self.site_grid = site_grid
+        self._coords = None
+
+    def _coordinates(self):
+        if self._coords is None:
+            x, y = np.nonzero(self.site_grid.grid.T)
+            self._coords = (x.astype(np.int32), y.astype(np.int32))
+        return self._coords
+
+    def __getitem__(self, idx):
+        x, y = self._coordinates()
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(x)))]
+        return {'x': int(x[idx]), 'y': int(y[idx]), 'type': self.site_grid.type_at(x[idx], y[idx])}
+
+    def __len__(self):
+        return self.site_grid.num_sites()
+
+    def __getstate__(self):
+        return {'site_grid': self.site_grid, '_coords': None}
+
+
+class InstancesView(Mapping):
+    """{instance_name: cell_type} view over DesignModel.inst_cell."""
+
+    def __init__(self, design):
+        self.design = design
+
+    def __getitem__(self, name):
+        idx = self.design.instance_names.ids[name]
+        return self.design.cell_names[self.design.inst_cell[idx]]
+
+    def __contains__(self, name):
+        return name in self.design.instance_names
+
+    def __iter__(self):
+        return iter(self.design.instance_names)
+
+    def __len__(self):
+        return self.design.num_instances
+
+
+class NetsView(Mapping):
+    """{net_name: {'name', 'pin_count', 'connections'}} view over the net CSR arrays."""
+
+    def __init__(self, design):
+        self.design = design
+
+    def _net(self, idx):
+        design = self.design
+        start, end = design.net_offsets[idx], design.net_offsets[idx + 1]
+        connections = [
+            {'instance': design.pin_instance_name(inst), 'pin': design.pin_names[pin]}
+            for inst, pin in zip(design.pin_inst[start:end].tolist(), design.pin_libpin[start:end].tolist())
+        ]
+        return {
+            'name': design.net_names[idx],
+            'pin_count': int(design.net_degree[idx]),
+            'connections': connections
+        }
+
+    def __getitem__(self, name):
+        return self._net(self.design.net_names.ids[name])
+
+    def __contains__(self, name):
+        return name in self.design.net_names
+
+    def __iter__(self):
+        return iter(self.design.net_names)
+
+    def __len__(self):
+        return self.design.num_nets
+
+    def values(self):
+        return (self._net(idx) for idx in range(self.design.num_nets))
+
+
+class PlacementView(Mapping):
+    """{instance_name: {'x', 'y', 'bel'}} view over a Placement."""
+
+    def __init__(self, placement):
+        self.placement = placement
+
+    def __getitem__(self, name):
+        idx = self.placement.names.ids[name]
+        return {
+            'x': int(self.placement.x[idx]),
+            'y': int(self.placement.y[idx]),
+            'bel': int(self.placement.bel[idx])
+        }
+
+    def __contains__(self, name):
+        return name in self.placement.names
+
+    def __iter__(self):
+        return iter(self.placement.names)
+
+    def __len__(self):
+        return len(self.placement.names)
@@ -0,0 +1,702 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Placement Evaluation
+RDJordan 2025 / CFOGE
+
+Scores a placement (a placer output .pl listing every instance) against the
+nets of a parsed design. Everything works on the columnar DesignModel arrays:
+instance locations are gathered onto the pins through pin_inst, and per-net
+bounding boxes come from NumPy reduceat over the net CSR offsets, so there is
+no Python loop per net.
+
+    design = analyzer.design                 # after analyze_directory()
+    placement = read_placement_file('placed.pl')
+    result = evaluate_hpwl(design, placement, analyzer.weights)
+    result['total_hpwl'], result['net_hpwl']
+
+check_legality() verifies sites, BEL capacities, overlaps and FIXED cells.
+
+diff_placements() aligns two placements of the same design on instance ids
+and reports what moved, by how much, and any FIXED instance that moved.
+
+RegionResources answers resource supply / placed demand of any rectangle in
+O(1) from per-resource summed-area tables over the site grid.
+
+IncrementalHPWL keeps the per-net boxes and answers "what does this move or
+swap cost" by recomputing only the nets incident to the moved instances.
+
+Coordinates are site coordinates from the .pl file; pins sit at the location
+of their instance.
+"""
+
+import numpy as np
+
+from bookshelf_model import Placement
+from bookshelf_tokenizer import TokenizedFile
+from bookshelf_utilization import SHARED_BEL_WEIGHTS, cell_resource_ids
+
+
+def read_placement_file(pl_file_path):
+    """Read every located instance of a .pl file (FIXED or not) into a Placement."""
+    placement = Placement()
+
+    try:
+        tokens = TokenizedFile(pl_file_path)
+        rows = tokens.rows(min_fields=4)
+        fixed = (tokens.line_count[rows] >= 5) & tokens.equals(tokens.field(rows, -1), b'FIXED')
+        x, x_ok = tokens.as_int(tokens.field(rows, 1))
+        y, y_ok = tokens.as_int(tokens.field(rows, 2))
+        bel, bel_ok = tokens.as_int(tokens.field(rows, 3))
+        valid = x_ok & y_ok & bel_ok
+        if not valid[fixed].all():
+            raise ValueError(f"invalid location on line {rows[fixed & ~valid][0] + 1}")
+
+        # Lines that don't hold a location (headers and such) are skipped
+        rows, fixed = rows[valid], fixed[valid]
+        placement.set_rows(tokens.as_strings(tokens.field(rows, 0)), x[valid], y[valid], bel[valid], fixed)
+
+    except Exception as e:
+        print(f"Error reading placement file {pl_file_path}: {e}")
+        return Placement()
+
+    return placement
+
+
+def instance_locations(design, placement):
+    """(x, y) float64 arrays with the location of every design instance.
+
+    Instances the placement doesn't mention are NaN. One extra NaN slot is
+    appended at the end so pin_inst entries of -1 (instances missing from
+    .nodes) index an unplaced location too.
+    """
+    inst = placement.resolve(design.instance_names)
+    known = inst >= 0
+    inst_x = np.full(design.num_instances + 1, np.nan)
+    inst_y = np.full(design.num_instances + 1, np.nan)
+    inst_x[inst[known]] = placement.x[known]
+    inst_y[inst[known]] = placement.y[known]
+    return inst_x, inst_y
+
+
+def net_bounding_boxes(design, inst_x, inst_y):
+    """(xmin, xmax, ymin, ymax) per net over its placed pins, NaN for nets without any."""
+    num_nets = design.num_nets
+    boxes = [np.full(num_nets, np.nan) for _ in range(4)]
+    if not design.num_pins:
+        return tuple(boxes)
+
+    pin_x = inst_x[design.pin_inst]
+    pin_y = inst_y[design.pin_inst]
+
+    # reduceat over the start offset of every non-empty net; empty nets in
+    # between have no pins so they don't change the segments
+    starts = design.net_offsets[:-1]
+    nonempty = np.flatnonzero(np.diff(design.net_offsets) > 0)
+    with np.errstate(invalid='ignore'):
+        boxes[0][nonempty] = np.fmin.reduceat(pin_x, starts[nonempty])
+        boxes[1][nonempty] = np.fmax.reduceat(pin_x, starts[nonempty])
+        boxes[2][nonempty] = np.fmin.reduceat(pin_y, starts[nonempty])
+        boxes[3][nonempty] = np.fmax.reduceat(pin_y, starts[nonempty])
+    return tuple(boxes)
+
+
+def net_weight_array(design, weights=None):
+    """Per-net weight from a {net_name: weight} mapping (.wts), 1.0 for nets not listed."""
+    net_weights = np.ones(design.num_nets)
+    if weights:
+        ids = design.net_names.lookup(list(weights))
+        values = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        known = ids >= 0
+        net_weights[ids[known]] = values[known]
+    return net_weights
+
+
+def evaluate_hpwl(design, placement, weights=None):
+    """Half-perimeter wirelength of every net and the design totals.
+
+    Returns a dict with the per-net arrays 'net_hpwl' (0 for nets without a
+    placed pin), 'net_hpwl_x' / 'net_hpwl_y' and 'net_weights', plus the
+    totals and the counts of unplaced instances and nets. Weighted totals use
+    the .wts weights (by net name) when given.
+    """
+    inst_x, inst_y = instance_locations(design, placement)
+    xmin, xmax, ymin, ymax = net_bounding_boxes(design, inst_x, inst_y)
+
+    placed_nets = ~np.isnan(xmin)
+    hpwl_x = np.where(placed_nets, xmax - xmin, 0.0)
+    hpwl_y = np.where(placed_nets, ymax - ymin, 0.0)
+    net_hpwl = hpwl_x + hpwl_y
+    net_weights = net_weight_array(design, weights)
+
+    pin_placed = ~np.isnan(inst_x[design.pin_inst])
+    partial = np.zeros(design.num_nets, dtype=bool)
+    partial[design.pin_nets()[~pin_placed]] = True
+
+    return {
+        'net_hpwl': net_hpwl,
+        'net_hpwl_x': hpwl_x,
+        'net_hpwl_y': hpwl_y,
+        'net_weights': net_weights,
+        'total_hpwl': float(net_hpwl.sum()),
+        'total_hpwl_x': float(hpwl_x.sum()),
+        'total_hpwl_y': float(hpwl_y.sum()),
+        'weighted_hpwl': float(net_hpwl @ net_weights),
+        'nets': design.num_nets,
+        'pins': design.num_pins,
+        'placed_nets': int(placed_nets.sum()),
+        'partially_placed_nets': int((partial & placed_nets).sum()),
+        'unplaced_nets': int((~placed_nets).sum()),
+        'unplaced_instances': int(np.isnan(inst_x[:-1]).sum()),
+        'unknown_placed_instances': int((placement.inst < 0).sum())
+    }
+
+
+class IncrementalHPWL:
+    """Delta-HPWL cost kernel for move based placers (annealing, detailed placement).
+
+    Keeps every net's bounding box and HPWL in arrays. propose() takes new
+    locations for a few instances and returns the weighted HPWL change,
+    recomputing only the nets incident to those instances (found through the
+    instance -> net inverted index). The proposal is then either commit()ted,
+    which writes the new boxes and locations back, or reject()ed, which just
+    drops it.
+
+        kernel = IncrementalHPWL(design, placement, weights)
+        delta = kernel.propose_swap(a, b)
+        if delta < 0:
+            kernel.commit()
+        else:
+            kernel.reject()
+
+    Instances are design instance ids (see instance_ids() for names).
+    """
+
+    def __init__(self, design, placement, weights=None):
+        self.design = design
+        self.inst_x, self.inst_y = instance_locations(design, placement)
+        self.inst_offsets, self.inst_nets = design.instance_nets()
+        self.net_weights = net_weight_array(design, weights)
+        self.degree = np.diff(design.net_offsets)
+
+        self.xmin, self.xmax, self.ymin, self.ymax = net_bounding_boxes(design, self.inst_x, self.inst_y)
+        self.net_hpwl = self._hpwl(self.xmin, self.xmax, self.ymin, self.ymax)
+        self.total = float(self.net_hpwl @ self.net_weights)
+        self.pending = None
+
+    @staticmethod
+    def _hpwl(xmin, xmax, ymin, ymax):
+        hpwl = (xmax - xmin) + (ymax - ymin)
+        return np.where(np.isnan(hpwl), 0.0, hpwl)
+
+    def instance_ids(self, names):
+        """Design instance ids of instance names (-1 for unknown names)."""
+        return self.design.instance_names.lookup(list(names))
+
+    def nets_of(self, instances):
+        """Sorted unique nets incident to the given instances."""
+        starts, ends = self.inst_offsets[instances], self.inst_offsets[instances + 1]
+        if len(instances) == 1:
+            return np.unique(self.inst_nets[starts[0]:ends[0]])
+        return np.unique(np.concatenate([self.inst_nets[s:e] for s, e in zip(starts.tolist(), ends.tolist())]))
+
+    def propose(self, instances, x, y):
+        """Weighted HPWL change of moving instances to (x, y); the move is kept pending.
+
+        A new proposal replaces any pending one.
+        """
+        instances = np.atleast_1d(np.asarray(instances, dtype=np.int64))
+        if len(instances) and (instances.min() < 0 or instances.max() >= self.design.num_instances):
+            raise ValueError("instance ids must be design instance ids (0 .. num_instances - 1)")
+        x = np.broadcast_to(np.asarray(x, dtype=np.float64), instances.shape)
+        y = np.broadcast_to(np.asarray(y, dtype=np.float64), instances.shape)
+        nets = self.nets_of(instances)
+
+        # Pins of the touched nets, as one flat index array with local CSR offsets
+        lengths = self.degree[nets]
+        local_offsets = np.zeros(len(nets) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=local_offsets[1:])
+        pins = np.repeat(self.design.net_offsets[nets] - local_offsets[:-1], lengths) + np.arange(local_offsets[-1])
+        pin_inst = self.design.pin_inst[pins]
+        pin_x = self.inst_x[pin_inst]
+        pin_y = self.inst_y[pin_inst]
+
+        # Override the moved instances (the last entry wins if one is listed twice)
+        order = np.argsort(instances, kind='stable')
+        sorted_instances = instances[order]
+        slot = np.clip(np.searchsorted(sorted_instances, pin_inst, side='right') - 1, 0, len(instances) - 1)
+        moved = sorted_instances[slot] == pin_inst
+        pin_x[moved] = x[order][slot[moved]]
+        pin_y[moved] = y[order][slot[moved]]
+
+        boxes = [np.full(len(nets), np.nan) for _ in range(4)]
+        nonempty = np.flatnonzero(lengths > 0)
+        if len(nonempty):
+            starts = local_offsets[:-1][nonempty]
+            with np.errstate(invalid='ignore'):
+                boxes[0][nonempty] = np.fmin.reduceat(pin_x, starts)
+                boxes[1][nonempty] = np.fmax.reduceat(pin_x, starts)
+                boxes[2][nonempty] = np.fmin.reduceat(pin_y, starts)
+                boxes[3][nonempty] = np.fmax.reduceat(pin_y, starts)
+        new_hpwl = self._hpwl(*boxes)
+
+        delta = float((new_hpwl - self.net_hpwl[nets]) @ self.net_weights[nets])
+        self.pending = (instances, x, y, nets, boxes, new_hpwl, delta)
+        return delta
+
+    def propose_move(self, instance, x, y):
+        """Weighted HPWL change of moving one instance to (x, y)."""
+        return self.propose([instance], [x], [y])
+
+    def propose_swap(self, a, b):
+        """Weighted HPWL change of exchanging the locations of instances a and b."""
+        return self.propose([a, b], [self.inst_x[b], self.inst_x[a]], [self.inst_y[b], self.inst_y[a]])
+
+    def commit(self):
+        """Apply the pending proposal. Returns its delta (0.0 if nothing was pending)."""
+        if self.pending is None:
+            return 0.0
+        instances, x, y, nets, boxes, new_hpwl, delta = self.pending
+        self.inst_x[instances] = x
+        self.inst_y[instances] = y
+        self.xmin[nets], self.xmax[nets], self.ymin[nets], self.ymax[nets] = boxes
+        self.net_hpwl[nets] = new_hpwl
+        self.total += delta
+        self.pending = None
+        return delta
+
+    def reject(self):
+        """Drop the pending proposal."""
+        self.pending = None
+
+    def recompute(self):
+        """Full weighted HPWL from the current locations (for checking drift)."""
+        boxes = net_bounding_boxes(self.design, self.inst_x, self.inst_y)
+        return float(self._hpwl(*boxes) @ self.net_weights)
+
+
+def check_legality(design, placement, site_grid, sites, resources, reference=None, weights=None):
+    """Legality of a full placement against the site map and the SITE capacities.
+
+    Every placed instance must sit on a site whose type provides its cell's
+    resource, with a BEL index below that resource's capacity, and no two
+    instances may share a site + resource + BEL slot. A cell in weights
+    (default SHARED_BEL_WEIGHTS, as in the utilization engine) fills w BELs:
+    the aligned group of w holding its BEL, so a LUT6 takes both LUTs of its
+    pair and collides with a LUT5 on the other one. Slots are encoded as one
+    int64 key per occupied BEL, ((x * H + y) * B + resource base + bel) with
+    B the largest number of BELs of any site, and overlaps come from
+    np.unique over those keys. With a reference placement (the design's original .pl), its
+    FIXED instances must appear in the placement at the same x / y / bel.
+
+    Returns a dict of per-row boolean masks over the placement rows plus
+    summary counts (see format_legality_report()).
+    """
+    inst = placement.resolve(design.instance_names)
+    x = placement.x.astype(np.int64)
+    y = placement.y.astype(np.int64)
+    bel = placement.bel.astype(np.int64)
+    width, height = site_grid.width, site_grid.height
+
+    resource_names, capacity = site_grid.resource_matrix(sites)
+    # First BEL slot of each resource within a site, so LUT 3 and FF 3 don't collide
+    bases = np.zeros_like(capacity)
+    if capacity.shape[1]:
+        bases[:, 1:] = np.cumsum(capacity, axis=1)[:, :-1]
+    slots_per_site = int(capacity.sum(axis=1).max()) if capacity.size else 1
+
+    not_in_nodes = inst < 0
+    cell = np.where(not_in_nodes, -1, design.inst_cell[np.maximum(inst, 0)])
+    cell_resource = cell_resource_ids(design, resource_names, resources)
+    resource = np.where(cell >= 0, cell_resource[np.maximum(cell, 0)] if len(cell_resource) else -1, -1)
+    unknown_resource = ~not_in_nodes & (resource < 0)
+
+    off_grid = (x < 0) | (x >= width) | (y < 0) | (y >= height)
+    site_value = np.zeros(len(placement), dtype=np.int64)
+    site_value[~off_grid] = site_grid.grid[y[~off_grid], x[~off_grid]]
+    off_site = off_grid | (site_value == site_grid.EMPTY)
+
+    # BELs each row fills, and the first BEL of its aligned group
+    weights = SHARED_BEL_WEIGHTS if weights is None else weights
+    cell_weight = np.array([weights.get(name, 1) for name in design.cell_names] + [1], dtype=np.int64)
+    width_bels = cell_weight[cell]
+    first_bel = bel - bel % width_bels
+
+    checkable = ~off_site & (resource >= 0)
+    site_capacity = np.zeros(len(placement), dtype=np.int64)
+    site_capacity[checkable] = capacity[site_value[checkable], resource[checkable]]
+    wrong_site_type = checkable & (site_capacity == 0)
+    bel_out_of_range = checkable & ~wrong_site_type & ((bel < 0) | (first_bel + width_bels > site_capacity))
+
+    # Encoded slot keys of every BEL filled by an instance that landed on real BELs
+    slotted = np.flatnonzero(checkable & ~wrong_site_type & ~bel_out_of_range)
+    repeats = width_bels[slotted]
+    rows = np.repeat(slotted, repeats)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    keys = ((x[rows] * height + y[rows]) * slots_per_site + bases[site_value[rows], resource[rows]] +
+            first_bel[rows] + within)
+    _, slot_of_key, slot_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    overlapping = np.zeros(len(placement), dtype=bool)
+    overlapping[rows[slot_counts[slot_of_key.ravel()] > 1]] = True
+
+    result = {
+        'instances': len(placement),
+        'not_in_nodes': not_in_nodes,
+        'unknown_resource': unknown_resource,
+        'off_site': off_site,
+        'wrong_site_type': wrong_site_type,
+        'bel_out_of_range': bel_out_of_range,
+        'overlapping': overlapping,
+        'overlapping_slots': int((slot_counts > 1).sum()),
+        'unplaced_instances': int(design.num_instances - np.unique(inst[inst >= 0]).size),
+        'fixed_moved': np.zeros(0, dtype=np.int64),
+        'fixed_missing': np.zeros(0, dtype=np.int64)
+    }
+
+    if reference is not None:
+        # Location of every design instance in the new placement (-1 = not placed)
+        ref_inst = reference.resolve(design.instance_names)
+        where = np.full(design.num_instances + 1, -1, dtype=np.int64)
+        known = inst >= 0
+        where[inst[known]] = np.flatnonzero(known)
+        ref_rows = np.flatnonzero(reference.fixed & (ref_inst >= 0))
+        row = where[ref_inst[ref_rows]]
+        missing = row < 0
+        moved = ~missing & ((x[row] != reference.x[ref_rows]) | (y[row] != reference.y[ref_rows]) |
+                            (bel[row] != reference.bel[ref_rows]))
+        result['fixed_missing'] = ref_rows[missing]
+        result['fixed_moved'] = ref_rows[moved]
+        result['fixed_checked'] = len(ref_rows)
+
+    masks = ('off_site', 'wrong_site_type', 'bel_out_of_range', 'overlapping')
+    result['illegal'] = np.logical_or.reduce([result[name] for name in masks])
+    result['legal'] = not (result['illegal'].any() or len(result['fixed_moved']) or len(result['fixed_missing']))
+    return result
+
+
+DISPLACEMENT_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+def diff_placements(design, before, after, reference=None):
+    """What moved between two placements of the same design.
+
+    Both placements are aligned on design instance ids (rows of instances
+    missing from .nodes are ignored). Displacement is the Manhattan distance
+    |dx| + |dy| in sites; a cell also counts as moved when only its BEL
+    changed. FIXED instances (in before, or in the reference .pl when given)
+    that moved or disappeared in after are violations.
+
+    Returns a dict of per-instance arrays (before/after x, y, bel as float
+    with NaN for missing, 'displacement', 'moved') and summary counts.
+    """
+    n = design.num_instances
+    columns = {}
+    for label, placement in (('before', before), ('after', after)):
+        inst = placement.resolve(design.instance_names)
+        known = inst >= 0
+        for name in ('x', 'y', 'bel'):
+            values = np.full(n, np.nan)
+            values[inst[known]] = getattr(placement, name)[known]
+            columns[f"{label}_{name}"] = values
+        fixed = np.zeros(n, dtype=bool)
+        fixed[inst[known]] = placement.fixed[known]
+        columns[f"{label}_fixed"] = fixed
+
+    in_before, in_after = ~np.isnan(columns['before_x']), ~np.isnan(columns['after_x'])
+    both = in_before & in_after
+    displacement = np.full(n, np.nan)
+    displacement[both] = (np.abs(columns['after_x'][both] - columns['before_x'][both]) +
+                          np.abs(columns['after_y'][both] - columns['before_y'][both]))
+    moved = both & ((displacement > 0) | (columns['after_bel'] != columns['before_bel']))
+
+    fixed = columns['before_fixed'].copy()
+    if reference is not None:
+        ref_inst = reference.resolve(design.instance_names)
+        fixed[ref_inst[(ref_inst >= 0) & reference.fixed]] = True
+    fixed_moved = np.flatnonzero(fixed & moved)
+    fixed_missing = np.flatnonzero(fixed & ~in_after)
+
+    return dict(columns, **{
+        'displacement': displacement,
+        'moved': moved,
+        'in_both': int(both.sum()),
+        'only_before': int((in_before & ~in_after).sum()),
+        'only_after': int((in_after & ~in_before).sum()),
+        'moved_count': int(moved.sum()),
+        'total_displacement': float(displacement[both].sum()),
+        'fixed_checked': int(fixed.sum()),
+        'fixed_moved': fixed_moved,
+        'fixed_missing': fixed_missing,
+    })
+
+
+def displacement_by_cell_type(design, result):
+    """{cell type: (instances in both, moved, mean displacement, max displacement)} via bincount."""
+    both = ~np.isnan(result['displacement'])
+    cells = design.inst_cell[both]
+    displacement = result['displacement'][both]
+    num_cells = len(design.cell_names)
+    count = np.bincount(cells, minlength=num_cells)
+    moved = np.bincount(cells, weights=result['moved'][both], minlength=num_cells)
+    total = np.bincount(cells, weights=displacement, minlength=num_cells)
+    peak = np.zeros(num_cells)
+    np.maximum.at(peak, cells, displacement)
+    return {design.cell_names[c]: (int(count[c]), int(moved[c]), total[c] / count[c], float(peak[c]))
+            for c in np.flatnonzero(count).tolist()}
+
+
+def displacement_map(result, width, height):
+    """(height, width) mean displacement of the instances at each site of the after placement."""
+    if width <= 0 or height <= 0:
+        return np.zeros((max(height, 0), max(width, 0)))
+    both = ~np.isnan(result['displacement'])
+    x, y = result['after_x'][both].astype(np.int64), result['after_y'][both].astype(np.int64)
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    keys = y[inside] * width + x[inside]
+    total = np.bincount(keys, weights=result['displacement'][both][inside], minlength=width * height)
+    count = np.bincount(keys, minlength=width * height)
+    return (total / np.maximum(count, 1)).reshape(height, width)
+
+
+def format_placement_diff_report(design, result, examples=5):
+    """Text lines for a diff_placements() result."""
+    lines = []
+    lines.append("PLACEMENT DIFF:")
+    lines.append("-" * 30)
+    lines.append(f"Instances in both: {result['in_both']:,}")
+    if result['only_before'] or result['only_after']:
+        lines.append(f"Only in before: {result['only_before']:,}, only in after: {result['only_after']:,}")
+    moved_percent = result['moved_count'] / result['in_both'] * 100 if result['in_both'] else 0.0
+    lines.append(f"Moved: {result['moved_count']:,} ({moved_percent:.2f}%)")
+    moved = result['displacement'][result['moved']]
+    if len(moved):
+        lines.append(f"Displacement of moved cells: total {moved.sum():.0f}, mean {moved.mean():.2f}, "
+                     f"max {moved.max():.0f} sites")
+
+        lines.append("")
+        lines.append("Displacement Histogram (sites, moved cells):")
+        edges = DISPLACEMENT_BUCKETS + [np.inf]
+        counts = np.histogram(moved, bins=edges)[0]
+        peak = max(int(counts.max()), 1)
+        for lo, hi, count in zip(edges[:-1], edges[1:], counts.tolist()):
+            label = f"{lo}" if hi == lo + 1 else (f"{lo}-{hi - 1:.0f}" if np.isfinite(hi) else f"{lo}+")
+            lines.append(f"  {label:>9}: {count:>9,} {'#' * int(round(40 * count / peak))}")
+
+    lines.append("")
+    lines.append("Displacement by Cell Type:")
+    lines.append(f"  {'cell':<12} {'instances':>10} {'moved':>10} {'mean':>8} {'max':>8}")
+    for cell, (count, moved_count, mean, peak) in displacement_by_cell_type(design, result).items():
+        lines.append(f"  {cell:<12} {count:>10,} {moved_count:>10,} {mean:>8.2f} {peak:>8.0f}")
+
+    lines.append("")
+    violations = len(result['fixed_moved']) + len(result['fixed_missing'])
+    lines.append(f"FIXED Violations: {violations} (of {result['fixed_checked']} fixed instances)")
+    for inst in result['fixed_moved'][:examples].tolist():
+        lines.append(f"  {design.instance_names[inst]} moved: "
+                     f"({result['before_x'][inst]:.0f}, {result['before_y'][inst]:.0f}, {result['before_bel'][inst]:.0f}) -> "
+                     f"({result['after_x'][inst]:.0f}, {result['after_y'][inst]:.0f}, {result['after_bel'][inst]:.0f})")
+    for inst in result['fixed_missing'][:examples].tolist():
+        lines.append(f"  {design.instance_names[inst]} missing from the after placement")
+    return lines
+
+
+class RegionResources:
+    """O(1) resource supply / placed demand of any rectangle of the site grid.
+
+    Built once from per-resource summed-area tables (2D prefix sums with a
+    leading zero row and column): supply counts the BELs the SITE definitions
+    provide on each site, demand counts the BELs filled by the placed
+    instances whose cell maps to the resource through RESOURCES (a cell in
+    weights, default SHARED_BEL_WEIGHTS, fills w BELs, as in the utilization
+    slot count). A box sum is then four lookups per resource, whatever its
+    size.
+
+        regions = RegionResources(site_grid, sites, resources, design, placement)
+        regions.query(0, 0, 8, 60)      # {'DSP48E2': (supply, demand), ...}
+
+    Boxes are half-open, [x0, x1) x [y0, y1), and clipped to the grid.
+    """
+
+    def __init__(self, site_grid, sites, resources, design=None, placement=None, weights=None):
+        self.width, self.height = site_grid.width, site_grid.height
+        self.resource_names, capacity = site_grid.resource_matrix(sites)
+        num_resources = len(self.resource_names)
+
+        # (resource, height, width) maps, gathered straight from the type grid
+        supply = np.moveaxis(capacity[site_grid.grid], -1, 0)
+        demand = np.zeros_like(supply)
+        self.unmapped = 0
+        if design is not None and placement is not None and len(placement):
+            inst = placement.resolve(design.instance_names)
+            x, y = placement.x.astype(np.int64), placement.y.astype(np.int64)
+            cell = np.where(inst >= 0, design.inst_cell[np.maximum(inst, 0)], -1)
+            cell_resource = np.append(cell_resource_ids(design, self.resource_names, resources), -1)
+            weights = SHARED_BEL_WEIGHTS if weights is None else weights
+            cell_weight = np.array([weights.get(name, 1) for name in design.cell_names] + [1], dtype=np.int64)
+            resource = cell_resource[cell]
+            counted = (resource >= 0) & (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+            self.unmapped = int((~counted).sum())
+            keys = (resource[counted] * self.height + y[counted]) * self.width + x[counted]
+            demand = np.bincount(keys, weights=cell_weight[cell][counted],
+                                 minlength=num_resources * self.height * self.width)
+            demand = demand.astype(np.int64).reshape(supply.shape)
+
+        self.supply_sums = self._summed_area(supply)
+        self.demand_sums = self._summed_area(demand)
+
+    @staticmethod
+    def _summed_area(maps):
+        sums = np.zeros((maps.shape[0], maps.shape[1] + 1, maps.shape[2] + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(maps, axis=1), axis=2, out=sums[:, 1:, 1:])
+        return sums
+
+    def _box(self, sums, x0, y0, x1, y1):
+        """Per-resource sums of boxes; the corners may be scalars or equal-shaped arrays."""
+        x0, x1 = np.clip(x0, 0, self.width), np.clip(x1, 0, self.width)
+        y0, y1 = np.clip(y0, 0, self.height), np.clip(y1, 0, self.height)
+        x1, y1 = np.maximum(x1, x0), np.maximum(y1, y0)
+        return sums[:, y1, x1] - sums[:, y0, x1] - sums[:, y1, x0] + sums[:, y0, x0]
+
+    def supply(self, x0, y0, x1, y1):
+        """{resource: BELs provided} inside the box."""
+        return dict(zip(self.resource_names, self._box(self.supply_sums, x0, y0, x1, y1).tolist()))
+
+    def demand(self, x0, y0, x1, y1):
+        """{resource: BELs filled by placed instances} inside the box."""
+        return dict(zip(self.resource_names, self._box(self.demand_sums, x0, y0, x1, y1).tolist()))
+
+    def query(self, x0, y0, x1, y1):
+        """{resource: (supply, demand)} inside the box."""
+        supply = self._box(self.supply_sums, x0, y0, x1, y1).tolist()
+        demand = self._box(self.demand_sums, x0, y0, x1, y1).tolist()
+        return {name: (s, d) for name, s, d in zip(self.resource_names, supply, demand)}
+
+    def bins(self, bin_width, bin_height):
+        """(supply, demand) arrays of shape (resource, rows, cols) over a regular grid of bins.
+
+        Every bin's totals come from the same four-corner lookups, done for
+        all bins at once; the last row / column of bins may be cut short.
+        """
+        x0 = np.arange(0, self.width, bin_width)
+        y0 = np.arange(0, self.height, bin_height)
+        x0, y0 = np.meshgrid(x0, y0)
+        corners = (x0, y0, x0 + bin_width, y0 + bin_height)
+        return self._box(self.supply_sums, *corners), self._box(self.demand_sums, *corners)
+
+
+def format_density_report(regions, bin_width, bin_height, threshold=1.0, examples=10, demand_note=None):
+    """Text lines for the bin utilization of a RegionResources, flagging bins above threshold.
+
+    A bin is over-utilized when its demand for some resource exceeds
+    threshold times its supply (demand without any supply always counts).
+    demand_note is printed under the header to say where demand comes from.
+    """
+    supply, demand = regions.bins(bin_width, bin_height)
+    rows, cols = supply.shape[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = np.where(supply > 0, demand / np.maximum(supply, 1), np.where(demand > 0, np.inf, 0.0))
+    over = utilization > threshold
+
+    lines = []
+    lines.append(f"REGION DENSITY ({bin_width}x{bin_height} site bins, {cols}x{rows} bins):")
+    lines.append("-" * 30)
+    if demand_note:
+        lines.append(demand_note)
+    lines.append(f"Over-utilization threshold: {threshold * 100:.0f}%")
+    if regions.unmapped:
+        lines.append(f"Placed instances not counted (no resource or off grid): {regions.unmapped}")
+    lines.append("Per Resource:")
+    for r, name in enumerate(regions.resource_names):
+        with_supply = supply[r] > 0
+        peak = utilization[r].max() if utilization[r].size else 0.0
+        peak_text = "inf" if np.isinf(peak) else f"{peak * 100:.1f}%"
+        lines.append(f"  {name}: {int(demand[r].sum()):,} / {int(supply[r].sum()):,} placed in "
+                     f"{int(with_supply.sum())} bins with supply, peak {peak_text}, over: {int(over[r].sum())} bins")
+
+    flagged = np.flatnonzero(over.any(axis=0).ravel())
+    lines.append(f"Over-utilized Bins: {len(flagged)}")
+    if len(flagged):
+        worst = flagged[np.argsort(-utilization.reshape(len(regions.resource_names), -1)[:, flagged].max(axis=0), kind='stable')]
+        for index in worst[:examples].tolist():
+            row, col = divmod(index, cols)
+            parts = [f"{name} {int(demand[r, row, col])}/{int(supply[r, row, col])}"
+                     for r, name in enumerate(regions.resource_names) if over[r, row, col]]
+            lines.append(f"  bin ({col * bin_width}, {row * bin_height}): {', '.join(parts)}")
+        if len(flagged) > examples:
+            lines.append(f"  ... and {len(flagged) - examples} more")
+    return lines
+
+
+def format_legality_report(design, placement, result, reference=None, examples=5):
+    """Text lines summarising a check_legality() result, with a few example rows per problem."""
+    lines = []
+    lines.append("PLACEMENT LEGALITY:")
+    lines.append("-" * 30)
+    lines.append(f"Result: {'LEGAL' if result['legal'] else 'ILLEGAL'}")
+    lines.append(f"Placed Instances: {result['instances']}")
+    lines.append(f"Illegal Instances: {int(result['illegal'].sum())}")
+
+    def describe(row):
+        return f"{placement.names[row]} at ({placement.x[row]}, {placement.y[row]}, {placement.bel[row]})"
+
+    checks = [
+        ('off_site', "Not on a site"),
+        ('wrong_site_type', "Site type lacks the cell's resource"),
+        ('bel_out_of_range', "BEL index beyond the site's capacity"),
+        ('overlapping', "Sharing a site + BEL"),
+        ('not_in_nodes', "Not in .nodes (not checked)"),
+        ('unknown_resource', "Cell type not in RESOURCES (not checked)")
+    ]
+    for name, label in checks:
+        rows = np.flatnonzero(result[name])
+        if not len(rows):
+            continue
+        extra = f" in {result['overlapping_slots']} slots" if name == 'overlapping' else ""
+        lines.append(f"  {label}: {len(rows)}{extra}")
+        for row in rows[:examples].tolist():
+            lines.append(f"    {describe(row)}")
+
+    if result['unplaced_instances']:
+        lines.append(f"  Instances missing from the placement: {result['unplaced_instances']}")
+
+    if 'fixed_checked' in result:
+        lines.append(f"Fixed Instances Checked: {result['fixed_checked']}")
+        for name, label in (('fixed_moved', "Moved from their FIXED location"), ('fixed_missing', "Missing from the placement")):
+            rows = result[name]
+            if not len(rows):
+                continue
+            lines.append(f"  {label}: {len(rows)}")
+            for row in rows[:examples].tolist():
+                lines.append(f"    {reference.names[row]} fixed at ({reference.x[row]}, {reference.y[row]}, {reference.bel[row]})")
+    return lines
+
+
+def format_hpwl_report(design, result, top=10):
+    """Text lines summarising an evaluate_hpwl() result."""
+    lines = []
+    lines.append("WIRELENGTH (HPWL):")
+    lines.append("-" * 30)
+    lines.append(f"Total HPWL: {result['total_hpwl']:.0f} (x: {result['total_hpwl_x']:.0f}, y: {result['total_hpwl_y']:.0f})")
+    if not np.all(result['net_weights'] == 1.0):
+        lines.append(f"Weighted HPWL: {result['weighted_hpwl']:.2f}")
+    lines.append(f"Nets: {result['nets']} ({result['pins']} pins)")
+    lines.append(f"Nets with placed pins: {result['placed_nets']}")
+    if result['partially_placed_nets']:
+        lines.append(f"Nets with some unplaced pins: {result['partially_placed_nets']}")
+    if result['unplaced_nets']:
+        lines.append(f"Nets without any placed pin: {result['unplaced_nets']}")
+    if result['unplaced_instances']:
+        lines.append(f"Instances missing from the placement: {result['unplaced_instances']}")
+    if result['unknown_placed_instances']:
+        lines.append(f"Placed instances not in .nodes: {result['unknown_placed_instances']}")
+    if result['placed_nets']:
+        lines.append(f"Average HPWL per Net: {result['total_hpwl'] / result['placed_nets']:.2f}")
+
+    net_hpwl = result['net_hpwl']
+    if top and len(net_hpwl):
+        longest = np.argsort(-net_hpwl, kind='stable')[:top]
+        lines.append("")
+        lines.append(f"Longest Nets (top {len(longest)}):")
+        degrees = np.diff(design.net_offsets)
+        for net in longest.tolist():
+            lines.append(f"  {design.net_names[net]}: {net_hpwl[net]:.0f} ({degrees[net]} pins)")
+    return lines
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Phase Profiler
+RDJordan 2025 / CFOGE
+
+Per-phase cost of a run, switched on with --profile in the analyzer and the
+two visualizers. Code marks its phases with
+
+    with phase('parse_nets_file', nets_file_path):
+        ...
+
+and every phase records:
+
+    wall_s          elapsed time
+    cpu_s           CPU time, including worker processes that ended in the phase
+    peak_rss_mb     peak resident set size of the process (and its workers) so far
+    lines, bytes    input processed, counted from the file passed to phase()
+                    (after the clock stops) or set on the yielded record
+
+Phases nest; the table shows them indented under their parent. The results
+are printed as a table and written as JSON. Optionally every phase also gets
+a cProfile dump (<name>.prof, for pstats / snakeviz; a nested phase's time
+is left out of its parent's dump) and a tracemalloc peak plus the top
+allocation sites still alive at its end (<name>.tracemalloc.txt).
+
+When profiling is off (the default) phase() does nothing but yield, and it is
+a no-op in worker processes, whose costs show up in the parent's phase.
+"""
+
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACEMALLOC_TOP = 15
+LINE_COUNT_CHUNK = 1 << 20
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def cpu_seconds():
+    """User + system CPU time of this process and its waited-for children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def count_lines(file_path, start=0, end=None):
+    """Newlines in a file (or its [start, end) byte range), read in chunks."""
+    lines = 0
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = f.read(LINE_COUNT_CHUNK if remaining is None else min(LINE_COUNT_CHUNK, remaining))
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            if remaining is not None:
+                remaining -= len(chunk)
+    return lines
+
+
+class Profiler:
+    """Collects phase records for one run (see the module docstring)."""
+
+    def __init__(self, script, dump_dir=None, use_cprofile=False, use_tracemalloc=False):
+        self.script = script
+        self.dump_dir = Path(dump_dir) if dump_dir else None
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.pid = os.getpid()
+        self.records = []
+        self.stack = []
+        self.start_wall = time.perf_counter()
+        self.start_cpu = cpu_seconds()
+        if self.dump_dir and (use_cprofile or use_tracemalloc):
+            self.dump_dir.mkdir(parents=True, exist_ok=True)
+        if use_tracemalloc:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name, file_path=None, start=0, end=None):
+        record = {'phase': name, 'depth': len(self.stack), 'lines': None, 'bytes': None}
+        self.records.append(record)
+        parent = self.stack[-1] if self.stack else None
+        frame = {'record': record, 'traced_peak': 0, 'profile': None}
+        if self.use_tracemalloc:
+            if parent:
+                parent['traced_peak'] = max(parent['traced_peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.use_cprofile:
+            if parent and parent['profile']:
+                parent['profile'].disable()
+            frame['profile'] = cProfile.Profile()
+            frame['profile'].enable()
+        self.stack.append(frame)
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = cpu_seconds() - cpu
+            record['peak_rss_mb'] = max(peak_rss_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN))
+            self.stack.pop()
+            if frame['profile']:
+                frame['profile'].disable()
+                record['cprofile'] = self.dump_path(record, '.prof')
+                frame['profile'].dump_stats(record['cprofile'])
+                if parent and parent['profile']:
+                    parent['profile'].enable()
+            if self.use_tracemalloc:
+                traced_peak = max(frame['traced_peak'], tracemalloc.get_traced_memory()[1])
+                record['traced_peak_mb'] = traced_peak / (1024 * 1024)
+                if parent:
+                    parent['traced_peak'] = max(parent['traced_peak'], traced_peak)
+                record['tracemalloc'] = self.dump_path(record, '.tracemalloc.txt')
+                self.dump_allocations(record['tracemalloc'], name)
+            if file_path is not None and record['bytes'] is None:
+                self.count_input(record, file_path, start, end)
+
+    def count_input(self, record, file_path, start=0, end=None):
+        """Set the bytes / lines of a phase from its input file (or list of files)."""
+        if isinstance(file_path, (str, os.PathLike)):
+            paths, ranges = [Path(file_path)], [(start, end)]
+        else:
+            paths = [Path(path) for path in file_path]
+            ranges = [(0, None)] * len(paths)
+        record['bytes'] = record['lines'] = 0
+        for path, (first, last) in zip(paths, ranges):
+            if path.exists():
+                record['bytes'] += (path.stat().st_size if last is None else last) - first
+                record['lines'] += count_lines(path, first, last)
+
+    def dump_path(self, record, suffix):
+        index = self.records.index(record)
+        return str((self.dump_dir or Path('.')) / f"{index:03d}_{record['phase']}{suffix}")
+
+    def dump_allocations(self, path, name):
+        """Write the top allocation sites (by size) alive at the end of a phase."""
+        stats = tracemalloc.take_snapshot().statistics('lineno')
+        with open(path, 'w') as f:
+            f.write(f"Top {TRACEMALLOC_TOP} allocation sites alive at the end of {name}:\n")
+            for stat in stats[:TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+
+    def results(self):
+        """JSON-ready dict of the run and its phases."""
+        phases = []
+        for record in self.records:
+            entry = dict(record)
+            if entry['wall_s'] > 0:
+                if entry['lines'] is not None:
+                    entry['lines_per_s'] = entry['lines'] / entry['wall_s']
+                if entry['bytes'] is not None:
+                    entry['mb_per_s'] = entry['bytes'] / 1e6 / entry['wall_s']
+            phases.append(entry)
+        return {
+            'script': self.script,
+            'argv': sys.argv[1:],
+            'wall_s': time.perf_counter() - self.start_wall,
+            'cpu_s': cpu_seconds() - self.start_cpu,
+            'peak_rss_mb': max(peak_rss_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN)),
+            'phases': phases,
+        }
+
+    def format_table(self, results=None):
+        """Text lines of the phase table."""
+        results = results or self.results()
+        traced = self.use_tracemalloc
+        lines = ["PROFILE:", "-" * 30]
+        header = f"  {'phase':<38} {'wall s':>8} {'cpu s':>8} {'rss MB':>8}"
+        header += f" {'traced MB':>9}" if traced else ""
+        lines.append(header + f" {'lines':>11} {'MB':>8} {'lines/s':>11}")
+        for entry in results['phases']:
+            row = f"  {'  ' * entry['depth'] + entry['phase']:<38} {entry['wall_s']:8.3f} {entry['cpu_s']:8.3f} " \
+                  f"{entry['peak_rss_mb']:8.1f}"
+            row += f" {entry['traced_peak_mb']:9.1f}" if traced else ""
+            if entry['lines'] is not None:
+                row += f" {entry['lines']:11,} {(entry['bytes'] or 0) / 1e6:8.2f} {entry.get('lines_per_s', 0):11,.0f}"
+            lines.append(row)
+        lines.append(f"  {'total':<38} {results['wall_s']:8.3f} {results['cpu_s']:8.3f} {results['peak_rss_mb']:8.1f}")
+        return lines
+
+    def finish(self, json_path):
+        """Print the phase table and write the JSON results; returns the results."""
+        if self.use_tracemalloc:
+            tracemalloc.stop()
+        results = self.results()
+        print('\n'.join(self.format_table(results)))
+        json_path = Path(json_path)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Profile saved to: {json_path}")
+        return results
+
+
+_active = None
+
+
+@contextmanager
+def phase(name, file_path=None, start=0, end=None):
+    """Record a phase with the active profiler; does nothing when profiling is off.
+
+    file_path (with an optional [start, end) byte range) or a list of files
+    gives the bytes and lines the phase processed; otherwise the caller may
+    set 'lines' / 'bytes' on the yielded record.
+    """
+    profiler = _active
+    if profiler is None or profiler.pid != os.getpid():
+        yield {}
+        return
+    with profiler.phase(name, file_path, start, end) as record:
+        yield record
+
+
+def add_profile_arguments(parser):
+    """Add --profile, --profile-json, --profile-cprofile and --profile-tracemalloc to a script's parser."""
+    parser.add_argument('--profile', action='store_true',
+                        help='Print wall/CPU time, peak RSS and lines/bytes per phase and save them as JSON')
+    parser.add_argument('--profile-json', default='profile.json', metavar='PATH',
+                        help='With --profile, where to save the JSON results (default: profile.json)')
+    parser.add_argument('--profile-cprofile', action='store_true', help='With --profile, save a cProfile dump of every phase beside the JSON')
+    parser.add_argument('--profile-tracemalloc', action='store_true', help='With --profile, track Python allocations per phase and save the top allocation sites beside the JSON (slower)')
+
+
+def start_profiling(args, script):
+    """Turn profiling on if the script was run with --profile; returns the Profiler or None."""
+    global _active
+    if not args.profile:
+        return None
+    json_path = Path(args.profile_json)
+    _active = Profiler(script, json_path.parent / f"{json_path.stem}_dumps",
+                       args.profile_cprofile, args.profile_tracemalloc)
+    return _active
+
+
+def finish_profiling(args):
+    """Print and save the profile of a run started with start_profiling()."""
+    global _active
+    if _active is None:
+        return None
+    profiler, _active = _active, None
+    return profiler.finish(args.profile_json)
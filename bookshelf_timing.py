@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Static Timing Estimator
+RDJordan 2025 / CFOGE
+
+A simple static timing analysis over a parsed design and a placement, using
+the delay tables in benchmarks/timing/ultrascale:
+
+    logic_delays.txt   <cell> <delay>     delay through (or clock-to-out of) a cell
+    net_delays_x.txt   <dx> <delay>       net delay for a horizontal site distance
+    net_delays_y.txt   <dy> <delay>       net delay for a vertical site distance
+
+The timing graph has one node per instance and one edge per driver -> sink
+pin connection, with pin directions taken from the .lib (the OUTPUT pin of a
+net drives its other pins). Edges into clock pins (see is_clock_pin) are
+dropped and every cell with a clock pin or a sequential type name (FF, RAM,
+DSP, see SEQUENTIAL_CELL_PREFIXES) is sequential: it starts paths at its
+output and ends them at its inputs, which cuts the graph into combinational
+pieces.
+Those are levelized topologically and arrival / required times are
+propagated one level at a time with NumPy max / min reductions over the edge
+arrays, never per instance.
+
+A net delay is net_x[|dx|] + net_y[|dy|] between the driver and sink sites,
+where an axis the net doesn't cross adds nothing: both tables have a base
+entry at distance 0, and adding the two of them would charge a connection
+inside one site like a diagonal hop. Instances without a location count as
+distance 0. Delays are in the units of the tables (ps for the shipped
+UltraScale set).
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bookshelf_model import is_clock_pin
+from bookshelf_placement import instance_locations
+
+DEFAULT_DELAY_DIR = Path(__file__).resolve().parent / 'benchmarks' / 'timing' / 'ultrascale'
+# Cell types that are sequential even if their .lib clock pin can't be recognized
+SEQUENTIAL_CELL_PREFIXES = ('FD', 'LD', 'SRL', 'RAM', 'FIFO', 'DSP')
+
+
+def read_delay_table(file_path):
+    """Two-column 'key value' delay file as a {key: float} dict (comments and blank lines skipped)."""
+    table = {}
+    with open(file_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and not parts[0].startswith('#'):
+                table[parts[0]] = float(parts[1])
+    return table
+
+
+def load_delay_tables(delay_dir=None):
+    """Read the logic and distance-indexed net delay tables from delay_dir.
+
+    Returns (logic_delays {cell: delay}, net_x array, net_y array) where
+    net_x[d] is the delay of a net spanning d sites horizontally.
+    """
+    delay_dir = Path(delay_dir or DEFAULT_DELAY_DIR)
+    logic_delays = read_delay_table(delay_dir / 'logic_delays.txt')
+    net_tables = []
+    for name in ('net_delays_x.txt', 'net_delays_y.txt'):
+        table = read_delay_table(delay_dir / name)
+        distances = np.array([int(d) for d in table], dtype=np.int64)
+        values = np.zeros(distances.max() + 1 if len(distances) else 1)
+        values[distances] = list(table.values())
+        net_tables.append(values)
+    return logic_delays, net_tables[0], net_tables[1]
+
+
+def csr_rows(offsets, rows):
+    """Flat indices of the CSR entries of the given rows, row by row."""
+    lengths = offsets[rows + 1] - offsets[rows]
+    starts = np.repeat(offsets[rows] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return starts + np.arange(lengths.sum())
+
+
+class TimingGraph:
+    """Instance level timing graph with levelized arrival / required time propagation."""
+
+    def __init__(self, design, cells, placement, logic_delays, net_x, net_y):
+        self.design = design
+        self.timings = {}
+        began = time.perf_counter()
+
+        n = design.num_instances
+        # Pin directions come from the .lib, resolved once after parsing
+        if len(design.pin_dir) != design.num_pins:
+            design.resolve_pin_directions(cells)
+        is_output, is_clock = design.pin_dir == design.PIN_OUTPUT, design.pin_clock
+        self.unknown_pins = int((design.pin_dir == design.PIN_UNKNOWN).sum())
+        pin_net = design.pin_nets()
+
+        # Cells with a clock pin or a sequential type start and end paths
+        clocked_cells = np.zeros(len(design.cell_names) + 1, dtype=bool)
+        for cell_id, cell_name in enumerate(design.cell_names):
+            clocked_cells[cell_id] = (cell_name.upper().startswith(SEQUENTIAL_CELL_PREFIXES) or
+                                      any(is_clock_pin(pin) for pin in cells.get(cell_name, {}).get('pins', [])))
+        self.sequential = clocked_cells[design.inst_cell] if n else np.zeros(0, dtype=bool)
+        self.logic_delay = np.array([logic_delays.get(name, 0.0) for name in design.cell_names] + [0.0])[design.inst_cell]
+
+        # Driver of every net: its first OUTPUT pin (only pins of known instances have a direction)
+        driver = design.net_drivers()
+        self.undriven_nets = int((driver < 0).sum())
+
+        # One edge per sink pin; clock pins are not part of the data paths
+        sink = np.flatnonzero(~is_output & ~is_clock & (design.pin_inst >= 0) & (driver[pin_net] >= 0))
+        self.edge_pin = sink
+        self.edge_net = pin_net[sink]
+        self.edge_src = design.pin_inst[driver[self.edge_net]].astype(np.int64)
+        self.edge_dst = design.pin_inst[sink].astype(np.int64)
+
+        # Distance-indexed net delay between driver and sink sites
+        inst_x, inst_y = instance_locations(design, placement)
+        self.inst_x, self.inst_y = inst_x[:n], inst_y[:n]
+        self.unplaced = int(np.isnan(self.inst_x).sum())
+        x, y = np.nan_to_num(self.inst_x), np.nan_to_num(self.inst_y)
+        dx = np.minimum(np.abs(x[self.edge_src] - x[self.edge_dst]).astype(np.int64), len(net_x) - 1)
+        dy = np.minimum(np.abs(y[self.edge_src] - y[self.edge_dst]).astype(np.int64), len(net_y) - 1)
+        self.edge_delay = np.where(dx > 0, net_x[dx], 0.0) + np.where(dy > 0, net_y[dy], 0.0)
+
+        # Edges into sequential cells end paths, the rest form the combinational graph
+        self.endpoint_edge = self.sequential[self.edge_dst]
+        self.timings['build graph'] = time.perf_counter() - began
+
+        began = time.perf_counter()
+        self.levelize()
+        self.timings['levelize'] = time.perf_counter() - began
+
+    def levelize(self):
+        """Topological level of every instance over the combinational edges (Kahn, one level per step).
+
+        Instances on combinational loops are put one level past the end and
+        the edges out of them are dropped (counted in broken_edges, and
+        False in timed_edge so they get no slack either).
+        """
+        n = self.design.num_instances
+        comb = np.flatnonzero(~self.endpoint_edge)
+        src, dst = self.edge_src[comb], self.edge_dst[comb]
+
+        by_src = np.argsort(src, kind='stable')
+        succ_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=succ_offsets[1:])
+        succ_dst = dst[by_src]
+
+        indegree = np.bincount(dst, minlength=n)
+        level = np.full(n, -1, dtype=np.int64)
+        frontier = np.flatnonzero(indegree == 0)
+        current = 0
+        while len(frontier):
+            level[frontier] = current
+            targets = succ_dst[csr_rows(succ_offsets, frontier)]
+            indegree -= np.bincount(targets, minlength=n)
+            targets = np.unique(targets)
+            frontier = targets[(indegree[targets] == 0) & (level[targets] < 0)]
+            current += 1
+
+        looped = level < 0
+        self.loop_instances = int(looped.sum())
+        level[looped] = current
+        keep = ~looped[src]
+        self.broken_edges = int((~keep).sum())
+        self.timed_edge = np.ones(len(self.edge_src), dtype=bool)
+        self.timed_edge[comb[~keep]] = False
+        self.level = level
+        self.num_levels = current + (1 if self.loop_instances else 0)
+
+        # Combinational edges grouped by the level of their sink, then by sink
+        comb = comb[keep]
+        order = np.lexsort((self.edge_dst[comb], level[self.edge_dst[comb]]))
+        self.comb_edges = comb[order]
+        sink_level = level[self.edge_dst[self.comb_edges]]
+        self.level_edge_offsets = np.searchsorted(sink_level, np.arange(self.num_levels + 1))
+
+    def propagate(self, clock_period=None):
+        """Forward arrival and backward required times; returns the clock period used.
+
+        Without a clock_period the critical path delay is used, so the worst
+        slack is 0.
+        """
+        began = time.perf_counter()
+        n = self.design.num_instances
+        arrival = self.logic_delay.copy()
+        for level in range(1, self.num_levels):
+            edges = self.comb_edges[self.level_edge_offsets[level]:self.level_edge_offsets[level + 1]]
+            if not len(edges):
+                continue
+            candidate = arrival[self.edge_src[edges]] + self.edge_delay[edges]
+            dst = self.edge_dst[edges]
+            starts = np.flatnonzero(np.r_[True, dst[1:] != dst[:-1]])
+            arrival[dst[starts]] = np.maximum.reduceat(candidate, starts) + self.logic_delay[dst[starts]]
+        self.arrival = arrival
+
+        # Path ends: sequential inputs, and outputs of instances that drive nothing
+        endpoint_edges = np.flatnonzero(self.endpoint_edge)
+        self.endpoint_arrival = arrival[self.edge_src[endpoint_edges]] + self.edge_delay[endpoint_edges]
+        has_fanout = np.zeros(n, dtype=bool)
+        has_fanout[self.edge_src] = True
+        self.sink_instances = np.flatnonzero(~has_fanout & ~self.sequential)
+        self.critical_delay = float(max(self.endpoint_arrival.max(initial=0.0), arrival[self.sink_instances].max(initial=0.0)))
+        self.timings['forward propagation'] = time.perf_counter() - began
+
+        began = time.perf_counter()
+        period = float(clock_period) if clock_period else self.critical_delay
+        required = np.full(n, np.inf)
+        required[self.sink_instances] = period
+        np.minimum.at(required, self.edge_src[endpoint_edges], period - self.edge_delay[endpoint_edges])
+        for level in range(self.num_levels - 1, 0, -1):
+            edges = self.comb_edges[self.level_edge_offsets[level]:self.level_edge_offsets[level + 1]]
+            if not len(edges):
+                continue
+            dst = self.edge_dst[edges]
+            np.minimum.at(required, self.edge_src[edges], required[dst] - self.logic_delay[dst] - self.edge_delay[edges])
+        self.required = required
+
+        # Slack of every edge (NaN for broken loop edges), and of every net as its worst timed edge
+        edge_required = np.where(self.endpoint_edge, period, required[self.edge_dst] - self.logic_delay[self.edge_dst])
+        self.edge_slack = np.where(self.timed_edge, edge_required - (arrival[self.edge_src] + self.edge_delay), np.nan)
+        self.net_slack = np.full(self.design.num_nets, np.inf)
+        np.minimum.at(self.net_slack, self.edge_net[self.timed_edge], self.edge_slack[self.timed_edge])
+        timed = np.isfinite(self.net_slack)
+        self.net_criticality = np.zeros(self.design.num_nets)
+        if period > 0:
+            self.net_criticality[timed] = np.clip(1.0 - self.net_slack[timed] / period, 0.0, 1.0)
+        self.timed_nets = timed
+        self.period = period
+        self.timings['backward propagation'] = time.perf_counter() - began
+        return period
+
+    def critical_path(self):
+        """Worst path as a list of (instance, edge or None, arrival), from startpoint to endpoint.
+
+        edge is the timing edge entering the instance (None at the startpoint);
+        the last entry may be an endpoint edge into a sequential instance.
+        """
+        endpoint_edges = np.flatnonzero(self.endpoint_edge)
+        path = []
+        if len(endpoint_edges) and self.endpoint_arrival.max() >= self.arrival[self.sink_instances].max(initial=-np.inf):
+            worst = int(endpoint_edges[np.argmax(self.endpoint_arrival)])
+            path.append((int(self.edge_dst[worst]), worst, float(self.endpoint_arrival.max())))
+            node = int(self.edge_src[worst])
+        elif len(self.sink_instances):
+            node = int(self.sink_instances[np.argmax(self.arrival[self.sink_instances])])
+        else:
+            return path
+
+        # Walk back along the fanin edge that set each arrival time
+        dst_sorted = self.comb_edges[np.argsort(self.edge_dst[self.comb_edges], kind='stable')]
+        dst_keys = self.edge_dst[dst_sorted]
+        while True:
+            lo, hi = np.searchsorted(dst_keys, node), np.searchsorted(dst_keys, node, side='right')
+            if lo == hi:
+                path.append((node, None, float(self.arrival[node])))
+                break
+            fanin = dst_sorted[lo:hi]
+            edge = int(fanin[np.argmax(self.arrival[self.edge_src[fanin]] + self.edge_delay[fanin])])
+            path.append((node, edge, float(self.arrival[node])))
+            node = int(self.edge_src[edge])
+        return path[::-1]
+
+
+def analyze_timing(design, cells, placement, delay_dir=None, clock_period=None):
+    """Build, levelize and time a design; returns the TimingGraph with results and phase timings."""
+    began = time.perf_counter()
+    logic_delays, net_x, net_y = load_delay_tables(delay_dir)
+    load_time = time.perf_counter() - began
+
+    graph = TimingGraph(design, cells, placement, logic_delays, net_x, net_y)
+    graph.timings = {'load delay tables': load_time, **graph.timings}
+    graph.propagate(clock_period)
+    return graph
+
+
+def histogram_lines(values, bins, label_format):
+    """Text histogram rows '<range>: <count> <bar>' for the given bin edges."""
+    counts, edges = np.histogram(values, bins=bins)
+    peak = counts.max() if len(counts) and counts.max() else 1
+    lines = []
+    for count, lo, hi in zip(counts.tolist(), edges[:-1], edges[1:]):
+        lines.append(f"  {label_format.format(lo, hi)}: {count:>8} {'#' * int(round(40 * count / peak))}")
+    return lines
+
+
+def format_timing_report(design, graph, path_limit=40):
+    """Text lines for a TimingGraph: summary, critical path, slack/criticality histograms, runtimes."""
+    lines = []
+    lines.append("TIMING:")
+    lines.append("-" * 30)
+    lines.append(f"Clock Period: {graph.period:.1f}")
+    lines.append(f"Critical Path Delay: {graph.critical_delay:.1f}")
+    lines.append(f"Worst Slack: {graph.period - graph.critical_delay:.1f}")
+    lines.append(f"Timing Edges: {len(graph.edge_src)} ({int(graph.endpoint_edge.sum())} into sequential cells)")
+    lines.append(f"Sequential Instances: {int(graph.sequential.sum())}")
+    lines.append(f"Logic Levels: {graph.num_levels}")
+    if graph.loop_instances:
+        lines.append(f"Combinational Loop Instances: {graph.loop_instances} ({graph.broken_edges} edges broken)")
+    if graph.undriven_nets:
+        lines.append(f"Nets without a driver: {graph.undriven_nets}")
+    if graph.unknown_pins:
+        lines.append(f"Pins not found in .lib: {graph.unknown_pins}")
+    if graph.unplaced:
+        lines.append(f"Instances without a location (distance 0): {graph.unplaced}")
+    lines.append("")
+
+    path = graph.critical_path()
+    lines.append(f"Critical Path ({len(path)} instances):")
+    lines.append(f"  {'instance':<24} {'cell':<10} {'pin':<8} {'site':>11} {'incr':>9} {'arrival':>10}")
+    shown = path if len(path) <= path_limit else path[:path_limit // 2] + [None] + path[-path_limit // 2:]
+    previous = 0.0
+    for step in shown:
+        if step is None:
+            lines.append("  ...")
+            continue
+        node, edge, arrival = step
+        pin = design.pin_names[design.pin_libpin[graph.edge_pin[edge]]] if edge is not None else '-'
+        x, y = graph.inst_x[node], graph.inst_y[node]
+        site = f"({x:.0f},{y:.0f})" if not np.isnan(x) else "-"
+        lines.append(f"  {design.instance_names[node]:<24} {design.cell_names[design.inst_cell[node]]:<10} "
+                     f"{pin:<8} {site:>11} {arrival - previous:>9.1f} {arrival:>10.1f}")
+        previous = arrival
+    lines.append("")
+
+    slack = graph.net_slack[graph.timed_nets]
+    if len(slack):
+        lines.append(f"Net Slack Histogram ({len(slack)} timed nets):")
+        lines.extend(histogram_lines(slack, 10, "{:>9.1f} .. {:>9.1f}"))
+        lines.append("")
+        lines.append("Net Criticality Histogram:")
+        lines.extend(histogram_lines(graph.net_criticality[graph.timed_nets], np.linspace(0, 1, 11), "{:.1f} .. {:.1f}"))
+        lines.append("")
+
+    lines.append("Timing Phase Runtimes:")
+    for phase, seconds in graph.timings.items():
+        lines.append(f"  {phase:<22} {seconds:.3f}s")
+    return lines
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Tokenizer
+RDJordan 2025 / CFOGE
+
+Bulk tokenizer for Bookshelf text files. The file is memory-mapped as bytes
+and NumPy finds every line and whitespace separated field in one go, so a
+numeric column (.pl x/y/bel, SITEMAP x/y, .wts weights) is converted straight
+into a typed array without creating a Python object per line.
+
+    tokens = TokenizedFile('design.pl')
+    rows = tokens.rows(min_fields=5)
+    x, valid = tokens.as_int(tokens.field(rows, 1))
+
+Token and line positions are relative to the mapped range, line numbers count
+from 0.
+"""
+
+import os
+
+import numpy as np
+
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[[ord(c) for c in ' \t\r\n\v\f']] = True
+NEWLINE = ord('\n')
+COMMENT = ord('#')
+MINUS = ord('-')
+ZERO = ord('0')
+# Most digits as_int() accepts (any 18 digit number fits in an int64)
+MAX_INT_DIGITS = 18
+
+
+def map_file(file_path, start=0, end=None):
+    """Memory-map a file (or a byte range of it) read-only as a uint8 array."""
+    size = os.path.getsize(file_path)
+    end = size if end is None else min(end, size)
+    if end <= start:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(file_path, dtype=np.uint8, mode='r', offset=start, shape=(end - start,))
+
+
+class TokenizedFile:
+    """Line and token boundaries of a memory-mapped text file."""
+
+    def __init__(self, file_path, start=0, end=None):
+        self.buf = map_file(file_path, start, end)
+        index_dtype = np.int32 if len(self.buf) < 2 ** 31 else np.int64
+
+        # +1 where a token starts, -1 one past where it ends
+        edges = np.diff((~WHITESPACE[self.buf]).view(np.int8), prepend=np.int8(0), append=np.int8(0))
+        self.starts = np.flatnonzero(edges == 1).astype(index_dtype)
+        self.ends = np.flatnonzero(edges == -1).astype(index_dtype)
+        del edges
+
+        newlines = np.flatnonzero(self.buf == NEWLINE)
+        trailing = 1 if len(self.buf) and self.buf[-1] != NEWLINE else 0
+        self.num_lines = len(newlines) + trailing
+        self.line_starts = np.concatenate(([0], newlines + 1))[:self.num_lines].astype(index_dtype)
+
+        token_line = np.searchsorted(newlines, self.starts).astype(np.int32)
+        self.line_first = np.searchsorted(token_line, np.arange(self.num_lines)).astype(index_dtype)
+        self.line_count = np.bincount(token_line, minlength=self.num_lines).astype(np.int32)
+
+    @property
+    def num_tokens(self):
+        return len(self.starts)
+
+    def rows(self, min_fields=1, first_line=0, last_line=None, skip_comments=True):
+        """Line numbers in [first_line, last_line) with at least min_fields tokens.
+
+        With skip_comments, lines whose first token starts with '#' are dropped.
+        """
+        last_line = self.num_lines if last_line is None else min(last_line, self.num_lines)
+        lines = np.arange(max(first_line, 0), max(last_line, 0), dtype=np.int64)
+        lines = lines[self.line_count[lines] >= max(min_fields, 1)]
+        if skip_comments and len(lines):
+            lines = lines[self.buf[self.starts[self.line_first[lines]]] != COMMENT]
+        return lines
+
+    def field(self, rows, k):
+        """Token index of field k (negative counts from the end) on each row."""
+        if k >= 0:
+            return self.line_first[rows] + k
+        return self.line_first[rows] + self.line_count[rows] + k
+
+    def _joined(self, tokens):
+        """Bytes of the given tokens, each followed by a newline, as one uint8 array.
+
+        Token bytes are picked out of the mapped buffer with a mask that marks
+        every selected token plus the whitespace byte after it (a cumulative
+        sum over +1 / -1 marks), so the cost is one byte per buffer byte and
+        the selected bytes, never a token x longest-token matrix. Returns
+        (data, tokens in data order, position of each token in data order);
+        tokens are taken in ascending order, without repeats.
+        """
+        order = np.unique(tokens)
+        starts, ends = self.starts[order].astype(np.int64), self.ends[order].astype(np.int64)
+        marks = np.zeros(len(self.buf) + 2, dtype=np.int8)
+        marks[starts] += 1
+        marks[ends + 1] -= 1
+        inside = np.cumsum(marks, dtype=np.int8)[:len(self.buf)].view(bool)
+        data = self.buf[inside]
+        if len(order) and ends[-1] == len(self.buf):
+            data = np.append(data, np.uint8(NEWLINE))
+        data[np.cumsum(ends - starts + 1) - 1] = NEWLINE
+        return data, order, np.searchsorted(order, tokens)
+
+    def equals(self, tokens, value):
+        """Boolean mask of tokens equal to a bytes value."""
+        lengths = self.ends[tokens] - self.starts[tokens]
+        match = lengths == len(value)
+        if match.any() and len(value):
+            candidates = np.flatnonzero(match)
+            heads = self.buf[self.starts[tokens[candidates]][:, None] + np.arange(len(value))[None, :]]
+            match[candidates] = (heads == np.frombuffer(value, dtype=np.uint8)).all(axis=1)
+        return match
+
+    def as_int(self, tokens, dtype=np.int64):
+        """Parse integer tokens. Returns (values, valid) where invalid tokens are 0.
+
+        Digits are read one position at a time across all tokens; tokens with
+        more than MAX_INT_DIGITS digits are invalid.
+        """
+        starts = self.starts[tokens].astype(np.int64)
+        lengths = (self.ends[tokens] - starts).astype(np.int64)
+        last = max(len(self.buf) - 1, 0)
+        first = self.buf[np.minimum(starts, last)] if len(self.buf) else np.zeros(len(starts), dtype=np.uint8)
+        negative = (lengths > 1) & (first == MINUS)
+        valid = (lengths > 0) & (lengths - negative <= MAX_INT_DIGITS)
+        values = np.zeros(len(lengths), dtype=np.int64)
+        width = int(lengths[valid].max()) if valid.any() else 0
+        for k in range(width):
+            active = valid & (k < lengths)
+            if k == 0:
+                active &= ~negative
+            digit = self.buf[np.minimum(starts + k, last)].astype(np.int64) - ZERO
+            valid &= ~active | ((digit >= 0) & (digit <= 9))
+            values = np.where(active, values * 10 + digit, values)
+        values = np.where(negative, -values, values)
+        return np.where(valid, values, 0).astype(dtype), valid
+
+    def as_float(self, tokens):
+        """Parse float tokens (raises ValueError on a malformed number)."""
+        if not len(tokens):
+            return np.zeros(0, dtype=np.float64)
+        data, _, position = self._joined(tokens)
+        values = np.fromiter(map(float, bytes(data).split(b'\n')[:-1]), dtype=np.float64)
+        return values[position]
+
+    def as_strings(self, tokens):
+        """Tokens as a list of Python strings (one decode and split over the joined token bytes)."""
+        if not len(tokens):
+            return []
+        data, order, position = self._joined(tokens)
+        strings = bytes(data).decode().split('\n')[:-1]
+        if len(order) == len(tokens) and (order == tokens).all():
+            return strings
+        return [strings[i] for i in position.tolist()]
+
+    def as_ids(self, tokens):
+        """Intern tokens in bulk: (names in first-seen order, int32 id per token)."""
+        ids = {}
+        token_ids = [ids.setdefault(name, len(ids)) for name in self.as_strings(tokens)]
+        return list(ids), np.array(token_ids, dtype=np.int32)
+
+    def lines_starting_with(self, prefix):
+        """Line numbers whose stripped text starts with the bytes prefix."""
+        lines = np.flatnonzero(self.line_count > 0)
+        if not len(lines):
+            return lines
+        starts = self.starts[self.line_first[lines]]
+        width = len(prefix)
+        candidates = starts + width <= len(self.buf)
+        lines, starts = lines[candidates], starts[candidates]
+        heads = self.buf[starts[:, None] + np.arange(width)[None, :]]
+        return lines[(heads == np.frombuffer(prefix, dtype=np.uint8)).all(axis=1)]
+
+    def text_lines(self, first_line=0, last_line=None):
+        """Stripped text of lines [first_line, last_line), for small sections such as headers."""
+        last_line = self.num_lines if last_line is None else min(last_line, self.num_lines)
+        if first_line >= last_line:
+            return []
+        start = self.line_starts[first_line]
+        end = self.line_starts[last_line] if last_line < self.num_lines else len(self.buf)
+        return [line.strip() for line in bytes(self.buf[start:end]).decode().splitlines()]
+
+
+def sitemap_section(tokens):
+    """Locate the SITEMAP block of a tokenized .scl file.
+
+    Returns (header_line, end_line): the 'SITEMAP <width> <height>' line and
+    the 'END SITEMAP' line (num_lines if missing). header_line is -1 when the
+    file has no SITEMAP.
+    """
+    headers = tokens.lines_starting_with(b'SITEMAP')
+    if not len(headers):
+        return -1, tokens.num_lines
+    header_line = int(headers[0])
+    ends = tokens.lines_starting_with(b'END SITEMAP')
+    ends = ends[ends > header_line]
+    return header_line, int(ends[0]) if len(ends) else tokens.num_lines
+
+
+def read_sitemap_dimensions(tokens, header_line):
+    """(width, height) from the SITEMAP header line, or None if it is malformed."""
+    if header_line < 0 or tokens.line_count[header_line] < 3:
+        return None
+    rows = np.array([header_line])
+    width, width_ok = tokens.as_int(tokens.field(rows, 1))
+    height, height_ok = tokens.as_int(tokens.field(rows, 2))
+    if not (width_ok[0] and height_ok[0]):
+        return None
+    return int(width[0]), int(height[0])
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Bookshelf Resource Utilization Engine
+RDJordan 2025 / CFOGE
+
+Device-wide resource supply and design demand, computed on the columnar
+model instead of looping over resources x instance types:
+
+    supply   SITE capacities times the site count of each type (from the site
+             grid), kept per SITE type as well as per resource
+    demand   one np.bincount over inst_cell gives the instances per cell type,
+             and a cell id -> resource id table (built once from RESOURCES)
+             folds that into instances per resource
+
+A resource without a RESOURCES entry is only used by the cell of the same
+name; there is no substring guessing. Cells no resource takes are reported
+as unmapped.
+
+Demand is also counted in BEL slots: cells in SHARED_BEL_WEIGHTS fill more
+than one BEL of their resource. A SLICE's 16 LUT BELs are 8 LUT pairs, and
+a LUT6 or a dual-output LUT6_2 uses a whole pair, so it takes 2 of the 16,
+while smaller LUTs can share a pair.
+"""
+
+import numpy as np
+
+# BELs taken per instance, for cells that don't fit in a single BEL of their resource
+SHARED_BEL_WEIGHTS = {'LUT6': 2, 'LUT6_2': 2}
+
+
+def cell_resource_ids(design, resource_names, resources):
+    """Resource index (into resource_names) of every design cell, -1 if no resource takes it.
+
+    RESOURCES lists the cells of each resource; a resource it doesn't
+    mention takes the cell with its own name (e.g. a DSP48E2 resource and
+    cell).
+    """
+    by_cell = {}
+    for index, resource in enumerate(resource_names):
+        for cell_name in resources.get(resource, [resource]):
+            by_cell[cell_name] = index
+    return np.array([by_cell.get(name, -1) for name in design.cell_names], dtype=np.int32).reshape(-1)
+
+
+def site_supply(site_grid, sites):
+    """{site type: (site count, {resource: BELs})} over the site map, in first-seen type order.
+
+    Only needs the .scl, so the site map report doesn't wait for the design.
+    """
+    supply = {}
+    site_counts = site_grid.type_counts()
+    for i, site_type in enumerate(site_grid.type_names):
+        count = int(site_counts[i + 1])
+        if count:
+            site_resources = sites.get(site_type, {}).get('resources', {})
+            supply[site_type] = (count, {name: count * bels for name, bels in site_resources.items()})
+    return supply
+
+
+def compute_utilization(design, site_grid, sites, resources, weights=None):
+    """Resource supply / demand of a design on its device.
+
+    Returns a dict with
+        'resource_names'       resource order of every per-resource array
+        'supply', 'used'       per-resource BELs available and instances using them
+        'slots'                per-resource BELs used, with the SHARED_BEL_WEIGHTS
+        'site_supply'          {site type: (site count, {resource: BELs})}
+        'unmapped_cells'       {cell type: instances} no resource takes
+        'total_instances'
+    """
+    weights = SHARED_BEL_WEIGHTS if weights is None else weights
+    resource_names, capacity = site_grid.resource_matrix(sites)
+    site_counts = site_grid.type_counts()
+    supply = site_counts @ capacity if len(resource_names) else np.zeros(0, dtype=np.int64)
+
+    num_cells = len(design.cell_names)
+    cell_counts = np.bincount(design.inst_cell, minlength=num_cells)[:num_cells] if num_cells else np.zeros(0, dtype=np.int64)
+    cell_resource = cell_resource_ids(design, resource_names, resources)
+    cell_weight = np.array([weights.get(name, 1) for name in design.cell_names], dtype=np.int64)
+    mapped = cell_resource >= 0
+    used = np.bincount(cell_resource[mapped], weights=cell_counts[mapped], minlength=len(resource_names))
+    slots = np.bincount(cell_resource[mapped], weights=cell_counts[mapped] * cell_weight[mapped],
+                        minlength=len(resource_names))
+
+    return {
+        'resource_names': resource_names,
+        'supply': supply.astype(np.int64),
+        'used': used.astype(np.int64),
+        'slots': slots.astype(np.int64),
+        'site_supply': site_supply(site_grid, sites),
+        'unmapped_cells': {design.cell_names[c]: int(cell_counts[c])
+                           for c in np.flatnonzero(~mapped & (cell_counts > 0)).tolist()},
+        'total_instances': design.num_instances,
+    }
+
+
+def format_utilization_report(result):
+    """Text lines for the RESOURCE UTILIZATION report section."""
+    lines = []
+    if not len(result['resource_names']) or not result['total_instances']:
+        lines.append("Unable to calculate utilization - missing resource or instance data")
+        return lines
+
+    lines.append("Resource Utilization by Type:")
+    for name, used, available in zip(result['resource_names'], result['used'].tolist(), result['supply'].tolist()):
+        percent = (used / available * 100) if available > 0 else 0
+        lines.append(f"  {name}: {used:,} / {available:,} ({percent:.2f}%)")
+
+    total_used = result['total_instances']
+    total_available = int(result['supply'].sum())
+    overall = (total_used / total_available * 100) if total_available > 0 else 0
+    lines.append("")
+    lines.append(f"Overall Resource Utilization: {total_used:,} / {total_available:,} ({overall:.2f}%)")
+
+    if not np.array_equal(result['slots'], result['used']):
+        lines.append("")
+        lines.append("BEL Slot Demand (LUT6 / LUT6_2 fill a whole LUT pair):")
+        for name, slots, available in zip(result['resource_names'], result['slots'].tolist(), result['supply'].tolist()):
+            if slots:
+                percent = (slots / available * 100) if available > 0 else 0
+                lines.append(f"  {name}: {slots:,} / {available:,} ({percent:.2f}%)")
+
+    if result['unmapped_cells']:
+        lines.append("")
+        lines.append("Cells Without a Resource:")
+        for cell, count in result['unmapped_cells'].items():
+            lines.append(f"  {cell}: {count:,}")
+    return lines
@@ -4,18 +4,34 @@ Fixed Elements Visualizer
 RDJordan 2025 / CFOGE
 
 This script reads .pl and .scl files and creates a visualization of fixed elements
-plotted on a grid the size of the sitemap. It only analyzes fixed nodes from the .pl file.
+plotted on a grid the size of the sitemap. By default it only analyzes fixed nodes
+from the .pl file; --all draws every placed instance (e.g. a placer output .pl).
+Instances sharing a site are stacked inside it in BEL order, and --sites draws
+the SCL site types underneath. Everything is rendered as a single image.
 """
 
 import argparse
 import sys
 from pathlib import Path
-from collections import defaultdict, Counter
 
+import matplotlib.colors as mcolors
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bookshelf_cache import ParseCache
+from bookshelf_model import DesignModel, Placement, StringTable, intern_column
+from bookshelf_profile import add_profile_arguments, finish_profiling, phase, start_profiling
+from bookshelf_tokenizer import TokenizedFile
+from scl_visualizer import load_scl_file, site_type_colors, site_type_image
+
+# Color palette for different instance types
+INSTANCE_COLORS_PALETTE = [
+    '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
+    '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9',
+    '#F8C471', '#82E0AA', '#F1948A', '#85C1E9', '#D7BDE2'
+]
+
 
 def parse_scl_file(scl_file_path):
     """Parse SCL file to get site map dimensions."""
@@ -40,90 +56,206 @@ def parse_scl_file(scl_file_path):
 
 
 def parse_pl_file(pl_file_path):
-    """Parse PL file to get fixed instances."""
-    fixed_instances = []
+    """Parse PL file into a Placement (every placed instance, with its FIXED flag)."""
+    placement = Placement()
     
     try:
-        with open(pl_file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split()
-                    if len(parts) >= 5 and parts[-1] == 'FIXED':
-                        instance_name = parts[0]
-                        x = int(parts[1])
-                        y = int(parts[2])
-                        bel = int(parts[3])
-                        
-                        fixed_instances.append({
-                            'name': instance_name,
-                            'x': x,
-                            'y': y,
-                            'bel': bel
-                        })
+        tokens = TokenizedFile(pl_file_path)
+        rows = tokens.rows(min_fields=4)
+        fixed = (tokens.line_count[rows] >= 5) & tokens.equals(tokens.field(rows, -1), b'FIXED')
+        x, x_ok = tokens.as_int(tokens.field(rows, 1))
+        y, y_ok = tokens.as_int(tokens.field(rows, 2))
+        bel, bel_ok = tokens.as_int(tokens.field(rows, 3))
+        valid = x_ok & y_ok & bel_ok
+        if not valid[fixed].all():
+            raise ValueError(f"invalid location on line {rows[fixed & ~valid][0] + 1}")
+        
+        # Lines that don't hold a location (headers and such) are skipped
+        rows, fixed = rows[valid], fixed[valid]
+        placement.set_rows(tokens.as_strings(tokens.field(rows, 0)), x[valid], y[valid], bel[valid], fixed)
                         
     except Exception as e:
         print(f"Error reading PL file: {e}")
-        return []
+        return Placement()
     
-    return fixed_instances
+    return placement
 
 
 def parse_nodes_file(nodes_file_path):
-    """Parse nodes file to get instance types."""
-    instance_types = {}
+    """Parse nodes file into a DesignModel holding the instance -> cell type columns."""
+    design = DesignModel()
     
     try:
-        with open(nodes_file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        instance_name = parts[0]
-                        cell_type = parts[1]
-                        instance_types[instance_name] = cell_type
+        tokens = TokenizedFile(nodes_file_path)
+        rows = tokens.rows(min_fields=2)
+        cell_names, inst_cell = tokens.as_ids(tokens.field(rows, 1))
+        design.instance_names, keep = intern_column(tokens.as_strings(tokens.field(rows, 0)))
+        design.cell_names = StringTable.from_names(cell_names)
+        design.inst_cell = inst_cell if keep is None else inst_cell[keep]
                         
     except Exception as e:
         print(f"Error reading nodes file: {e}")
-        return {}
+        return DesignModel()
     
-    return instance_types
+    return design
+
+
+def load_design_files(scl_file, pl_file, nodes_file, cache_dir=None, use_cache=True):
+    """Parse the SCL, PL and (optional) nodes files, going through the .bkc parse cache.
+    
+    Returns (width, height, design) where design.placement holds the .pl rows,
+    resolved against the .nodes instances (design has no instances without a
+    .nodes file).
+    """
+    sources = [scl_file, pl_file, nodes_file]
+    cache = ParseCache(Path(pl_file).parent, Path(pl_file).stem, cache_dir) if use_cache else None
+    with phase('cache_load'):
+        cached = cache.load('placed_elements', sources) if cache else None
+    
+    if cached:
+        arrays, strings, meta = cached
+        design = DesignModel()
+        design.instance_names = StringTable.from_names(strings['instance_names'])
+        design.cell_names = StringTable.from_names(strings['cell_names'])
+        design.inst_cell = arrays['inst_cell']
+        design.placement.names = StringTable.from_names(strings['pl_names'])
+        design.placement.x, design.placement.y = arrays['x'], arrays['y']
+        design.placement.bel, design.placement.fixed = arrays['bel'], arrays['fixed']
+        design.resolve_instances()
+        return meta['width'], meta['height'], design
+    
+    print(f"Parsing SCL file: {scl_file}")
+    # Only reads up to the SITEMAP line, so no line count for this one
+    with phase('parse_scl_file'):
+        width, height = parse_scl_file(scl_file)
+    
+    design = DesignModel()
+    if Path(nodes_file).exists():
+        print(f"Parsing nodes file: {nodes_file}")
+        with phase('parse_nodes_file', nodes_file):
+            design = parse_nodes_file(nodes_file)
+    
+    print(f"Parsing PL file: {pl_file}")
+    with phase('parse_pl_file', pl_file):
+        design.placement = parse_pl_file(pl_file)
+    with phase('resolve_instances'):
+        design.resolve_instances()
+    
+    if cache and width and height:
+        placement = design.placement
+        arrays = {
+            'x': placement.x, 'y': placement.y, 'bel': placement.bel, 'fixed': placement.fixed,
+            'inst_cell': design.inst_cell
+        }
+        strings = {
+            'pl_names': placement.names.names,
+            'instance_names': design.instance_names.names,
+            'cell_names': design.cell_names.names
+        }
+        with phase('cache_store'):
+            cache.store('placed_elements', sources, arrays, strings, {'width': width, 'height': height})
+    
+    return width, height, design
 
 
-def create_fixed_elements_visualization(width, height, fixed_instances, instance_types=None, output_file=None, show_plot=False):
-    """Create a visualization of fixed elements on the grid."""
+def stack_site_slots(x, y, bel, width):
+    """Slot of each instance within its site, counting up in BEL order.
+    
+    Returns (slot, depth) where depth is the largest number of instances that
+    share one site. Instances are sorted by (site, bel) once and numbered
+    from the first row of their site group.
+    """
+    if not len(x):
+        return np.zeros(0, dtype=np.int64), 1
+    site = y.astype(np.int64) * width + x
+    order = np.lexsort((bel, site))
+    sorted_site = site[order]
+    group_start = np.r_[True, sorted_site[1:] != sorted_site[:-1]]
+    first = np.flatnonzero(group_start)
+    position = np.arange(len(order))
+    slot = np.empty(len(order), dtype=np.int64)
+    slot[order] = position - first[np.cumsum(group_start) - 1]
+    return slot, int(slot.max()) + 1
+
+
+def placed_elements_image(width, height, x, y, bel, type_ids, type_colors, alpha=0.8,
+                          site_grid=None, site_colors=None, site_alpha=0.3):
+    """RGBA raster of placed instances, stacking the BELs of a site.
+    
+    Every site is split into `depth` horizontal slices (depth = most
+    instances on any one site) and the instances of a site fill the slices in
+    BEL order, so a full SLICE shows as a solid block and a half-used one as
+    a half-filled block. type_ids index type_colors. With a site_grid the
+    slices start out as the (faint) site type colors instead of white and the
+    instances are blended over that background in the same pass.
+    """
+    slot, depth = stack_site_slots(x, y, bel, width)
+    
+    if site_grid is not None:
+        background = site_type_image(site_grid, site_colors, alpha=site_alpha)
+    else:
+        background = np.full((height, width, 4), 255, dtype=np.uint8)
+    image = np.repeat(background, depth, axis=0)
+    
+    lut = np.array([mcolors.to_rgba(color) for color in type_colors], dtype=np.float64).reshape(-1, 4) * 255
+    rows, cols = y * depth + slot, x
+    under = image[rows, cols].astype(np.float64)
+    image[rows, cols] = np.rint(alpha * lut[type_ids] + (1 - alpha) * under).astype(np.uint8)
+    image[rows, cols, 3] = 255
+    return image
+
+
+def instance_type_colors(design, selected, label='Fixed'):
+    """Type ids and colors for the selected placement rows.
+    
+    Returns (type_names, first_seen, type_ids, instance_colors): type_ids
+    index type_names, first_seen is the first selected row of each type and
+    instance_colors maps type name -> color (palette in sorted name order).
+    Instances missing from the .nodes file are UNKNOWN; without any .nodes
+    instances everything is one type named after the label.
+    """
+    num_instances = int(np.count_nonzero(selected))
+    if not len(design.instance_names):
+        return [label.upper()], np.zeros(1, dtype=np.int64), np.zeros(num_instances, dtype=np.int64), {label.upper(): '#FF6B6B'}
+    
+    inst = design.placement.inst[selected]
+    cell = np.where(inst >= 0, design.inst_cell[np.maximum(inst, 0)], len(design.cell_names))
+    type_names, first_seen, type_ids = np.unique(cell, return_index=True, return_inverse=True)
+    type_names = [design.cell_names[c] if c < len(design.cell_names) else 'UNKNOWN' for c in type_names.tolist()]
+    
+    instance_colors = {}
+    for i, inst_type in enumerate(sorted(type_names)):
+        color_index = i % len(INSTANCE_COLORS_PALETTE)
+        instance_colors[inst_type] = INSTANCE_COLORS_PALETTE[color_index]
+    return type_names, first_seen, type_ids.ravel(), instance_colors
+
+
+def create_fixed_elements_visualization(width, height, design, output_file=None, show_plot=False,
+                                        all_instances=False, site_grid=None, dpi=None):
+    """Create a visualization of fixed elements on the grid.
+    
+    With all_instances every placed instance of the .pl file is drawn, not just
+    the FIXED ones. A site_grid (from scl_visualizer.load_scl_file) is drawn
+    faintly underneath the instances.
+    """
     if width == 0 or height == 0:
         print("Error: Invalid site map dimensions.")
         return
     
-    if not fixed_instances:
-        print("Warning: No fixed instances found.")
+    placement = design.placement
+    selected = np.ones(len(placement), dtype=bool) if all_instances else placement.fixed
+    label = 'Placed' if all_instances else 'Fixed'
+    x, y, bel = placement.x[selected], placement.y[selected], placement.bel[selected]
+    num_instances = len(x)
+    
+    if not num_instances:
+        print(f"Warning: No {label.lower()} instances found.")
         return
     
-    # Color palette for different instance types
-    INSTANCE_COLORS_PALETTE = [
-        '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7',
-        '#DDA0DD', '#98D8C8', '#F7DC6F', '#BB8FCE', '#85C1E9',
-        '#F8C471', '#82E0AA', '#F1948A', '#85C1E9', '#D7BDE2'
-    ]
-    
-    # Get unique instance types and create color mapping
-    if instance_types:
-        type_counts = Counter()
-        for instance in fixed_instances:
-            if instance['name'] in instance_types:
-                type_counts[instance_types[instance['name']]] += 1
-            else:
-                type_counts['UNKNOWN'] += 1
-        
-        # Create color mapping for instance types
-        instance_colors = {}
-        for i, inst_type in enumerate(sorted(type_counts.keys())):
-            color_index = i % len(INSTANCE_COLORS_PALETTE)
-            instance_colors[inst_type] = INSTANCE_COLORS_PALETTE[color_index]
-    else:
-        instance_colors = {'FIXED': '#FF6B6B'}
+    # Type name per instance and color mapping for instance types
+    has_types = len(design.instance_names) > 0
+    type_names, first_seen, type_ids, instance_colors = instance_type_colors(design, selected, label)
+    type_counts = np.bincount(type_ids, minlength=len(type_names))
     
     # Optimize figure size for large grids
     max_fig_width = 20
@@ -135,29 +267,15 @@ def create_fixed_elements_visualization(width, height, fixed_instances, instance
     # Create figure and axis
     fig, ax = plt.subplots(1, 1, figsize=(fig_width, fig_height))
     
-    # Create grid to track occupied positions
-    grid = np.full((height, width), '', dtype=object)
-    
-    # Plot fixed instances
-    for instance in fixed_instances:
-        x, y = instance['x'], instance['y']
-        if 0 <= x < width and 0 <= y < height:
-            # Determine color based on instance type
-            if instance_types and instance['name'] in instance_types:
-                inst_type = instance_types[instance['name']]
-                color = instance_colors.get(inst_type, '#FF6B6B')
-            else:
-                color = '#FF6B6B'
-            
-            # Create rectangle for this instance
-            rect = patches.Rectangle(
-                (x, y), 1, 1, linewidth=0.5,
-                edgecolor='black', facecolor=color, alpha=0.8
-            )
-            ax.add_patch(rect)
-            
-            # Mark as occupied in grid
-            grid[y, x] = instance['name']
+    # Plot the instances inside the fabric as one image
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    site_colors = site_type_colors(site_grid.type_names) if site_grid is not None else None
+    with phase('placed_elements_image'):
+        image = placed_elements_image(
+            width, height, x[inside], y[inside], bel[inside], type_ids[inside],
+            [instance_colors[name] for name in type_names], site_grid=site_grid, site_colors=site_colors
+        )
+    ax.imshow(image, extent=(0, width, height, 0), interpolation='nearest', origin='upper', aspect='auto')
     
     # Configure plot appearance
     ax.set_xlim(0, width)
@@ -167,37 +285,35 @@ def create_fixed_elements_visualization(width, height, fixed_instances, instance
     
     ax.set_xlabel('X Coordinate')
     ax.set_ylabel('Y Coordinate')
-    ax.set_title(f'Fixed Elements Visualization ({width}×{height})')
+    ax.set_title(f'{label} Elements Visualization ({width}×{height})')
     
     # Add grid lines for smaller grids
     if width * height <= 10000:
         ax.grid(True, alpha=0.3, linewidth=0.5)
     
-    # Add legend if we have instance types
-    if instance_types and len(instance_colors) <= 10:
-        legend_elements = []
+    # Add legend for the instance types (if few enough) and the site types drawn underneath
+    legend_elements = []
+    if has_types and len(instance_colors) <= 10:
         for inst_type, color in instance_colors.items():
             legend_elements.append(patches.Patch(color=color, label=inst_type))
+    if site_grid is not None:
+        for site_type in sorted(site_grid.type_names):
+            legend_elements.append(patches.Patch(color=site_colors[site_type], alpha=0.3, label=f"{site_type} site"))
+    if legend_elements:
         ax.legend(handles=legend_elements, loc='upper right', bbox_to_anchor=(1.15, 1))
     
     # Add statistics
-    stats_text = "Fixed Elements Statistics:\n"
-    stats_text += f"Total Fixed Instances: {len(fixed_instances)}\n"
-    stats_text += f"Grid Coverage: {len(fixed_instances)} / {width * height} sites\n"
-    coverage_percent = (len(fixed_instances) / (width * height) * 100) if width * height > 0 else 0
+    stats_text = f"{label} Elements Statistics:\n"
+    stats_text += f"Total {label} Instances: {num_instances}\n"
+    stats_text += f"Grid Coverage: {num_instances} / {width * height} sites\n"
+    coverage_percent = (num_instances / (width * height) * 100) if width * height > 0 else 0
     stats_text += f"Coverage: {coverage_percent:.2f}%\n"
     
-    if instance_types:
+    if has_types:
         stats_text += "\nBy Instance Type:\n"
-        type_counts = Counter()
-        for instance in fixed_instances:
-            if instance['name'] in instance_types:
-                type_counts[instance_types[instance['name']]] += 1
-            else:
-                type_counts['UNKNOWN'] += 1
-        
-        for inst_type, count in type_counts.most_common():
-            stats_text += f"  {inst_type}: {count}\n"
+        # Most common first, ties in order of first appearance
+        for i in sorted(range(len(type_names)), key=lambda i: (-type_counts[i], first_seen[i])):
+            stats_text += f"  {type_names[i]}: {type_counts[i]}\n"
     
     
     ax.text(
@@ -210,7 +326,8 @@ def create_fixed_elements_visualization(width, height, fixed_instances, instance
     # Save the plot
     if output_file:
         print(f"Saving visualization to: {output_file}")
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        with phase('render_png'):
+            plt.savefig(output_file, dpi=dpi or 150, bbox_inches='tight')
         print("Visualization saved successfully!")
     
     # Show plot only if requested and grid is not too large
@@ -227,8 +344,15 @@ def main():
     parser.add_argument('directory', help='Directory containing Bookshelf files')
     parser.add_argument('-o', '--output', help='Output file path (default: auto-generated)')
     parser.add_argument('--show', action='store_true', help='Display the plot (not recommended for large grids)')
+    parser.add_argument('--all', action='store_true', help='Draw every placed instance in the .pl file, not only the FIXED ones')
+    parser.add_argument('--sites', action='store_true', help='Draw the SCL site types underneath the instances')
+    parser.add_argument('--dpi', type=int, help='Resolution of the saved image (default: 150)')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <design>.bkc beside the design files)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the text files, never read or write the parse cache')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    start_profiling(args, 'fixed_elements_visualizer.py')
     
     # Check if directory exists
     if not Path(args.directory).exists():
@@ -258,26 +382,25 @@ def main():
         sys.exit(1)
     
     # Parse files
-    print(f"Parsing SCL file: {scl_file}")
-    width, height = parse_scl_file(scl_file)
-    
-    print(f"Parsing PL file: {pl_file}")
-    fixed_instances = parse_pl_file(pl_file)
+    width, height, design = load_design_files(
+        scl_file, pl_file, nodes_file, args.cache_dir, not args.no_cache
+    )
     
-    instance_types = {}
-    if nodes_file.exists():
-        print(f"Parsing nodes file: {nodes_file}")
-        instance_types = parse_nodes_file(nodes_file)
+    site_grid = None
+    if args.sites:
+        site_grid = load_scl_file(scl_file, args.cache_dir, not args.no_cache)
     
     if width == 0 or height == 0:
         print("Error: Could not parse SCL file or invalid dimensions.")
         sys.exit(1)
     
     print(f"Site map dimensions: {width} x {height}")
-    print(f"Total fixed instances: {len(fixed_instances)}")
+    print(f"Total fixed instances: {int(design.placement.fixed.sum())}")
+    if args.all:
+        print(f"Total placed instances: {len(design.placement)}")
     
-    if instance_types:
-        print(f"Instance types available: {len(instance_types)}")
+    if len(design.instance_names):
+        print(f"Instance types available: {len(design.instance_names)}")
     
     # Auto-generate output filename if not provided
     if not args.output:
@@ -285,9 +408,12 @@ def main():
         print(f"Generating output file: {args.output}")
     
     # Create visualization
-    create_fixed_elements_visualization(
-        width, height, fixed_instances, instance_types, args.output, args.show
-    )
+    with phase('create_fixed_elements_visualization'):
+        create_fixed_elements_visualization(
+            width, height, design, args.output, args.show, args.all, site_grid, args.dpi
+        )
+    
+    finish_profiling(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Chunked Parse Scaling Benchmark
+RDJordan 2025 / CFOGE
+
+Times the chunked multi-process .nets/.nodes parser from bookshelf_analyzer.py
+with 1 to N worker processes and checks every run against the serial parser.
+The shipped benchmarks are small, so --replicate can blow a file up to a
+realistic size first (instance and net names get a suffix per copy).
+
+Usage:
+    python parse_scaling.py <design.nets|design.nodes> [--max-jobs N] [--replicate K]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bookshelf_analyzer import BookshelfAnalyzer
+
+COMPARED_ARRAYS = {
+    'nodes': ('inst_cell',),
+    'nets': ('net_degree', 'net_offsets', 'pin_inst', 'pin_libpin')
+}
+COMPARED_TABLES = {
+    'nodes': ('instance_names', 'cell_names'),
+    'nets': ('net_names', 'pin_names', 'pin_instance_names')
+}
+
+
+def replicate_file(file_path, kind, copies, output_path):
+    """Write copies of a .nets/.nodes file with instance/net names made unique per copy."""
+    with open(output_path, 'w') as out:
+        for copy in range(copies):
+            suffix = f"__{copy}"
+            with open(file_path, 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if not parts or parts[0].startswith('#'):
+                        continue
+                    if kind == 'nodes' and len(parts) >= 2:
+                        out.write(f"{parts[0]}{suffix} {' '.join(parts[1:])}\n")
+                    elif kind == 'nets' and parts[0] == 'net' and len(parts) >= 3:
+                        out.write(f"net {parts[1]}{suffix} {' '.join(parts[2:])}\n")
+                    elif kind == 'nets' and line.startswith((' ', '\t')) and len(parts) >= 2:
+                        out.write(f"\t{parts[0]}{suffix} {' '.join(parts[1:])}\n")
+                    else:
+                        out.write(line)
+
+
+def parse_with_jobs(kind, file_path, jobs, chunk_bytes):
+    """Parse one file with the given number of workers, returning (analyzer, seconds)."""
+    analyzer = BookshelfAnalyzer(Path(file_path).parent, use_cache=False, jobs=jobs, chunk_bytes=chunk_bytes)
+    analyzer.reset_parse_results()
+    analyzer.parse_timings = {}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if jobs > 1:
+            analyzer.parse_files_parallel([(kind, Path(file_path))])
+        else:
+            analyzer.parse_file(kind, file_path)
+        elapsed = time.perf_counter() - start
+
+    return analyzer, elapsed
+
+
+def same_result(kind, serial, chunked):
+    """True when the chunked parse produced exactly the serial parser's arrays and tables."""
+    for name in COMPARED_ARRAYS[kind]:
+        if not np.array_equal(getattr(serial.design, name), getattr(chunked.design, name)):
+            return False
+    for name in COMPARED_TABLES[kind]:
+        serial_table, chunked_table = getattr(serial.design, name), getattr(chunked.design, name)
+        serial_names = serial_table.names if serial_table is not None else None
+        chunked_names = chunked_table.names if chunked_table is not None else None
+        if serial_names != chunked_names:
+            return False
+    return kind != 'nets' or serial.net_count == chunked.net_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark for the chunked .nets/.nodes parser')
+    parser.add_argument('file', help='A .nets or .nodes file')
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count() or 1, help='Largest worker count to try (default: CPU count)')
+    parser.add_argument('--replicate', type=int, default=1, help='Concatenate K renamed copies of the file first (default: 1)')
+    parser.add_argument('--chunk-mb', type=float, default=4, help='Chunk size in MB (default: 4)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per worker count, the best time is kept (default: 3)')
+
+    args = parser.parse_args()
+
+    file_path = Path(args.file)
+    kind = file_path.suffix.lstrip('.')
+    if kind not in COMPARED_ARRAYS or not file_path.exists():
+        print(f"Error: '{args.file}' is not an existing .nets or .nodes file")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.replicate > 1:
+            print(f"Replicating {file_path.name} x{args.replicate}...")
+            replicated = Path(tmp_dir) / file_path.name
+            replicate_file(file_path, kind, args.replicate, replicated)
+            file_path = replicated
+
+        chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+        size_mb = file_path.stat().st_size / 1e6
+        print(f"File: {file_path.name} ({size_mb:.1f} MB), chunk size {args.chunk_mb:g} MB, {os.cpu_count()} CPUs")
+        print(f"{'jobs':>5} {'seconds':>9} {'MB/s':>8} {'speedup':>8}  matches serial")
+
+        serial = None
+        serial_time = None
+        for jobs in range(1, args.max_jobs + 1):
+            runs = [parse_with_jobs(kind, file_path, jobs, chunk_bytes) for _ in range(args.repeat)]
+            analyzer = runs[0][0]
+            elapsed = min(seconds for _, seconds in runs)
+            if serial is None:
+                serial, serial_time = analyzer, elapsed
+            matches = same_result(kind, serial, analyzer)
+            print(f"{jobs:>5} {elapsed:>9.3f} {size_mb / elapsed:>8.1f} {serial_time / elapsed:>8.2f}  {'yes' if matches else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,25 @@ SCL Site Map Visualizer
 RDJordan 2025 / CFOGE
 
 This script reads an SCL file and creates a color-coded image of the FPGA site map.
-This is super slow for any real FPGA, but it does work.
+The site map is drawn as one raster image built from the site-type grid; the
+old one-patch-per-site rendering (super slow for any real FPGA) is still
+available with --patches.
 """
 
 import argparse
 import sys
 from pathlib import Path
 
+import matplotlib.colors as mcolors
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
 import numpy as np
 
+from bookshelf_cache import ParseCache
+from bookshelf_model import SiteGrid
+from bookshelf_profile import add_profile_arguments, finish_profiling, phase, start_profiling
+from bookshelf_tokenizer import TokenizedFile, read_sitemap_dimensions, sitemap_section
+
 # Color palette for dynamically discovered site types
 SITE_COLORS_PALETTE = [
     '#4CAF50', '#2196F3', '#FF9800', '#9C27B0', '#F44336',
@@ -24,62 +32,105 @@ SITE_COLORS_PALETTE = [
 
 
 def parse_scl_file(scl_file_path):
-    sites = []
-    site_types = set()
-    width = height = 0
-    
+    """Read the site locations of an SCL file into a SiteGrid (empty on error)."""
     try:
-        with open(scl_file_path, 'r') as f:
-            lines = f.readlines()
+        # Tokenize the whole file in bulk: any line with at least three fields
+        # whose first two are integers is a site location
+        tokens = TokenizedFile(scl_file_path)
+        header_line, _ = sitemap_section(tokens)
+        dimensions = read_sitemap_dimensions(tokens, header_line)
         
-        # Find SITEMAP line to get dimensions
-        for line in lines:
-            line = line.strip()
-            if line.startswith('SITEMAP'):
-                parts = line.split()
-                if len(parts) >= 3:
-                    width = int(parts[1])
-                    height = int(parts[2])
-                    break
+        rows = tokens.rows(min_fields=3, skip_comments=False)
+        x, x_ok = tokens.as_int(tokens.field(rows, 0))
+        y, y_ok = tokens.as_int(tokens.field(rows, 1))
+        valid = x_ok & y_ok
+        x, y = x[valid], y[valid]
+        type_names, type_ids = tokens.as_ids(tokens.field(rows[valid], 2))
         
-        # Parse site locations and discover site types
-        for line in lines:
-            line = line.strip()
-            if (line and not line.startswith('SITE') and 
-                not line.startswith('RESOURCES') and not line.startswith('SITEMAP')):
-                parts = line.split()
-                if len(parts) >= 3:
-                    try:
-                        x = int(parts[0])
-                        y = int(parts[1])
-                        site_type = parts[2]
-                        sites.append((x, y, site_type))
-                        site_types.add(site_type)
-                    except ValueError:
-                        continue
+        if dimensions:
+            width, height = dimensions
+        else:
+            width = int(x.max()) + 1 if len(x) else 0
+            height = int(y.max()) + 1 if len(y) else 0
         
-        return width, height, sites, site_types
+        with phase('build_site_grid'):
+            site_grid, out_of_bounds = SiteGrid.from_columns(width, height, x, y, type_names, type_ids)
+        if out_of_bounds:
+            print(f"Warning: {out_of_bounds} sites lie outside the {width} x {height} site map and are skipped")
+        return site_grid
         
     except FileNotFoundError:
         print(f"Error: File '{scl_file_path}' not found.")
-        return 0, 0, [], set()
+        return SiteGrid()
     except Exception as e:
         print(f"Error reading SCL file: {e}")
-        return 0, 0, [], set()
+        return SiteGrid()
+
+
+def load_scl_file(scl_file_path, cache_dir=None, use_cache=True):
+    """parse_scl_file() with the .bkc parse cache in front of it."""
+    scl_file_path = Path(scl_file_path)
+    cache = ParseCache(scl_file_path.parent, scl_file_path.stem, cache_dir) if use_cache else None
+    with phase('cache_load'):
+        cached = cache.load('scl_site_grid', [scl_file_path]) if cache else None
+    
+    if cached:
+        arrays, strings, meta = cached
+        return SiteGrid(meta['width'], meta['height'], strings['site_types'], arrays['site_grid'])
+    
+    with phase('parse_scl_file', scl_file_path):
+        site_grid = parse_scl_file(scl_file_path)
+    
+    if cache and site_grid.width and site_grid.height:
+        with phase('cache_store'):
+            cache.store('scl_site_grid', [scl_file_path], {'site_grid': site_grid.grid},
+                        {'site_types': site_grid.type_names},
+                        {'width': site_grid.width, 'height': site_grid.height})
+    
+    return site_grid
+
+
+def site_type_colors(site_types):
+    """Palette color per site type, assigned in sorted type order."""
+    return {site_type: SITE_COLORS_PALETTE[i % len(SITE_COLORS_PALETTE)]
+            for i, site_type in enumerate(sorted(site_types))}
 
 
-def create_site_visualization(width, height, sites, site_types, output_file=None, show_plot=False):
+def site_type_image(site_grid, site_colors, alpha=0.8, background=(255, 255, 255)):
+    """(height, width, 4) uint8 RGBA raster of a SiteGrid.
+    
+    Each grid value is looked up in a small color table, so the whole image
+    is one NumPy indexing operation. Site colors are blended over the
+    background with the given alpha, like the semi-transparent patches of the
+    patch renderer; empty cells get the background. The result is opaque
+    RGBA because matplotlib composites that without another conversion.
+    """
+    background = np.array(background, dtype=np.float64)
+    lut = np.full((len(site_grid.type_names) + 1, 4), 255, dtype=np.float64)
+    lut[SiteGrid.EMPTY, :3] = background
+    for i, site_type in enumerate(site_grid.type_names):
+        rgb = np.array(mcolors.to_rgb(site_colors.get(site_type, '#E0E0E0'))) * 255
+        lut[i + 1, :3] = alpha * rgb + (1 - alpha) * background
+    return np.rint(lut).astype(np.uint8)[site_grid.grid]
+
+
+def create_site_visualization(site_grid, output_file=None, show_plot=False, raster=True, dpi=None):
     """Create a visualization of the site map.
+    
+    The default raster mode draws the whole map as a single image. With
+    raster=False every site is drawn as its own outlined Rectangle patch,
+    which only makes sense for small grids. The raster image is saved at
+    150 dpi by default (several pixels per site), the patches at 300 dpi.
     """
+    width, height = site_grid.width, site_grid.height
     if width == 0 or height == 0:
         print("Error: Invalid site map dimensions.")
         return
     
+    site_types = site_grid.type_names
+    
     # Create dynamic color mapping for discovered site types
-    site_colors = {}
-    for i, site_type in enumerate(sorted(site_types)):
-        color_index = i % len(SITE_COLORS_PALETTE)
-        site_colors[site_type] = SITE_COLORS_PALETTE[color_index]
+    site_colors = site_type_colors(site_types)
     
     # Optimize figure size for large grids
     max_fig_width = 20
@@ -91,34 +142,32 @@ def create_site_visualization(width, height, sites, site_types, output_file=None
     # Create figure and axis with optimized settings
     fig, ax = plt.subplots(1, 1, figsize=(fig_width, fig_height))
     
-    # Create grid and fill with site information
-    grid = np.full((height, width), '', dtype=object)
-    for x, y, site_type in sites:
-        if 0 <= x < width and 0 <= y < height:
-            grid[y, x] = site_type
-    
     # Optimize rendering for large grids
     linewidth = 0.1 if width * height > 10000 else 0.5
     is_large_grid = width * height > 10000
     
-    # Create visualization
-    for y in range(height):
-        for x in range(width):
-            site_type = grid[y, x]
-            if site_type:
-                color = site_colors.get(site_type, '#E0E0E0')
-                rect = patches.Rectangle(
-                    (x, y), 1, 1, linewidth=linewidth,
-                    edgecolor='black', facecolor=color, alpha=0.8
-                )
-                ax.add_patch(rect)
-            elif not is_large_grid:
-                # Show empty spaces only for smaller grids
-                rect = patches.Rectangle(
-                    (x, y), 1, 1, linewidth=0.05,
-                    edgecolor='lightgray', facecolor='white', alpha=0.3
-                )
-                ax.add_patch(rect)
+    if raster:
+        with phase('site_type_image'):
+            image = site_type_image(site_grid, site_colors)
+        ax.imshow(image, extent=(0, width, height, 0), interpolation='nearest', origin='upper')
+    else:
+        for y in range(height):
+            for x in range(width):
+                site_type = site_grid.type_at(x, y)
+                if site_type:
+                    color = site_colors.get(site_type, '#E0E0E0')
+                    rect = patches.Rectangle(
+                        (x, y), 1, 1, linewidth=linewidth,
+                        edgecolor='black', facecolor=color, alpha=0.8
+                    )
+                    ax.add_patch(rect)
+                elif not is_large_grid:
+                    # Show empty spaces only for smaller grids
+                    rect = patches.Rectangle(
+                        (x, y), 1, 1, linewidth=0.05,
+                        edgecolor='lightgray', facecolor='white', alpha=0.3
+                    )
+                    ax.add_patch(rect)
     
     # Configure plot appearance
     ax.set_xlim(0, width)
@@ -143,9 +192,7 @@ def create_site_visualization(width, height, sites, site_types, output_file=None
         ax.grid(True, alpha=0.3, linewidth=0.5)
     
     # Add statistics
-    site_counts = {}
-    for _, _, site_type in sites:
-        site_counts[site_type] = site_counts.get(site_type, 0) + 1
+    site_counts = site_grid.counts()
     
     stats_text = "Site Statistics:\n"
     for site_type, count in sorted(site_counts.items()):
@@ -161,7 +208,8 @@ def create_site_visualization(width, height, sites, site_types, output_file=None
     # Save the plot
     if output_file:
         print(f"Saving visualization to: {output_file}")
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        with phase('render_png'):
+            plt.savefig(output_file, dpi=dpi or (150 if raster else 300), bbox_inches='tight')
         print("Visualization saved successfully!")
     
     # Show plot only if requested and grid is not too large
@@ -178,8 +226,14 @@ def main():
     parser.add_argument('scl_file', help='Path to the SCL file')
     parser.add_argument('-o', '--output', help='Output file path (default: auto-generated)')
     parser.add_argument('--show', action='store_true', help='Display the plot (not recommended for large grids)')
+    parser.add_argument('--patches', action='store_true', help='Draw every site as an outlined patch instead of one raster image (slow, for small grids)')
+    parser.add_argument('--dpi', type=int, help='Resolution of the saved image (default: 150 raster, 300 with --patches)')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <name>.bkc beside the SCL file)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the SCL text, never read or write the parse cache')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    start_profiling(args, 'scl_visualizer.py')
     
     # Check if file exists
     if not Path(args.scl_file).exists():
@@ -188,24 +242,28 @@ def main():
     
     # Parse the SCL file
     print(f"Parsing SCL file: {args.scl_file}")
-    width, height, sites, site_types = parse_scl_file(args.scl_file)
+    site_grid = load_scl_file(args.scl_file, args.cache_dir, not args.no_cache)
+    width, height = site_grid.width, site_grid.height
     
     if width == 0 or height == 0:
         print("Error: Could not parse SCL file or invalid dimensions.")
         sys.exit(1)
     
     print(f"Site map dimensions: {width} x {height}")
-    print(f"Total sites: {len(sites)}")
-    print(f"Discovered site types: {sorted(site_types)}")
+    print(f"Total sites: {site_grid.num_sites()}")
+    print(f"Discovered site types: {sorted(site_grid.type_names)}")
     
     # Auto-generate output filename if not provided
     if not args.output:
         scl_path = Path(args.scl_file)
         args.output = scl_path.stem + "_sitemap.png"
-        print(f"Generating output file: {args.output}.... This may take some time....")
+        print(f"Generating output file: {args.output}")
     
     # Create visualization
-    create_site_visualization(width, height, sites, site_types, args.output, args.show)
+    with phase('create_site_visualization'):
+        create_site_visualization(site_grid, args.output, args.show, raster=not args.patches, dpi=args.dpi)
+    
+    finish_profiling(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Site Map Tile Pyramid Exporter
+RDJordan 2025 / CFOGE
+
+Writes the SCL site map (and optionally the .pl placement on top of it) as a
+zoomable pyramid of PNG tiles plus a small static HTML viewer, instead of one
+huge PNG. The full resolution image gives every site a block of pixels; each
+lower zoom level halves it by averaging 2x2 pixel blocks until the whole map
+fits in a single tile.
+
+    <output>/index.html         open in a browser, drag to pan, wheel to zoom
+    <output>/tiles.json         pyramid layout and a content hash per tile
+    <output>/<z>/<col>_<row>.png
+
+Re-running over the same output directory only writes the tiles whose pixels
+changed, so refreshing the overlay after a new placement is cheap.
+
+Usage:
+    python site_map_tiles.py <directory> [-o tiles] [--placement [--all]] [--jobs N]
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib.image as mimage
+import numpy as np
+
+from fixed_elements_visualizer import instance_type_colors, load_design_files, placed_elements_image
+from scl_visualizer import load_scl_file, site_type_colors, site_type_image
+
+MANIFEST_NAME = 'tiles.json'
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  html, body {{ margin: 0; height: 100%; overflow: hidden; background: #ddd; font-family: sans-serif; }}
+  #map {{ position: absolute; inset: 0; cursor: grab; }}
+  #map img {{ position: absolute; image-rendering: pixelated; user-select: none; }}
+  #info {{ position: absolute; left: 8px; top: 8px; background: #fff; padding: 4px 8px; border-radius: 4px; }}
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="info"></div>
+<script>
+const pyramid = {pyramid};
+const map = document.getElementById('map');
+const info = document.getElementById('info');
+const maxLevel = pyramid.levels.length - 1;
+let level = 0, scale = 1, offsetX = 0, offsetY = 0;
+
+function draw() {{
+  map.innerHTML = '';
+  const lv = pyramid.levels[level];
+  const size = pyramid.tile_size * scale;
+  for (let row = 0; row < lv.rows; row++) {{
+    for (let col = 0; col < lv.cols; col++) {{
+      const x = offsetX + col * size, y = offsetY + row * size;
+      if (x > map.clientWidth || y > map.clientHeight || x + size < 0 || y + size < 0) continue;
+      const img = document.createElement('img');
+      img.src = level + '/' + col + '_' + row + '.png';
+      img.style.left = x + 'px'; img.style.top = y + 'px';
+      img.style.width = size + 'px'; img.style.height = size + 'px';
+      img.draggable = false;
+      map.appendChild(img);
+    }}
+  }}
+  const sitePixels = lv.width / pyramid.width * scale;
+  info.textContent = pyramid.title + ' - level ' + level + '/' + maxLevel + ', ' + sitePixels.toFixed(2) + ' px per site';
+}}
+
+map.addEventListener('wheel', e => {{
+  e.preventDefault();
+  const factor = e.deltaY < 0 ? 2 : 0.5;
+  let newLevel = level, newScale = scale * factor;
+  if (factor > 1 && level < maxLevel) {{ newLevel = level + 1; newScale = scale; }}
+  else if (factor < 1 && level > 0 && scale <= 1) {{ newLevel = level - 1; newScale = scale; }}
+  const ratio = (pyramid.levels[newLevel].width * newScale) / (pyramid.levels[level].width * scale);
+  offsetX = e.clientX - (e.clientX - offsetX) * ratio;
+  offsetY = e.clientY - (e.clientY - offsetY) * ratio;
+  level = newLevel; scale = newScale;
+  draw();
+}}, {{ passive: false }});
+
+let dragging = null;
+map.addEventListener('mousedown', e => {{ dragging = [e.clientX - offsetX, e.clientY - offsetY]; map.style.cursor = 'grabbing'; }});
+window.addEventListener('mouseup', () => {{ dragging = null; map.style.cursor = 'grab'; }});
+window.addEventListener('mousemove', e => {{
+  if (!dragging) return;
+  offsetX = e.clientX - dragging[0]; offsetY = e.clientY - dragging[1];
+  draw();
+}});
+window.addEventListener('resize', draw);
+draw();
+</script>
+</body>
+</html>
+"""
+
+
+def site_pixel_image(image, width, height, site_pixels):
+    """Scale a per-site raster up so every site becomes a site_pixels square.
+
+    image may have several rows per site (the stacked BEL slices of
+    placed_elements_image); they are spread over the pixel rows of the site.
+    """
+    depth = image.shape[0] // height
+    pixel = np.arange(site_pixels)
+    rows = (np.arange(height)[:, None] * depth + pixel[None, :] * depth // site_pixels).ravel()
+    cols = np.repeat(np.arange(width), site_pixels)
+    return image[rows][:, cols]
+
+
+def downsample(image):
+    """Halve an RGBA image by averaging 2x2 blocks (odd edges are repeated)."""
+    height, width = image.shape[:2]
+    padded = np.pad(image, ((0, height % 2), (0, width % 2), (0, 0)), mode='edge')
+    rows = padded[0::2].astype(np.uint16) + padded[1::2]
+    return ((rows[:, 0::2] + rows[:, 1::2] + 2) // 4).astype(np.uint8)
+
+
+def build_levels(image, tile_size):
+    """Pyramid images from the single-tile overview (level 0) to full resolution."""
+    levels = [image]
+    while max(levels[-1].shape[:2]) > tile_size:
+        levels.append(downsample(levels[-1]))
+    return levels[::-1]
+
+
+def cut_tiles(image, tile_size):
+    """Yield (col, row, tile) for every tile of one level; edge tiles are padded transparent."""
+    height, width = image.shape[:2]
+    for row in range(-(-height // tile_size)):
+        for col in range(-(-width // tile_size)):
+            part = image[row * tile_size:(row + 1) * tile_size, col * tile_size:(col + 1) * tile_size]
+            tile = np.zeros((tile_size, tile_size, 4), dtype=np.uint8)
+            tile[:part.shape[0], :part.shape[1]] = part
+            yield col, row, tile
+
+
+def tile_digest(tile):
+    return hashlib.blake2b(tile.tobytes(), digest_size=16).hexdigest()
+
+
+def _write_tiles_job(output_dir, tiles):
+    """Worker: encode and write a batch of (key, tile) PNGs."""
+    for key, tile in tiles:
+        mimage.imsave(Path(output_dir) / f"{key}.png", tile)
+    return len(tiles)
+
+
+def write_pyramid(image, output_dir, tile_size=256, jobs=1, force=False, title='Site Map', width=None, height=None):
+    """Write the tile pyramid of an RGBA image into output_dir.
+
+    A tile is only encoded when its content hash differs from the one in the
+    existing tiles.json (or its file is missing); tiles that no longer exist
+    in the new layout are removed. Returns (written, total) tile counts.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = output_dir / MANIFEST_NAME
+
+    previous = {}
+    if manifest_file.exists() and not force:
+        try:
+            with open(manifest_file, 'r') as f:
+                previous = json.load(f).get('tiles', {})
+        except (OSError, ValueError):
+            previous = {}
+
+    levels = build_levels(image, tile_size)
+    hashes = {}
+    pending = []
+    for z, level_image in enumerate(levels):
+        (output_dir / str(z)).mkdir(exist_ok=True)
+        for col, row, tile in cut_tiles(level_image, tile_size):
+            key = f"{z}/{col}_{row}"
+            hashes[key] = tile_digest(tile)
+            if previous.get(key) != hashes[key] or not (output_dir / f"{key}.png").exists():
+                pending.append((key, tile))
+
+    for key in set(previous) - set(hashes):
+        (output_dir / f"{key}.png").unlink(missing_ok=True)
+
+    if jobs > 1 and len(pending) > 1:
+        batches = [pending[i::jobs] for i in range(jobs)]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(_write_tiles_job, [output_dir] * len(batches), batches))
+    else:
+        _write_tiles_job(output_dir, pending)
+
+    pyramid = {
+        'title': title,
+        'tile_size': tile_size,
+        'width': width or image.shape[1],
+        'height': height or image.shape[0],
+        'levels': [
+            {'width': level_image.shape[1], 'height': level_image.shape[0],
+             'cols': -(-level_image.shape[1] // tile_size), 'rows': -(-level_image.shape[0] // tile_size)}
+            for level_image in levels
+        ]
+    }
+    with open(output_dir / 'index.html', 'w') as f:
+        f.write(VIEWER_HTML.format(title=title, pyramid=json.dumps(pyramid)))
+    with open(manifest_file, 'w') as f:
+        json.dump(dict(pyramid, tiles=hashes), f)
+
+    return len(pending), len(hashes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the site map (and placement) as a zoomable PNG tile pyramid')
+    parser.add_argument('directory', help='Directory containing Bookshelf files')
+    parser.add_argument('-o', '--output', help='Output directory (default: <design>_tiles)')
+    parser.add_argument('--placement', action='store_true', help='Draw the fixed instances of the .pl file over the site map')
+    parser.add_argument('--all', action='store_true', help='With --placement, draw every placed instance, not only the FIXED ones')
+    parser.add_argument('--site-pixels', type=int, default=8, help='Pixels per site edge at full zoom (default: 8)')
+    parser.add_argument('--tile-size', type=int, default=256, help='Tile edge in pixels (default: 256)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Worker processes used to encode tiles (default: 1)')
+    parser.add_argument('--force', action='store_true', help='Rewrite every tile, even unchanged ones')
+    parser.add_argument('--cache-dir', help='Directory for the parse cache (default: <design>.bkc beside the design files)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the text files, never read or write the parse cache')
+
+    args = parser.parse_args()
+
+    directory = Path(args.directory)
+    aux_files = list(directory.glob("*.aux")) if directory.exists() else []
+    if not aux_files:
+        print(f"Error: No .aux files found in directory '{args.directory}'")
+        sys.exit(1)
+
+    design_name = aux_files[0].stem
+    scl_file = directory / f"{design_name}.scl"
+    if not scl_file.exists():
+        print(f"Error: SCL file '{scl_file}' not found.")
+        sys.exit(1)
+
+    site_grid = load_scl_file(scl_file, args.cache_dir, not args.no_cache)
+    width, height = site_grid.width, site_grid.height
+    if width == 0 or height == 0:
+        print("Error: Could not parse SCL file or invalid dimensions.")
+        sys.exit(1)
+
+    site_colors = site_type_colors(site_grid.type_names)
+    title = f"{design_name} site map ({width}x{height})"
+
+    if args.placement:
+        pl_file = directory / f"{design_name}.pl"
+        if not pl_file.exists():
+            print(f"Error: PL file '{pl_file}' not found.")
+            sys.exit(1)
+        _, _, design = load_design_files(scl_file, pl_file, directory / f"{design_name}.nodes",
+                                         args.cache_dir, not args.no_cache)
+        placement = design.placement
+        label = 'Placed' if args.all else 'Fixed'
+        selected = np.ones(len(placement), dtype=bool) if args.all else placement.fixed
+        type_names, _, type_ids, instance_colors = instance_type_colors(design, selected, label)
+        x, y, bel = placement.x[selected], placement.y[selected], placement.bel[selected]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        image = placed_elements_image(
+            width, height, x[inside], y[inside], bel[inside], type_ids[inside],
+            [instance_colors[name] for name in type_names], site_grid=site_grid, site_colors=site_colors
+        )
+        title = f"{design_name} {label.lower()} elements ({width}x{height})"
+    else:
+        image = site_type_image(site_grid, site_colors)
+
+    image = site_pixel_image(image, width, height, args.site_pixels)
+
+    output_dir = Path(args.output or f"{design_name}_tiles")
+    print(f"Writing tile pyramid ({image.shape[1]}x{image.shape[0]} px) to: {output_dir}")
+    written, total = write_pyramid(image, output_dir, args.tile_size, args.jobs, args.force, title, width, height)
+    print(f"Tiles written: {written} of {total} ({total - written} unchanged)")
+    print(f"Viewer: {output_dir / 'index.html'}")
+
+
+if __name__ == "__main__":
+    main()